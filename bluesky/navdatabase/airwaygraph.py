@@ -0,0 +1,220 @@
+''' Graph of the airway network, for shortest-path routing along airways.
+
+    The nodes of the graph are navdb waypoints, and its edges are airway
+    legs, stored in compressed sparse row (CSR) form: the legs from waypoint
+    i go to waypoints indices[indptr[i]:indptr[i + 1]], with leg lengths
+    dist[indptr[i]:indptr[i + 1]]. As in Navdatabase.listconnections, legs
+    can be flown in both directions.
+
+    The graph is built once from the navdata, and stored in the column cache.
+    Shortest routes are calculated for batches of origin-destination pairs
+    with scipy's Dijkstra implementation: one search per unique origin gives
+    the routes to all destinations of that origin.
+'''
+import threading
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from bluesky.tools import cachefile, columncache, geo
+from .gridindex import GridIndex
+from .loadnavdata import load_navpart, navdb_version
+
+
+# Version of the graph layout. The graph cache is also rebuilt when the navdb version changes
+graph_version = 'v1'
+
+# Maximum distance between an airway leg end point and its waypoint [nm]
+MAXOFFSET = 10.0
+
+# Maximum number of (origins x waypoints) of a single Dijkstra search,
+# which limits the memory used for the distance and predecessor arrays
+MAXSEARCH = 1 << 24
+
+_graph = None
+_lock = threading.Lock()
+
+
+def load_airwaygraph():
+    ''' Load the airway graph from cache, or build it from the navdata. '''
+    global _graph
+    with _lock:
+        if _graph is None:
+            _graph = _load_airwaygraph()
+        return _graph
+
+
+def _load_airwaygraph():
+    version = f'{navdb_version}-{graph_version}'
+    try:
+        return AirwayGraph(**columncache.load('airwaygraph', version)['graph'])
+    except cachefile.CacheError as e:
+        print(e.args[0])
+    wptdata, wpindex = load_navpart('wpt')
+    awydata, _ = load_navpart('awy')
+    graph = AirwayGraph.fromnavdata(wptdata['wplat'], wptdata['wplon'], wpindex['wpid'], awydata)
+    columncache.save('airwaygraph', version, dict(graph=graph.tocolumns()))
+    return AirwayGraph(**columncache.load('airwaygraph', version)['graph'])
+
+
+class AirwayGraph:
+    ''' Directed graph of airway legs between waypoints, in CSR form.
+
+        Arguments:
+        - indptr: Position in indices of the first leg from each waypoint
+        - indices: Waypoint index of the end of each leg
+        - dist: Length of each leg [nm]
+        - leg: Index in the navdb airway arrays of each leg
+        - lat, lon: Position of each waypoint [deg]
+    '''
+    def __init__(self, indptr, indices, dist, leg, lat, lon):
+        self.indptr = indptr
+        self.indices = indices
+        self.dist = dist
+        self.leg = leg
+        self.lat = lat
+        self.lon = lon
+        self._matrix = None
+        self._nodeindex = None
+
+    @classmethod
+    def fromnavdata(cls, wplat, wplon, wpidindex, awydata):
+        ''' Build the airway graph from navdb waypoints and airway legs.
+
+            Each end point of a leg is the waypoint with the same name that
+            is closest to the position of the end point. End points without
+            waypoint within MAXOFFSET nm are left out, with their legs.
+
+            Arguments:
+            - wplat, wplon: Waypoint positions [deg]
+            - wpidindex: NameIndex of the waypoint names
+            - awydata: Dict with the airway leg columns of the navdata
+        '''
+        nlegs = len(awydata['awid'])
+        names = list(awydata['awfromwpid']) + list(awydata['awtowpid'])
+        lat = np.concatenate((awydata['awfromlat'], awydata['awtolat']))
+        lon = np.concatenate((awydata['awfromlon'], awydata['awtolon']))
+        iwp = closest_waypoints(names, lat, lon, wplat, wplon, wpidindex)
+        ifrom, ito = iwp[:nlegs], iwp[nlegs:]
+
+        # Legs in both directions, without duplicates (legs of multiple airways)
+        valid = np.flatnonzero((ifrom >= 0) & (ito >= 0) & (ifrom != ito))
+        src = np.concatenate((ifrom[valid], ito[valid]))
+        dst = np.concatenate((ito[valid], ifrom[valid]))
+        leg = np.concatenate((valid, valid))
+        nwp = len(wplat)
+        _, first = np.unique(src * nwp + dst, return_index=True)
+        src, dst, leg = src[first], dst[first], leg[first]
+
+        # Edges are sorted by source waypoint by np.unique
+        indptr = np.searchsorted(src, np.arange(nwp + 1))
+        dist = geo.kwikdist(wplat[src], wplon[src], wplat[dst], wplon[dst])
+        return cls(indptr, dst, np.asarray(dist, dtype=float), leg,
+                   np.asarray(wplat, dtype=float), np.asarray(wplon, dtype=float))
+
+    def tocolumns(self):
+        ''' Return the graph as dict of columns, for the column cache. '''
+        return dict(indptr=self.indptr, indices=self.indices, dist=self.dist,
+                    leg=self.leg, lat=self.lat, lon=self.lon)
+
+    @property
+    def nwp(self):
+        ''' Number of waypoints (nodes) of the graph. '''
+        return len(self.indptr) - 1
+
+    @property
+    def matrix(self):
+        ''' The graph as sparse matrix of leg lengths. '''
+        if self._matrix is None:
+            self._matrix = csr_matrix((self.dist, self.indices, self.indptr),
+                                      shape=(self.nwp, self.nwp))
+        return self._matrix
+
+    def neighbours(self, iwp):
+        ''' Waypoint indices connected to waypoint iwp, and the leg lengths [nm]. '''
+        i0, i1 = self.indptr[iwp], self.indptr[iwp + 1]
+        return self.indices[i0:i1], self.dist[i0:i1]
+
+    def nearest(self, lat, lon):
+        ''' Index of the waypoint on the airway network that is nearest to
+            each position (integer for scalar input, array for arrays). '''
+        if self._nodeindex is None:
+            nodes = np.flatnonzero(np.diff(self.indptr))
+            self._nodeindex = nodes, GridIndex(self.lat[nodes], self.lon[nodes])
+        nodes, index = self._nodeindex
+        inode = index.nearest(lat, lon)
+        if np.ndim(inode) == 0:
+            return int(nodes[inode]) if inode >= 0 else -1
+        return np.where(inode >= 0, nodes[inode], -1)
+
+    def routes(self, orig, dest):
+        ''' Shortest routes along airways for pairs of waypoints.
+
+            Arguments:
+            - orig, dest: Waypoint indices of the origin and destination of
+              each route. Waypoints that are not in the graph (e.g., added
+              with DEFWPT after the graph was built) have no route.
+
+            Returns:
+            - routes: List with an array of waypoint indices for each route,
+              from origin to destination (empty when there is no route)
+            - dist: Length of each route [nm] (inf when there is no route)
+        '''
+        orig = np.atleast_1d(np.asarray(orig, dtype=int))
+        dest = np.atleast_1d(np.asarray(dest, dtype=int))
+        routes = [np.zeros(0, dtype=int)] * len(orig)
+        dist = np.full(len(orig), np.inf)
+        valid = np.flatnonzero((orig >= 0) & (orig < self.nwp) & (dest >= 0) & (dest < self.nwp))
+        origins, inverse = np.unique(orig[valid], return_inverse=True)
+
+        # Search from batches of origins, to limit memory use
+        batch = max(1, MAXSEARCH // max(1, self.nwp))
+        for b0 in range(0, len(origins), batch):
+            sources = origins[b0:b0 + batch]
+            distances, predecessors = dijkstra(self.matrix, indices=sources,
+                                               return_predecessors=True)
+            for ivalid in np.flatnonzero((inverse >= b0) & (inverse < b0 + batch)):
+                iroute, isrc = valid[ivalid], inverse[ivalid] - b0
+                dist[iroute] = distances[isrc, dest[iroute]]
+                if np.isfinite(dist[iroute]):
+                    routes[iroute] = self.path(predecessors[isrc], dest[iroute])
+        return routes, dist
+
+    def route(self, orig, dest):
+        ''' Shortest route along airways from waypoint orig to waypoint dest.
+            Returns an array of waypoint indices, and the route length [nm]. '''
+        routes, dist = self.routes([orig], [dest])
+        return routes[0], dist[0]
+
+    @staticmethod
+    def path(predecessors, dest):
+        ''' Follow the predecessors of a shortest-path tree from dest back to its root. '''
+        path = [dest]
+        while predecessors[path[-1]] >= 0:
+            path.append(predecessors[path[-1]])
+        return np.array(path[::-1], dtype=int)
+
+
+def closest_waypoints(names, lat, lon, wplat, wplon, wpidindex):
+    ''' Index of the waypoint with each name, closest to each lat, lon, or -1
+        when there is no such waypoint within MAXOFFSET nm. '''
+    names = np.array(names, dtype=str)
+    wpnames = np.array(wpidindex.names, dtype=str)
+    pos = np.minimum(np.searchsorted(wpnames, names), len(wpnames) - 1)
+    found = wpnames[pos] == names if len(wpnames) else np.zeros(len(names), dtype=bool)
+
+    # All candidate waypoints of each name, grouped per name, without a python loop
+    start = np.where(found, wpidindex.start[pos], 0)
+    count = np.where(found, wpidindex.start[pos + 1] - start, 0)
+    offset = np.repeat(start - np.cumsum(count) + count, count)
+    cand = wpidindex.order[offset + np.arange(len(offset))]
+    group = np.repeat(np.arange(len(names)), count)
+
+    # Closest candidate of each group (lowest waypoint index for equal distances)
+    d = geo.kwikdist(lat[group], lon[group], wplat[cand], wplon[cand])
+    order = np.lexsort((cand, d, group))
+    grp, first = np.unique(group[order], return_index=True)
+    iwp = np.full(len(names), -1)
+    best = order[first]
+    iwp[grp] = np.where(d[best] < MAXOFFSET, cand[best], -1)
+    return iwp
@@ -0,0 +1,176 @@
+''' Spatial index of navigation database points (waypoints, airports).
+
+    Points are sorted into a global grid of cellsize x cellsize degree cells,
+    stored in compressed form: the points of each cell are stored
+    contiguously, and cellstart gives the position of the first point of
+    each cell. Nearest-point and bounding-box queries only visit the cells
+    around the query position, instead of all points in the database.
+
+    The index refers to points by their index in the navdatabase arrays.
+    Points added after construction (e.g., with DEFWPT) are kept in a small
+    unsorted tail that is searched directly, until the grid is rebuilt.
+'''
+import numpy as np
+
+
+class GridIndex:
+    ''' Grid index of lat/lon points.
+
+        Arguments:
+        - lat, lon: Coordinates of the indexed points [deg]
+        - cellsize: Size of the grid cells [deg]
+    '''
+    def __init__(self, lat, lon, cellsize=0.5):
+        self.cellsize = cellsize
+        self.ny = int(np.ceil(180.0 / cellsize))
+        self.nx = int(np.ceil(360.0 / cellsize))
+        self.lat = np.array(lat, dtype=float)
+        self.lon = np.array(lon, dtype=float)
+        self.build()
+
+    def __len__(self):
+        return len(self.lat)
+
+    def rowcol(self, lat, lon):
+        ''' Grid row and column of coordinates lat, lon. '''
+        row = np.clip(np.floor((np.asarray(lat) + 90.0) / self.cellsize), 0, self.ny - 1)
+        col = np.floor(((np.asarray(lon) + 180.0) % 360.0) / self.cellsize) % self.nx
+        return row.astype(int), col.astype(int)
+
+    def build(self):
+        ''' (Re)build the grid from all points. '''
+        row, col = self.rowcol(self.lat, self.lon)
+        key = row * self.nx + col
+        self.order = np.argsort(key, kind='stable')
+        self.cellstart = np.searchsorted(key[self.order], np.arange(self.ny * self.nx + 1))
+        self.ngrid = len(self.lat)
+
+    def insert(self, lat, lon):
+        ''' Add a point to the index. Its index is the current number of points. '''
+        self.lat = np.append(self.lat, lat)
+        self.lon = np.append(self.lon, lon)
+        # Rebuild when the tail becomes a significant part of each search
+        if len(self.lat) - self.ngrid > max(256, int(np.sqrt(self.ngrid))):
+            self.build()
+
+    def _cells(self, rows, col0, col1, group):
+        ''' Point indices in the given cell ranges, and the group of each point.
+
+            Arguments:
+            - rows: Grid row of each range
+            - col0, col1: First and last column of each range. Columns wrap
+              around at the date line, and a range of nx or more columns
+              covers the entire row.
+            - group: Group (e.g., query) number of each range
+        '''
+        full = col1 - col0 + 1 >= self.nx
+        col0 = np.where(full, 0, col0 % self.nx)
+        col1 = np.where(full, self.nx - 1, col1 % self.nx)
+        # Split ranges that wrap around the date line in two
+        wrap = col1 < col0
+        rows = np.concatenate((rows, rows[wrap]))
+        group = np.concatenate((group, group[wrap]))
+        first = np.concatenate((col0, np.zeros(np.count_nonzero(wrap), dtype=int)))
+        last = np.concatenate((np.where(wrap, self.nx - 1, col1), col1[wrap]))
+
+        start = self.cellstart[rows * self.nx + first]
+        count = self.cellstart[rows * self.nx + last + 1] - start
+        # Consecutive point ranges, without a python loop
+        offset = np.repeat(start - np.cumsum(count) + count, count)
+        return self.order[offset + np.arange(len(offset))], np.repeat(group, count)
+
+    def _block(self, row, col, radius, group):
+        ''' Point indices in blocks of (2 * radius + 1) cells around row, col. '''
+        row0 = np.maximum(0, row - radius)
+        nrows = np.minimum(self.ny - 1, row + radius) - row0 + 1
+        # One range of columns for each row of each block
+        igrp = np.repeat(np.arange(len(row)), nrows)
+        rows = row0[igrp] + np.arange(len(igrp)) - np.repeat(np.cumsum(nrows) - nrows, nrows)
+        return self._cells(rows, col[igrp] - radius[igrp], col[igrp] + radius[igrp], group[igrp])
+
+    @staticmethod
+    def _dist2(lat, lon, wlat, wlon):
+        ''' Squared flat-earth distance [deg^2], scaled with the cosine of
+            the query latitude, as in Navdatabase.getinear. '''
+        dlat = (wlat - lat + 180.0) % 360.0 - 180.0
+        dlon = np.cos(np.radians(lat)) * ((wlon - lon + 180.0) % 360.0 - 180.0)
+        return dlat * dlat + dlon * dlon
+
+    def _closest(self, idx, group, lat, lon, ngroups):
+        ''' Closest point of each group, and its squared distance. Ties are
+            resolved to the lowest point index, as with np.argmin. '''
+        # Append the unsorted tail to each group
+        ntail = len(self.lat) - self.ngrid
+        idx = np.concatenate((idx, np.tile(np.arange(self.ngrid, len(self.lat)), ngroups)))
+        group = np.concatenate((group, np.repeat(np.arange(ngroups), ntail)))
+        d2 = self._dist2(lat[group], lon[group], self.lat[idx], self.lon[idx])
+        order = np.lexsort((idx, d2, group))
+        grp, first = np.unique(group[order], return_index=True)
+        best = np.full(ngroups, -1)
+        bestd2 = np.full(ngroups, np.inf)
+        best[grp] = idx[order[first]]
+        bestd2[grp] = d2[order[first]]
+        return best, bestd2
+
+    def nearest(self, lat, lon):
+        ''' Index of the point nearest to each query position. Returns an
+            integer for scalar input, and an array for array input.
+            Returns -1 when the index is empty. '''
+        scalar = np.ndim(lat) == 0
+        lat = np.atleast_1d(np.asarray(lat, dtype=float))
+        lon = np.atleast_1d(np.asarray(lon, dtype=float))
+        if not len(self.lat):
+            return -1 if scalar else np.full(len(lat), -1)
+        row, col = self.rowcol(lat, lon)
+        nquery = len(lat)
+        maxradius = max(self.nx, self.ny)
+
+        # First find a candidate for each query in blocks of increasing size
+        best = np.full(nquery, -1)
+        bestd2 = np.full(nquery, np.inf)
+        searched = np.ones(nquery, dtype=int)
+        todo = np.arange(nquery)
+        while len(todo):
+            idx, grp = self._block(row[todo], col[todo], searched[todo], np.arange(len(todo)))
+            best[todo], bestd2[todo] = self._closest(idx, grp, lat[todo], lon[todo], len(todo))
+            todo = todo[np.isinf(bestd2[todo]) & (searched[todo] < maxradius)]
+            searched[todo] *= 2
+
+        # All points outside a block of radius r around the query cell are
+        # at least f * r * cellsize degrees away: search the block that is
+        # guaranteed to contain the nearest point, if it is larger than the
+        # block that was already searched
+        f = np.cos(np.radians(lat))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            radius = np.ceil(np.sqrt(bestd2) / (f * self.cellsize))
+        radius = np.where(np.isfinite(radius), np.minimum(radius, maxradius), maxradius)
+        todo = np.flatnonzero(radius > searched)
+        if len(todo):
+            idx, grp = self._block(row[todo], col[todo], radius[todo].astype(int),
+                                   np.arange(len(todo)))
+            best[todo], _ = self._closest(idx, grp, lat[todo], lon[todo], len(todo))
+        return int(best[0]) if scalar else best
+
+    def inside(self, lat0, lat1, lon0, lon1):
+        ''' Indices of the points inside a box, in ascending order. As in
+            Navdatabase.getinside, points on the border are not included. '''
+        if not lat0 < lat1:
+            # Not a regular box: test all points
+            mask = (self.lat > lat1) | (self.lat < lat0) & \
+                (self.lon > lon0) & (self.lon < lon1)
+            return np.flatnonzero(mask)
+        row0, col0 = self.rowcol(lat0, lon0)
+        row1, col1 = self.rowcol(lat1, lon1)
+        # Boxes spanning the full circle, or with lon1 < lon0 (which contain no points)
+        ncols = self.nx if lon1 - lon0 >= 360.0 else (col1 - col0) % self.nx + 1
+        rows = np.arange(row0, row1 + 1)
+        idx, _ = self._cells(rows, np.full(len(rows), col0), np.full(len(rows), col0 + ncols - 1),
+                             np.zeros(len(rows), dtype=int))
+        idx = np.concatenate((idx, np.arange(self.ngrid, len(self.lat))))
+        wlat, wlon = self.lat[idx], self.lon[idx]
+        mask = (wlat > lat0) & (wlat < lat1) & (wlon > lon0) & (wlon < lon1)
+        return np.sort(idx[mask])
+
+    def insideall(self, lat0, lat1, lon0, lon1):
+        ''' Indices of the points inside each of a sequence of boxes. '''
+        return [self.inside(*box) for box in zip(lat0, lat1, lon0, lon1)]
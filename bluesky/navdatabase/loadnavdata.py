@@ -1,42 +1,165 @@
 ''' Loader functions for navigation data. '''
-import pickle
+from collections.abc import Mapping
+import threading
+import numpy as np
 
 from bluesky import settings
-from bluesky.tools import cachefile
-from .loadnavdata_txt import loadnavdata_txt, loadthresholds_txt
+from bluesky.tools import cachefile, columncache
+from .loadnavdata_fast import loadnavdata_fast
+from .nameindex import NameIndex
 
 
 # Cache versions: increment these to the current date if the source data is updated
 # or other reasons why the cache needs to be updated
-navdb_version = 'v20170101'
+navdb_version = 'v20261019'
 
 ## Default settings
 settings.set_variable_defaults(navdata_path='data/navdata')
 
 sourcedir = settings.navdata_path
 
+# The parts of the navigation database (waypoints, airports, airways, FIRs,
+# countries, and runway thresholds), and the tables of the navdata cache
+# that each part is loaded from
+PARTS = dict(wpt=('wpt', 'names.wpid'),
+             apt=('apt', 'names.apid'),
+             awy=('awy', 'names.awid', 'names.awfromwpid', 'names.awtowpid'),
+             fir=('fir',),
+             co=('co',),
+             rwy=('rwy',))
+
+# Each part of the navdata is loaded only once per process. This avoids
+# re-reading the cache at each simulation reset, and allows nodes forked
+# from a warm node pool to share the data loaded by the template process.
+_navparts = dict()
+_lock = threading.Lock()
+
 
 def load_navdata():
-    ''' Load navigation database. '''
-    with cachefile.openfile('navdata.p', navdb_version) as cache:
-        try:
-            wptdata       = cache.load()
-            awydata       = cache.load()
-            aptdata       = cache.load()
-            firdata       = cache.load()
-            codata        = cache.load()
-            rwythresholds = cache.load()
-        except (pickle.PickleError, cachefile.CacheError) as e:
-            print(e.args[0])
-
-            wptdata, aptdata, awydata, firdata, codata = loadnavdata_txt()
-            rwythresholds = loadthresholds_txt()
-
-            cache.dump(wptdata)
-            cache.dump(awydata)
-            cache.dump(aptdata)
-            cache.dump(firdata)
-            cache.dump(codata)
-            cache.dump(rwythresholds)
-
-    return wptdata, aptdata, awydata, firdata, codata, rwythresholds
+    ''' Load all parts of the navigation database. '''
+    return join_navparts([load_navpart(part) for part in PARTS])
+
+
+def load_navpart(part):
+    ''' Load one part of the navigation database. Parts are loaded on first
+        use, and can be loaded from different threads.
+
+        Arguments:
+        - part: Name of the part (see PARTS)
+
+        Returns:
+        - The data of the part, and a dict with its name indices.
+    '''
+    with _lock:
+        if part not in _navparts:
+            _navparts[part] = unpack_navpart(part, _load_tables(PARTS[part]))
+        return _navparts[part]
+
+
+def _load_tables(names):
+    ''' Load tables from the navdata cache, or build the cache from source files. '''
+    try:
+        return columncache.load('navdata', navdb_version, names)
+    except cachefile.CacheError as e:
+        print(e.args[0])
+
+    wptdata, aptdata, awydata, firdata, codata, rwythresholds = loadnavdata_fast()
+    nameindex = make_nameindex(wptdata, aptdata, awydata)
+    columncache.save('navdata', navdb_version, pack_navdata(
+        wptdata, aptdata, awydata, firdata, codata, rwythresholds, nameindex))
+    # Always return the data as loaded from cache, so that its types don't
+    # depend on whether the cache existed
+    return columncache.load('navdata', navdb_version, names)
+
+
+class RunwayThresholds(Mapping):
+    ''' Dict of airports, with a dict of the runway thresholds per airport.
+        It is built from the runway columns of the navdata cache on first use. '''
+    def __init__(self, apt, nrwy, rwy, thr):
+        self.columns = (apt, nrwy, rwy, thr)
+        self._data = None
+
+    @property
+    def data(self):
+        if self._data is None:
+            apt, nrwy, rwy, thr = self.columns
+            thr = list(map(tuple, thr.tolist()))
+            end = np.cumsum(nrwy).tolist()
+            rwy = list(rwy)
+            self._data = {a: dict(zip(rwy[i1 - n:i1], thr[i1 - n:i1]))
+                          for a, n, i1 in zip(apt, nrwy.tolist(), end)}
+        return self._data
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+
+def pack_navdata(wptdata, aptdata, awydata, firdata, codata, rwythresholds, nameindex):
+    ''' Convert navigation data to tables of columns for the column cache. '''
+    # FIR borders are stored as concatenated lat/lon columns
+    fir = dict(name=[f[0] for f in firdata['fir']],
+               npoints=np.array([len(f[1]) for f in firdata['fir']], dtype=int),
+               lat=np.array([lat for f in firdata['fir'] for lat in f[1]]),
+               lon=np.array([lon for f in firdata['fir'] for lon in f[2]]))
+    fir.update({key: value for key, value in firdata.items() if key != 'fir'})
+
+    # Runway thresholds are stored per runway, with the number of runways per airport
+    rwy = dict(apt=list(rwythresholds), nrwy=np.array([len(r) for r in rwythresholds.values()], dtype=int),
+               rwy=[rwy for r in rwythresholds.values() for rwy in r],
+               thr=np.array([thr for r in rwythresholds.values() for thr in r.values()]).reshape(-1, 3))
+
+    tables = dict(wpt=wptdata, apt=aptdata, awy=awydata, fir=fir, co=codata, rwy=rwy)
+    # Numeric lists are stored as arrays, so that they are memory-mapped on load
+    tables = {name: {key: np.array(col) if isinstance(col, list) and col and not isinstance(col[0], str) else col
+                     for key, col in table.items()} for name, table in tables.items()}
+    tables.update({'names.' + key: index.tocolumns() for key, index in nameindex.items()})
+    return tables
+
+
+def unpack_navdata(tables):
+    ''' Convert tables of columns from the column cache to navigation data. '''
+    return join_navparts([unpack_navpart(part, {name: tables[name] for name in names})
+                          for part, names in PARTS.items()])
+
+
+def unpack_navpart(part, tables):
+    ''' Convert the cache tables of one part of the navigation database to
+        navigation data. Returns the data, and a dict with the name indices. '''
+    nameindex = {key[6:]: NameIndex.fromcolumns(**table) for key, table in tables.items()
+                 if key.startswith('names.')}
+    if part == 'fir':
+        fir = tables['fir']
+        data = {key: value for key, value in fir.items()
+                if key not in ('name', 'npoints', 'lat', 'lon')}
+        end = np.cumsum(fir['npoints'])
+        data['fir'] = [[name, fir['lat'][i1 - n:i1].tolist(), fir['lon'][i1 - n:i1].tolist()]
+                       for name, n, i1 in zip(fir['name'], fir['npoints'].tolist(), end.tolist())]
+    elif part == 'rwy':
+        data = RunwayThresholds(**tables['rwy'])
+    else:
+        data = tables[part]
+    return data, nameindex
+
+
+def join_navparts(parts):
+    ''' Combine the (data, nameindex) tuples of all parts, in the order of
+        PARTS, to the tuple of data returned by load_navdata(). '''
+    nameindex = dict()
+    for _, index in parts:
+        nameindex.update(index)
+    return tuple(data for data, _ in parts) + (nameindex,)
+
+
+def make_nameindex(wptdata, aptdata, awydata):
+    ''' Create the name indices of waypoints, airports, and airways. '''
+    return dict(wpid=NameIndex(wptdata['wpid']),
+                apid=NameIndex(aptdata['apid']),
+                awid=NameIndex(awydata['awid']),
+                awfromwpid=NameIndex(awydata['awfromwpid']),
+                awtowpid=NameIndex(awydata['awtowpid']))
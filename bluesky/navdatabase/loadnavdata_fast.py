@@ -0,0 +1,126 @@
+''' Fast loader of navigation data from text files.
+
+    Produces the same data as loadnavdata_txt. Of apt.dat, which is by far
+    the largest file, only the airport and runway records are split, and
+    runway thresholds are calculated for all runways at once. The other
+    files are parsed line by line with the loaders of loadnavdata_txt.
+    The files are independent, and can be parsed in parallel in a pool of
+    processes (see the navdata_parse_workers setting).
+
+    When apt.dat contains records that the fast parser does not expect, the
+    file is parsed again with the line-by-line parser of loadnavdata_txt.
+'''
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import re
+from zipfile import ZipFile
+import numpy as np
+
+from bluesky import settings
+from . import loadnavdata_txt as txt
+
+## Default settings
+# Number of processes used to parse the navdata files. With zero, the files
+# are parsed one after the other in the current process.
+settings.set_variable_defaults(navdata_parse_workers=0)
+
+# Characters that str.split() and str.strip() treat as whitespace in ascii text
+WS = r'\t\n\x0b\x0c\r\x1c-\x1f '
+
+# Airport (1) and runway (100) records in apt.dat
+APTRECORD = re.compile(rf'^[{WS}]*(?:1|100)(?:[{WS}][^\n]*)?$', re.M)
+
+# Size of the blocks in which apt.dat is read
+BLOCKSIZE = 1 << 24
+
+
+def loadthresholds_fast():
+    ''' Runway threshold loader for navdatabase. '''
+    apids = []
+    runways = []
+    zfile = ZipFile(Path(settings.navdata_path) / 'apt.zip')
+    print("Reading apt.dat from apt.zip")
+    with zfile.open('apt.dat', 'r') as f:
+        while True:
+            # Read blocks of whole lines, and only split airport and runway records
+            block = f.read(BLOCKSIZE)
+            if not block:
+                break
+            block += f.readline()
+            for match in APTRECORD.finditer(block.decode(encoding='ascii', errors='ignore')):
+                elems = match.group().split()
+                if elems[0] == '1':
+                    apids.append(elems[4])
+                # Only asphalt and concrete runways
+                elif int(elems[2]) <= 2:
+                    if not apids:
+                        raise ValueError('Runway record before first airport record')
+                    runways.append((len(apids) - 1, elems[8], elems[17],
+                                    elems[9], elems[10], elems[11],
+                                    elems[18], elems[19], elems[20]))
+
+    iapt, rwy0, rwy1, lat0, lon0, offset0, lat1, lon1, offset1 = \
+        zip(*runways) if runways else [()] * 9
+    lat0, lon0, lat1, lon1 = (np.radians(list(map(float, c))) for c in (lat0, lon0, lat1, lon1))
+    offset0, offset1 = np.array(list(map(float, offset0))), np.array(list(map(float, offset1)))
+
+    # Opposite runways are on the same line: two thresholds per line
+    thr0 = zip(*(c.tolist() for c in txt.thresholds(lat0, lon0, lat1, lon1, offset0)))
+    thr1 = zip(*(c.tolist() for c in txt.thresholds(lat1, lon1, lat0, lon0, offset1)))
+
+    curthresholds = [dict() for _ in apids]
+    for i, r0, r1, t0, t1 in zip(iapt, rwy0, rwy1, thr0, thr1):
+        curthresholds[i][r0] = t0
+        curthresholds[i][r1] = t1
+
+    # Airports that occur more than once only keep the runways of their last record
+    rwythresholds = dict()
+    for apid, thresholds in zip(apids, curthresholds):
+        rwythresholds[apid] = thresholds
+    return rwythresholds
+
+
+# Fast and line-by-line loader of each part of the navigation data. Only
+# apt.dat has a fast loader: for the other files it is not faster than
+# parsing them line by line.
+LOADERS = dict(wpt=(txt.loadwpt_txt, txt.loadwpt_txt),
+               apt=(txt.loadapt_txt, txt.loadapt_txt),
+               awy=(txt.loadawy_txt, txt.loadawy_txt),
+               fir=(txt.loadfir_txt, txt.loadfir_txt),
+               co=(txt.loadco_txt, txt.loadco_txt),
+               thr=(loadthresholds_fast, txt.loadthresholds_txt))
+
+
+def parse(part, navdata_path=None):
+    ''' Parse one part of the navigation data with the fast loader, and fall
+        back to the line-by-line loader when this fails. '''
+    if navdata_path is not None:
+        # Settings are not inherited by spawned worker processes
+        settings.navdata_path = navdata_path
+    fast, slow = LOADERS[part]
+    try:
+        return fast()
+    except (ValueError, IndexError, KeyError, TypeError) as e:
+        print(f'Fast parser of navdata part {part} failed ({e}), reading line by line')
+        return slow()
+
+
+def loadnavdata_fast(workers=None):
+    ''' Load waypoint, airport, airway, FIR, and country data, and runway
+        thresholds from text files.
+
+        Arguments:
+        - workers: Number of worker processes. When None, the
+          navdata_parse_workers setting is used.
+    '''
+    workers = settings.navdata_parse_workers if workers is None else workers
+    parts = list(LOADERS)
+    if workers > 0:
+        try:
+            with ProcessPoolExecutor(min(workers, len(parts))) as pool:
+                data = list(pool.map(parse, parts, [settings.navdata_path] * len(parts)))
+            return tuple(data)
+        except (OSError, RuntimeError) as e:
+            # E.g., when processes cannot be started on this platform
+            print(f'Parallel navdata parsing failed ({e}), parsing serially')
+    return tuple(parse(part) for part in parts)
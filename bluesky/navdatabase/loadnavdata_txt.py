@@ -10,6 +10,17 @@ REARTH_INV = 1.56961231e-7
 
 
 def loadnavdata_txt():
+    ''' Load waypoint, airport, airway, FIR, and country data from text files. '''
+    wptdata = loadwpt_txt()
+    awydata = loadawy_txt()
+    aptdata = loadapt_txt()
+    firdata = loadfir_txt()
+    codata = loadco_txt()
+    return wptdata, aptdata, awydata, firdata, codata
+
+
+def loadwpt_txt():
+    ''' Load navaids (nav.dat) and fixes (fix.dat). '''
     #----------  Read  nav.dat file (nav aids) ----------
     wptdata         = dict()
     wptdata['wpid']    = []              # identifier (string)
@@ -136,7 +147,11 @@ def loadnavdata_txt():
     # Convert lists for lat,lon to numpy-array for vectorised clipping
     wptdata['wplat']   = np.array(wptdata['wplat'])
     wptdata['wplon']   = np.array(wptdata['wplon'])
+    return wptdata
 
+
+def loadawy_txt():
+    ''' Load airway legs (awy.dat). '''
     #----------  Read  awy.dat file (airway legs) ----------
     awydata   = dict()
 
@@ -209,7 +224,11 @@ def loadnavdata_txt():
         awydata['awfromlon'] = np.array(awydata['awfromlon'])
         awydata['awtolat']   = np.array(awydata['awtolat'])
         awydata['awtolon']   = np.array(awydata['awtolon'])
+    return awydata
+
 
+def loadapt_txt():
+    ''' Load airports (airports.dat). '''
     #----------  Read airports.dat file ----------
     aptdata           = dict()
     aptdata['apid']      = []              # 4 char identifier (string)
@@ -267,7 +286,11 @@ def loadnavdata_txt():
     aptdata['apmaxrwy'] = np.array(aptdata['apmaxrwy'])
     aptdata['aptype']   = np.array(aptdata['aptype'])
     aptdata['apelev']   = np.array(aptdata['apelev'])
+    return aptdata
 
+
+def loadfir_txt():
+    ''' Load FIR borders (fir/*.txt). '''
     #----------  Read FIR files ----------
     firdata         = dict()
     firdata['fir']     = []
@@ -316,7 +339,11 @@ def loadnavdata_txt():
     firdata['firlat1'] = np.array(firdata['firlat1'])
     firdata['firlon0'] = np.array(firdata['firlon0'])
     firdata['firlon1'] = np.array(firdata['firlon1'])
+    return firdata
+
 
+def loadco_txt():
+    ''' Load ICAO country codes (icao-countries.dat). '''
     #----------  Read ICAO country codes file icao-countries.dat ----------
     codata           = dict()
     codata['coname']   = []              # Country name
@@ -348,8 +375,7 @@ def loadnavdata_txt():
             except:
                 codata['conr'].append(-1)
 
-
-    return wptdata, aptdata, awydata, firdata, codata
+    return codata
 
 
 def loadthresholds_txt():
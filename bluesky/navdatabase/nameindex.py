@@ -0,0 +1,85 @@
+''' Index of navigation database items by name.
+
+    Waypoint names are heavily duplicated worldwide. Instead of scanning
+    the list of names for each lookup, the name index stores the indices
+    of all items with the same name contiguously (in ascending order), so
+    that all items with a given name are found with a single dict lookup.
+'''
+import numpy as np
+
+
+class NameIndex:
+    ''' Index of a list of names, giving the indices of all items with a given name.
+
+        Arguments:
+        - names: List of (possibly duplicate) names
+    '''
+    def __init__(self, names=()):
+        unique, inverse = np.unique(np.array(names, dtype=str), return_inverse=True)
+        self.names = unique.tolist()
+        self.order = np.argsort(inverse, kind='stable')
+        self.start = np.concatenate(([0], np.cumsum(np.bincount(inverse, minlength=len(unique)))))
+        self.parent = None
+        self._lookup = None
+        # Names added after construction
+        self.extra = dict()
+
+    @classmethod
+    def fromcolumns(cls, names, order, start):
+        ''' Create an index from the columns returned by tocolumns(). '''
+        index = cls.__new__(cls)
+        index.names, index.order, index.start = names, order, start
+        index.parent = index._lookup = None
+        index.extra = dict()
+        return index
+
+    def tocolumns(self):
+        ''' Return the indexed data as a dict of columns, e.g., for storage
+            in a column cache. Names added after construction are not included. '''
+        return dict(names=self.names, order=self.order, start=self.start)
+
+    @property
+    def lookup(self):
+        ''' Dict with the position of each name in the index. It is built on
+            first use, so that loading an index from cache is fast. '''
+        if self._lookup is None:
+            self._lookup = self.parent.lookup if self.parent else \
+                dict(zip(self.names, range(len(self.names))))
+        return self._lookup
+
+    def copy(self):
+        ''' Return a copy of this index that shares the indexed data, but
+            keeps its own list of added names. '''
+        index = NameIndex.fromcolumns(self.names, self.order, self.start)
+        index.parent = self.parent or self
+        return index
+
+    def add(self, name, idx):
+        ''' Add item idx with name to the index. Added items should have
+            higher indices than all existing items. '''
+        self.extra.setdefault(name, []).append(idx)
+
+    def get(self, name):
+        ''' Return the indices of all items with name, in ascending order. '''
+        i = self.lookup.get(name)
+        idx = self.order[self.start[i]:self.start[i + 1]] if i is not None \
+            else np.zeros(0, dtype=int)
+        extra = self.extra.get(name)
+        return np.append(idx, extra).astype(int) if extra else idx
+
+    def first(self, name):
+        ''' Return the index of the first item with name, or -1 if not found. '''
+        i = self.lookup.get(name)
+        if i is not None:
+            return int(self.order[self.start[i]])
+        extra = self.extra.get(name)
+        return extra[0] if extra else -1
+
+    def count(self, name):
+        ''' Return the number of items with name. '''
+        i = self.lookup.get(name)
+        n = 0 if i is None else int(self.start[i + 1] - self.start[i])
+        return n + len(self.extra.get(name, ()))
+
+    def __contains__(self, name):
+        return name in self.lookup or name in self.extra
@@ -1,12 +1,34 @@
 from math import *
+import threading
 import numpy as np
 
-from .loadnavdata import load_navdata
+from .loadnavdata import load_navpart
+from .gridindex import GridIndex
+from .airwaygraph import load_airwaygraph
+from bluesky import settings
 from bluesky.tools import geo
 from bluesky.tools.aero import nm
-from bluesky.tools.misc import findall
 import bluesky as bs
 
+## Default settings
+# Load all parts of the navigation database in a background thread at each
+# reset, instead of when they are first used
+settings.set_variable_defaults(navdata_prefetch=False)
+
+# Attributes of each part of the navigation database
+PARTATTRS = dict(
+    wpt=('wpid', 'wplat', 'wplon', 'wptype', 'wpelev', 'wpvar', 'wpfreq', 'wpdesc',
+         'wpidindex', 'wpindex'),
+    apt=('aptid', 'aptname', 'aptlat', 'aptlon', 'aptmaxrwy', 'aptype', 'aptco', 'aptelev',
+         'aptidindex', 'aptindex'),
+    awy=('awfromwpid', 'awfromlat', 'awfromlon', 'awtowpid', 'awtolat', 'awtolon', 'awid',
+         'awndir', 'awlowfl', 'awupfl', 'awidindex', 'awfromindex', 'awtoindex'),
+    fir=('fir', 'firlat0', 'firlon0', 'firlat1', 'firlon1'),
+    co=('coname', 'cocode2', 'cocode3', 'conr'),
+    rwy=('rwythresholds',),
+    awg=('awgraph',))
+ATTRPART = {attr: part for part, attrs in PARTATTRS.items() for attr in attrs}
+
 class Navdatabase:
     """
     Navdatabase class definition : command stack & processing class
@@ -41,59 +63,130 @@ class Navdatabase:
     def __init__(self):
         """The navigation database: Contains waypoint, airport, airway, and sector data, but also
            geographical graphics data."""
-        # Variables are initialized in reset()
+        # Parts of the database are loaded on first use, see reset()
+        self.lock = threading.Lock()
+        self.loaded = set()
         self.reset()
 
     def reset(self):
-        print("Loading global navigation database...")
-        wptdata, aptdata, awydata, firdata, codata, rwythresholds = load_navdata()
-
-        # Get waypoint data
-        self.wpid     = wptdata['wpid']       # identifier (string)
-        self.wplat    = wptdata['wplat']      # latitude [deg]
-        self.wplon    = wptdata['wplon']      # longitude [deg]
-        self.wptype   = wptdata['wptype']     # type (string)
-        self.wpelev   = wptdata['wpelev']     # elevation [m]
-        self.wpvar    = wptdata['wpvar']      # magn variation [deg]
-        self.wpfreq   = wptdata['wpfreq']       # frequency [kHz/MHz]
-        self.wpdesc   = wptdata['wpdesc']     # description
-
-        # Get airway legs data
-        self.awfromwpid = awydata['awfromwpid']  # identifier (string)
-        self.awfromlat  = awydata['awfromlat']   # latitude [deg]
-        self.awfromlon  = awydata['awfromlon']   # longitude [deg]
-        self.awtowpid   = awydata['awtowpid']    # identifier (string)
-        self.awtolat    = awydata['awtolat']     # latitude [deg]
-        self.awtolon    = awydata['awtolon']     # longitude [deg]
-        self.awid       = awydata['awid']        # airway identifier (string)
-        self.awndir     = awydata['awndir']      # number of directions (1 or 2)
-        self.awlowfl    = awydata['awlowfl']     # lower flight level (int)
-        self.awupfl     = awydata['awupfl']      # upper flight level (int)
-
-        # Get airpoint data
-        self.aptid     = aptdata['apid']      # 4 char identifier (string)
-        self.aptname   = aptdata['apname']    # full name
-        self.aptlat    = aptdata['aplat']     # latitude [deg]
-        self.aptlon    = aptdata['aplon']     # longitude [deg]
-        self.aptmaxrwy = aptdata['apmaxrwy']  # max runway length [m]
-        self.aptype    = aptdata['aptype']    # type (int, 1=large, 2=medium, 3=small)
-        self.aptco     = aptdata['apco']      # two char country code (string)
-        self.aptelev   = aptdata['apelev']    # field elevation in meters [m] above mean sea level
-
-        # Get FIR data
-        self.fir      = firdata['fir']        # fir name
-        self.firlat0  = firdata['firlat0']    # start lat of a line of border
-        self.firlon0  = firdata['firlon0']    # start lon of a line of border
-        self.firlat1  = firdata['firlat1']    # end lat of a line of border
-        self.firlon1  = firdata['firlon1']    # end lon of a line of border
-
-        # Get country code data
-        self.coname   = codata['coname']      # country full name
-        self.cocode2  = codata['cocode2']     # country code A2 (asscii2) 2 chars
-        self.cocode3  = codata['cocode3']     # country code A3 (asscii2) 3 chars
-        self.conr     = codata['conr']        # country icao number
-
-        self.rwythresholds = rwythresholds
+        """Reset the navigation database. Each part of the database (waypoints,
+           airports, airways, FIRs, countries, runway thresholds, airway graph) is (re)loaded
+           when one of its attributes is first used, or in the background when
+           the navdata_prefetch setting is True."""
+        with self.lock:
+            for part in self.loaded:
+                for attr in PARTATTRS[part]:
+                    self.__dict__.pop(attr, None)
+            self.loaded.clear()
+
+        if settings.navdata_prefetch:
+            threading.Thread(target=self.prefetch, daemon=True).start()
+
+    def __getattr__(self, name):
+        """Only called for attributes that are not set: load the part of the
+           database that the attribute belongs to."""
+        part = ATTRPART.get(name)
+        if part is None:
+            raise AttributeError(f"'Navdatabase' object has no attribute '{name}'")
+        self.load(part)
+        return self.__dict__[name]
+
+    def load(self, part):
+        """Load a part of the navigation database, if it isn't loaded yet."""
+        with self.lock:
+            if part not in self.loaded:
+                # All attributes of a part are set at once, so that other
+                # threads never see a partially loaded part
+                self.__dict__.update(getattr(self, 'load_' + part)())
+                self.loaded.add(part)
+
+    def prefetch(self):
+        """Load all parts of the navigation database."""
+        for part in PARTATTRS:
+            self.load(part)
+
+    @staticmethod
+    def load_wpt():
+        wptdata, nameindex = load_navpart('wpt')
+        # The string columns are copied because defwpt() appends to them,
+        # while the loaded navdata is shared between resets
+        wp = dict(
+            wpid     = wptdata['wpid'].copy(),     # identifier (string)
+            wplat    = wptdata['wplat'],           # latitude [deg]
+            wplon    = wptdata['wplon'],           # longitude [deg]
+            wptype   = wptdata['wptype'].copy(),   # type (string)
+            wpelev   = wptdata['wpelev'],          # elevation [m]
+            wpvar    = wptdata['wpvar'],           # magn variation [deg]
+            wpfreq   = wptdata['wpfreq'],          # frequency [kHz/MHz]
+            wpdesc   = wptdata['wpdesc'].copy())   # description
+
+        # Name index, copied because defwpt() adds to it, and spatial index
+        # for nearest and bounding-box queries
+        wp['wpidindex'] = nameindex['wpid'].copy()
+        wp['wpindex']   = GridIndex(wp['wplat'], wp['wplon'])
+        return wp
+
+    @staticmethod
+    def load_awy():
+        awydata, nameindex = load_navpart('awy')
+        return dict(
+            awfromwpid  = awydata['awfromwpid'],  # identifier (string)
+            awfromlat   = awydata['awfromlat'],   # latitude [deg]
+            awfromlon   = awydata['awfromlon'],   # longitude [deg]
+            awtowpid    = awydata['awtowpid'],    # identifier (string)
+            awtolat     = awydata['awtolat'],     # latitude [deg]
+            awtolon     = awydata['awtolon'],     # longitude [deg]
+            awid        = awydata['awid'],        # airway identifier (string)
+            awndir      = awydata['awndir'],      # number of directions (1 or 2)
+            awlowfl     = awydata['awlowfl'],     # lower flight level (int)
+            awupfl      = awydata['awupfl'],      # upper flight level (int)
+            awidindex   = nameindex['awid'],
+            awfromindex = nameindex['awfromwpid'],
+            awtoindex   = nameindex['awtowpid'])
+
+    @staticmethod
+    def load_apt():
+        aptdata, nameindex = load_navpart('apt')
+        return dict(
+            aptid      = aptdata['apid'],      # 4 char identifier (string)
+            aptname    = aptdata['apname'],    # full name
+            aptlat     = aptdata['aplat'],     # latitude [deg]
+            aptlon     = aptdata['aplon'],     # longitude [deg]
+            aptmaxrwy  = aptdata['apmaxrwy'],  # max runway length [m]
+            aptype     = aptdata['aptype'],    # type (int, 1=large, 2=medium, 3=small)
+            aptco      = aptdata['apco'],      # two char country code (string)
+            aptelev    = aptdata['apelev'],    # field elevation in meters [m] above mean sea level
+            aptidindex = nameindex['apid'],
+            aptindex   = GridIndex(aptdata['aplat'], aptdata['aplon']))
+
+    @staticmethod
+    def load_fir():
+        firdata, _ = load_navpart('fir')
+        return dict(
+            fir      = firdata['fir'],        # fir name
+            firlat0  = firdata['firlat0'],    # start lat of a line of border
+            firlon0  = firdata['firlon0'],    # start lon of a line of border
+            firlat1  = firdata['firlat1'],    # end lat of a line of border
+            firlon1  = firdata['firlon1'])    # end lon of a line of border
+
+    @staticmethod
+    def load_co():
+        codata, _ = load_navpart('co')
+        return dict(
+            coname   = codata['coname'],      # country full name
+            cocode2  = codata['cocode2'],     # country code A2 (asscii2) 2 chars
+            cocode3  = codata['cocode3'],     # country code A3 (asscii2) 3 chars
+            conr     = codata['conr'])        # country icao number
+
+    @staticmethod
+    def load_rwy():
+        rwythresholds, _ = load_navpart('rwy')
+        return dict(rwythresholds=rwythresholds)
+
+    @staticmethod
+    def load_awg():
+        # Graph of the airway network, for shortest routes along airways
+        return dict(awgraph=load_airwaygraph())
 
     def defwpt(self,name=None,lat=None,lon=None,wptype=None):
 
@@ -106,7 +199,7 @@ class Navdatabase:
         # No data: give info on waypoint
         elif lat==None or lon==None:
             reflat, reflon = bs.scr.getviewctr()
-            if self.wpid.count(name.upper()) > 0:
+            if name.upper() in self.wpidindex:
                 i = self.getwpidx(name.upper(),reflat,reflon)
                 txt = self.wpid[i]+" : "+str(self.wplat[i])+","+str(self.wplon[i])
                 if len(self.wptype[i]+self.wpco[i])>0:
@@ -118,18 +211,20 @@ class Navdatabase:
                 return True,"Waypoint "+name.upper()+" does not yet exist."
 
         # Still here? So there is data, then we add this waypoint
+        self.wpidindex.add(name.upper(), len(self.wpid))
         self.wpid.append(name.upper())
         self.wplat = np.append(self.wplat,lat)
         self.wplon = np.append(self.wplon,lon)
+        self.wpindex.insert(lat, lon)
 
         if wptype == None:
             self.wptype.append("")
         else:
             self.wptype.append(wptype)
 
-        self.wpelev.append(0.0)               # elevation [m]
-        self.wpvar.append(0.0)                # magn variation [deg]
-        self.wpfreq.append(0.0)               # frequency [kHz/MHz]
+        self.wpelev = np.append(self.wpelev, 0.0)   # elevation [m]
+        self.wpvar  = np.append(self.wpvar, 0.0)    # magn variation [deg]
+        self.wpfreq = np.append(self.wpfreq, 0.0)   # frequency [kHz/MHz]
         self.wpdesc.append("Custom waypoint") # description
 
          # Update screen info
@@ -139,82 +234,44 @@ class Navdatabase:
 
     def getwpidx(self, txt, reflat=999999., reflon=999999):
         """Get waypoint index to access data"""
-        name = txt.upper()
-        try:
-            i = self.wpid.index(name)
-        except:
+        idx = self.wpidindex.get(txt.upper())
+        if len(idx) == 0:
             return -1
 
-        # if no pos is specified, get first occurence
-        if not reflat < 99999.:
-            return i
+        # if no pos is specified, or if there is only one, get first occurence
+        if not reflat < 99999. or len(idx) == 1:
+            return int(idx[0])
 
-        # If pos is specified check for more and return closest
-        else:
-            idx = []
-            idx.append(i)
-            found = True
-            while i < len(self.wpid) - 1 and found:
-                try:
-                    i = self.wpid.index(name, i + 1)
-                    idx.append(i)
-                except:
-                    found = False
-            if len(idx) == 1:
-                return idx[0]
-            else:
-                imin = idx[0]
-                dmin = geo.kwikdist(reflat, reflon, self.wplat[imin], self.wplon[imin])
-                for i in idx[1:]:
-                    d = geo.kwikdist(reflat, reflon, self.wplat[i], self.wplon[i])
-                    if d < dmin:
-                        imin = i
-                        dmin = d
-                return imin
+        # If pos is specified return closest
+        return self.getclosest(idx, reflat, reflon)
 
     def getwpindices(self, txt, reflat=999999., reflon=999999,crit=1852.0):
         """Get waypoint index to access data"""
-        name = txt.upper()
-        try:
-            i = self.wpid.index(name)
-        except:
+        idx = self.wpidindex.get(txt.upper()) # find indices of al occurences
+        if len(idx) == 0:
             return [-1]
 
-        # if no pos is specified, get first occurence
-        if not reflat < 99999.:
-            return [i]
+        # if no pos is specified, or if there is only one, get first occurence
+        if not reflat < 99999. or len(idx) == 1:
+            return [int(idx[0])]
 
-        # If pos is specified check for more and return closest
-        else:
-            idx = findall(self.wpid,name) # find indices of al occurences
+        # If pos is specified return closest
+        imin = self.getclosest(idx, reflat, reflon)
+        # Find co-located
+        dist = nm*geo.kwikdist(self.wplat[idx], self.wplon[idx],
+                               self.wplat[imin], self.wplon[imin])
+        colocated = idx[(dist<=crit) * (idx!=imin)]
+        return [imin] + colocated.tolist()
 
-            if len(idx) == 1:
-                return [idx[0]]
-            else:
-                imin = idx[0]
-                dmin = geo.kwikdist(reflat, reflon, self.wplat[imin], self.wplon[imin])
-                for i in idx[1:]:
-                    d = geo.kwikdist(reflat, reflon, self.wplat[i], self.wplon[i])
-                    if d < dmin:
-                        imin = i
-                        dmin = d
-                # Find co-located
-                indices = [imin]
-                for i in idx:
-                    if i!=imin:
-                        dist = nm*geo.kwikdist(self.wplat[i], self.wplon[i], \
-                                            self.wplat[imin], self.wplon[imin])
-                        if dist<=crit:
-                            indices.append(i)
-
-                return indices
+    def getclosest(self, idx, reflat, reflon):
+        """Get the waypoint index out of indices idx that is closest to reflat, reflon"""
+        idx = np.asarray(idx)
+        d = geo.kwikdist(reflat, reflon, self.wplat[idx], self.wplon[idx])
+        return int(idx[np.argmin(d)])
 
     def getaptidx(self, txt):
         """Get waypoint index to access data"""
-        try:
-            return self.aptid.index(txt.upper())
-        except:
-            return -1
+        return self.aptidindex.first(txt.upper())
 
     def getinear(self, wlat, wlon, lat, lon):  # lat,lon in degrees
         # t0 = time.clock()
@@ -228,12 +285,12 @@ class Navdatabase:
         return idx
 
     def getwpinear(self, lat, lon):  # lat,lon in degrees
-        """Get closest waypoint index"""
-        return self.getinear(self.wplat, self.wplon, lat, lon)
+        """Get closest waypoint index (or array of indices for arrays lat, lon)"""
+        return self.wpindex.nearest(lat, lon)
 
     def getapinear(self, lat, lon):  # lat,lon in degrees
-        """Get closest airport index"""
-        return self.getinear(self.aptlat, self.aptlon, lat, lon)
+        """Get closest airport index (or array of indices for arrays lat, lon)"""
+        return self.aptindex.nearest(lat, lon)
 
     def getinside(self, wlat, wlon, lat0, lat1, lon0, lon1):
         """Get indices inside given box"""
@@ -249,11 +306,11 @@ class Navdatabase:
 
     def getwpinside(self, lat0, lat1, lon0, lon1):
         """Get waypoint indices inside box"""
-        return self.getinside(self.wplat, self.wplon, lat0, lat1, lon0, lon1)
+        return list(self.wpindex.inside(lat0, lat1, lon0, lon1))
 
     def getapinside(self, lat0, lat1, lon0, lon1):
         """Get airport indicex inside box"""
-        return self.getinside(self.aptlat, self.aptlon, lat0, lat1, lon0, lon1)
+        return list(self.aptindex.inside(lat0, lat1, lon0, lon1))
 
     # returns all runways of given airport
     def listairway(self, airwayid):
@@ -262,7 +319,7 @@ class Navdatabase:
         airway = []     # identifier of waypoint   0 .. N-1
 
         # Does this airway exist?
-        if self.awid.count(awkey)>0:
+        if awkey in self.awidindex:
             # Collect leg indices
             i = 0
             found = True
@@ -270,7 +327,7 @@ class Navdatabase:
             left  = []  # wps in left column in file
             right = []  # wps in right coumn in file
 
-            idx = findall(self.awid,awkey)
+            idx = self.awidindex.get(awkey)
             for i in idx:
                 newleg = self.awfromwpid[i]+"-"+self.awtowpid[i]
                 if newleg not in legs:
@@ -354,9 +411,8 @@ class Navdatabase:
         connect = []
 
         # Check from-list first
-        if wpid in self.awfromwpid:
-            idx = findall(self.awfromwpid,wpid)
-            for i in idx:
+        if wpid in self.awfromindex:
+            for i in self.awfromindex.get(wpid):
                 newitem = [self.awid[i],self.awtowpid[i]]
                 if (newitem not in connect) and \
                          geo.kwikdist(self.awfromlat[i],self.awfromlon[i],
@@ -364,9 +420,8 @@ class Navdatabase:
                     connect.append(newitem)
 
         # Check to-list nextt
-        if wpid in self.awtowpid:
-            idx = findall(self.awtowpid,wpid)
-            for i in idx:
+        if wpid in self.awtoindex:
+            for i in self.awtoindex.get(wpid):
                 newitem = [self.awid[i],self.awfromwpid[i]]
                 if (newitem not in connect) and \
                          geo.kwikdist(self.awtolat[i],self.awtolon[i],
@@ -1 +1 @@
-from bluesky.network.common import get_ownip
+from bluesky.network.common import get_ownip, endpoint
@@ -0,0 +1,322 @@
+''' Asyncio client for programmatic control of BlueSky simulation nodes.
+
+    Unlike the poll-driven Client class, which is built around a GUI timer,
+    AsyncClient runs its socket I/O as tasks in an asyncio event loop. This
+    allows automation scripts to await stack command completion, simulation
+    state changes, and stream data, and to drive many nodes concurrently
+    from a single controller process.
+
+    Example:
+
+        async def main():
+            client = AsyncClient()
+            await client.connect()
+            nodes = await client.wait_for_nodes(4)
+            await asyncio.gather(*(client.stack('IC myscen', target=node)
+                                   for node in nodes))
+            async for name, data, node in client.streams(b'ACDATA'):
+                ...
+
+        asyncio.run(main())
+'''
+import asyncio
+import os
+from collections import defaultdict
+import zmq
+import zmq.asyncio
+import msgpack
+from bluesky import settings
+from bluesky.network.npcodec import encode_ndarray, decode_ndarray
+from bluesky.network.common import endpoint
+
+
+# Index of the simulation state in the SIMINFO stream tuple
+SIMINFO_STATE = 5
+
+
+class AsyncClient:
+    ''' Asyncio-based client of a BlueSky server. '''
+    def __init__(self):
+        ctx = zmq.asyncio.Context.instance()
+        self.event_io = ctx.socket(zmq.DEALER)
+        self.stream_in = ctx.socket(zmq.SUB)
+        self.host_id = b''
+        self.client_id = b'\x00' + os.urandom(4)
+        self.servers = dict()
+        self.act = b''
+
+        # Last known simulation state and SIMINFO of each node
+        self.nodestate = dict()
+        self.siminfo = dict()
+
+        # Pending stack commands: token -> (future, target node, echoed text)
+        self._pending = dict()
+        # Futures waiting for node state or node list changes
+        self._statewaiters = []
+        self._nodewaiters = []
+        # Queues of active stream iterators, and subscription counts
+        self._streamqueues = defaultdict(list)
+        self._subcount = defaultdict(int)
+        # Queues of active event iterators
+        self._eventqueues = []
+        self._tasks = []
+        self._tokencount = 0
+
+    async def connect(self, hostname=None, event_port=None, stream_port=None, protocol='tcp'):
+        ''' Connect client to a server, and start the receive tasks.
+
+            Arguments:
+            - hostname: Network name or ip of the server to connect to
+            - event_port: Network port to use for event communication
+            - stream_port: Network port to use for stream communication
+            - protocol: Network protocol to use [tcp/ipc/inproc]
+        '''
+        econ = endpoint(protocol, event_port or settings.event_port, hostname)
+        scon = endpoint(protocol, stream_port or settings.stream_port, hostname)
+        self.event_io.setsockopt(zmq.IDENTITY, self.client_id)
+        self.event_io.connect(econ)
+        await self._send(b'REGISTER')
+        self.host_id = (await self.event_io.recv_multipart())[0]
+        self.stream_in.connect(scon)
+        # Node state is always tracked through the SIMINFO stream
+        self._subscribe(b'SIMINFO')
+
+        self._tasks = [asyncio.ensure_future(self._recv_events()),
+                       asyncio.ensure_future(self._recv_streams())]
+
+    async def close(self):
+        ''' Stop the receive tasks and close the sockets. '''
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for fut, _, _ in self._pending.values():
+            if not fut.done():
+                fut.cancel()
+        self._pending.clear()
+        self.event_io.close(linger=0)
+        self.stream_in.close(linger=0)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    # =========================================================================
+    # Node management
+    # =========================================================================
+    def nodes(self):
+        ''' Return a list of the ids of all known simulation nodes. '''
+        return [node for srv in self.servers.values() for node in srv['nodes']]
+
+    def actnode(self, newact=None):
+        ''' Set the new default target node, or return the current one. '''
+        if newact:
+            if self._getroute(newact) is None:
+                raise KeyError(f'AsyncClient: Unknown node {newact}')
+            self.act = newact
+        return self.act
+
+    async def addnodes(self, count=1):
+        ''' Tell the server to add 'count' nodes. '''
+        await self._send(b'ADDNODES', count)
+
+    async def wait_for_nodes(self, count=1, timeout=None):
+        ''' Wait until at least 'count' simulation nodes are known,
+            and return their ids. '''
+        while len(self.nodes()) < count:
+            fut = asyncio.get_running_loop().create_future()
+            self._nodewaiters.append(fut)
+            await asyncio.wait_for(fut, timeout)
+        return self.nodes()
+
+    async def wait_for_state(self, state, target=None, timeout=None):
+        ''' Wait until a simulation node reaches a given state.
+
+            Arguments:
+            - state: The simulation state to wait for (bs.INIT/HOLD/OP/END).
+              Multiple states can be passed as a tuple.
+            - target: The node to wait for. When not given the active node is used.
+            - timeout: Maximum time to wait in seconds.
+
+            Node state is obtained from the SIMINFO stream, which is sent
+            at the sim's siminfo_rate.
+        '''
+        target = target or self.act
+        states = state if isinstance(state, (tuple, list, set)) else (state,)
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while self.nodestate.get(target) not in states:
+            fut = loop.create_future()
+            self._statewaiters.append(fut)
+            await asyncio.wait_for(fut, None if deadline is None else
+                                   max(0.0, deadline - loop.time()))
+        return self.nodestate[target]
+
+    # =========================================================================
+    # Commands and events
+    # =========================================================================
+    async def stack(self, cmdline, target=None, timeout=None):
+        ''' Send a stack command to a node, and wait until it is processed.
+
+            Arguments:
+            - cmdline: The command(s) to stack. Multiple commands can be
+              separated by a semicolon.
+            - target: The node to send to. When not given the active node is used.
+            - timeout: Maximum time to wait in seconds.
+
+            Returns a list of the text echoed by the node in response to
+            the command(s).
+        '''
+        self._tokencount += 1
+        token = f'AIO{self._tokencount}{self.client_id.hex().upper()}'
+        target = target or self.act
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[token] = (fut, target, [])
+        # Completion is detected by having the node echo the token back
+        # after the actual command(s) have been processed
+        try:
+            await self.send_event(b'STACK', f'{cmdline};ECHO {token}', target)
+            return await asyncio.wait_for(fut, timeout)
+        finally:
+            self._pending.pop(token, None)
+
+    async def send_event(self, name, data=None, target=None):
+        ''' Send an event to one or all simulation node(s).
+
+            Arguments:
+            - name: Name of the event
+            - data: Data to send as payload
+            - target: Destination of this event. Event is sent to all nodes
+              if * is specified as target, and to the active node when no
+              target is given.
+        '''
+        target = target or self.act
+        if target == b'*':
+            await self._send(name, data, [target])
+            return
+        rte = self._getroute(target)
+        if rte is None:
+            raise KeyError(f'AsyncClient: Unknown target node {target}')
+        await self._send(name, data, rte + [target])
+
+    async def events(self):
+        ''' Asynchronously iterate over all events received from the nodes.
+
+            Yields tuples of (eventname, data, sender_id).
+        '''
+        queue = asyncio.Queue()
+        self._eventqueues.append(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._eventqueues.remove(queue)
+
+    async def streams(self, *topics, node_id=b''):
+        ''' Asynchronously iterate over stream data.
+
+            Arguments:
+            - topics: The name(s) of the stream(s) to subscribe to.
+            - node_id: Only receive the streams from this node (optional).
+
+            Yields tuples of (streamname, data, sender_id). The subscription
+            is removed when the iterator is closed.
+        '''
+        queue = asyncio.Queue()
+        keys = [topic + node_id for topic in topics]
+        for key in keys:
+            self._streamqueues[key].append(queue)
+            self._subscribe(key)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            for key in keys:
+                self._streamqueues[key].remove(queue)
+                if not self._streamqueues[key]:
+                    del self._streamqueues[key]
+                self._unsubscribe(key)
+
+    # =========================================================================
+    # Internal I/O
+    # =========================================================================
+    def _getroute(self, target):
+        for srv in self.servers.values():
+            if target in srv['nodes']:
+                return srv['route']
+        return None
+
+    def _subscribe(self, key):
+        if self._subcount[key] == 0:
+            self.stream_in.setsockopt(zmq.SUBSCRIBE, key)
+        self._subcount[key] += 1
+
+    def _unsubscribe(self, key):
+        self._subcount[key] -= 1
+        if self._subcount[key] <= 0:
+            del self._subcount[key]
+            self.stream_in.setsockopt(zmq.UNSUBSCRIBE, key)
+
+    async def _send(self, name, data=None, route=None):
+        pydata = msgpack.packb(data, default=encode_ndarray, use_bin_type=True)
+        await self.event_io.send_multipart((route or []) + [name, pydata])
+
+    @staticmethod
+    def _wake(waiters):
+        for fut in waiters:
+            if not fut.done():
+                fut.set_result(None)
+        waiters.clear()
+
+    async def _recv_events(self):
+        while True:
+            msg = await self.event_io.recv_multipart()
+            # Remove send-to-all flag if present
+            if msg[0] == b'*':
+                msg.pop(0)
+            sender_id, *_, eventname, data = msg
+            pydata = msgpack.unpackb(data, object_hook=decode_ndarray, raw=False)
+            if eventname == b'ECHO':
+                text = pydata.get('text', '')
+                if self._echo(text, sender_id):
+                    continue
+            elif eventname == b'NODESCHANGED':
+                self.servers.update(pydata)
+                if not self.act and self.nodes():
+                    self.act = self.nodes()[0]
+                self._wake(self._nodewaiters)
+            for queue in self._eventqueues:
+                queue.put_nowait((eventname, pydata, sender_id))
+
+    def _echo(self, text, sender_id):
+        ''' Match echoed text with pending stack commands. Returns True when
+            the text is a completion token. '''
+        token = text.strip()
+        if token in self._pending:
+            fut, _, lines = self._pending[token]
+            if not fut.done():
+                fut.set_result(lines)
+            return True
+        # All other echo text is attributed to the commands pending at its sender
+        for _, target, lines in self._pending.values():
+            if target == sender_id:
+                lines.append(text)
+        return False
+
+    async def _recv_streams(self):
+        while True:
+            msg = await self.stream_in.recv_multipart()
+            strmname = msg[0][:-5]
+            sender_id = msg[0][-5:]
+            pydata = msgpack.unpackb(msg[1], object_hook=decode_ndarray, raw=False)
+            if strmname == b'SIMINFO':
+                self.siminfo[sender_id] = pydata
+                self.nodestate[sender_id] = pydata[SIMINFO_STATE]
+                self._wake(self._statewaiters)
+            # Pass on to the iterators subscribed to this stream,
+            # either for all nodes or only for this node
+            for key in (strmname, msg[0]):
+                for queue in self._streamqueues.get(key, []):
+                    queue.put_nowait((strmname, pydata, sender_id))
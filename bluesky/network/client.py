@@ -7,6 +7,7 @@ from bluesky import settings
 from bluesky.core import Signal
 from bluesky.stack.clientstack import stack, process
 from bluesky.network.discovery import Discovery
+from bluesky.network.common import endpoint
 from bluesky.network.npcodec import encode_ndarray, decode_ndarray
 
 
@@ -109,11 +110,12 @@ class Client:
             - hostname: Network name or ip of the server to connect to
             - event_port: Network port to use for event communication
             - stream_port: Network port to use for stream communication
-            - protocol: Network protocol to use
+            - protocol: Network protocol to use [tcp/ipc/inproc]. ipc and
+              inproc can only be used for a server on the same host, or
+              in the same process, respectively.
         '''
-        conbase = f'{protocol}://{hostname or "localhost"}'
-        econ = conbase + f':{event_port or settings.event_port}'
-        scon = conbase + f':{stream_port or settings.stream_port}'
+        econ = endpoint(protocol, event_port or settings.event_port, hostname)
+        scon = endpoint(protocol, stream_port or settings.stream_port, hostname)
         self.event_io.setsockopt(zmq.IDENTITY, self.client_id)
         self.event_io.connect(econ)
         self.send_event(b'REGISTER')
@@ -1,4 +1,14 @@
 import socket
+import tempfile
+from pathlib import Path
+import zmq
+from bluesky import settings
+
+# Register settings defaults
+# sim_protocol selects the transport between simulation nodes and the server:
+# tcp (default), ipc (same-host processes), or inproc (same process).
+settings.set_variable_defaults(sim_protocol='tcp')
+
 
 def get_ownip():
     try:
@@ -10,3 +20,28 @@ def get_ownip():
     except:
         pass
     return '127.0.0.1'
+
+
+def local_protocols():
+    ''' Return the host-local transports that are available on this platform,
+        in addition to tcp. '''
+    return ['ipc', 'inproc'] if zmq.has('ipc') else ['inproc']
+
+
+def endpoint(protocol, port, hostname=None, bind=False):
+    ''' Construct a zmq endpoint address.
+
+        Arguments:
+        - protocol: The transport to use [tcp/ipc/inproc]
+        - port: The port number. For ipc and inproc, which don't use ports,
+          the port number is used to create a unique endpoint name.
+        - hostname: Network name or ip of the host to connect to (tcp only)
+        - bind: Set to True to get the address for binding instead of connecting.
+    '''
+    if protocol == 'tcp':
+        return f'tcp://{"*" if bind else hostname or "localhost"}:{port}'
+    if protocol == 'ipc':
+        return f'ipc://{Path(tempfile.gettempdir()) / f"bluesky-{port}"}'
+    if protocol == 'inproc':
+        return f'inproc://bluesky-{port}'
+    raise ValueError(f'Unknown network protocol {protocol}')
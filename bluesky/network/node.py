@@ -6,6 +6,8 @@ import bluesky as bs
 from bluesky import stack
 from bluesky.core.walltime import Timer
 from bluesky.network.npcodec import encode_ndarray, decode_ndarray
+from bluesky.network.common import endpoint
+from bluesky.network import streamlog
 
 
 class Node:
@@ -41,11 +43,12 @@ class Node:
         ''' Connect node to the BlueSky server. '''
         # Initialization of sockets.
         self.event_io.setsockopt(zmq.IDENTITY, self.node_id)
-        self.event_io.connect(f'tcp://localhost:{self.event_port}')
-        self.stream_out.connect(f'tcp://localhost:{self.stream_port}')
+        self.event_io.connect(endpoint(bs.settings.sim_protocol, self.event_port))
+        self.stream_out.connect(endpoint(bs.settings.sim_protocol, self.stream_port))
 
-        # Start communication, and receive this node's ID
-        self.send_event(b'REGISTER')
+        # Start communication, and receive this node's ID. The process id
+        # is passed to allow the server to detect nodes that have died
+        self.send_event(b'REGISTER', os.getpid())
         self.host_id = self.event_io.recv_multipart()[0]
         # print(f'Node connected, id={self.node_id}')
 
@@ -78,4 +81,7 @@ class Node:
         self.event_io.send_multipart(target + [eventname, pydata])
 
     def send_stream(self, name, data):
-        self.stream_out.send_multipart([name + self.node_id, msgpack.packb(data, default=encode_ndarray, use_bin_type=True)])
+        pydata = msgpack.packb(data, default=encode_ndarray, use_bin_type=True)
+        self.stream_out.send_multipart([name + self.node_id, pydata])
+        # Tap the stream output when STREAMREC is on
+        streamlog.record(name, pydata)
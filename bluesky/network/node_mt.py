@@ -2,9 +2,10 @@
 from threading import Thread
 import zmq
 import msgpack
-from bluesky import stack
+from bluesky import settings, stack
 from bluesky.core.walltime import Timer
 from bluesky.network.npcodec import encode_ndarray, decode_ndarray
+from bluesky.network.common import endpoint
 
 class IOThread(Thread):
     ''' Separate thread for node I/O. '''
@@ -15,8 +16,8 @@ class IOThread(Thread):
         fe_stream = ctx.socket(zmq.PUB)
         be_event = ctx.socket(zmq.PAIR)
         be_stream = ctx.socket(zmq.PAIR)
-        fe_event.connect('tcp://localhost:10000')
-        fe_stream.connect('tcp://localhost:10001')
+        fe_event.connect(endpoint(settings.sim_protocol, settings.simevent_port))
+        fe_stream.connect(endpoint(settings.sim_protocol, settings.simstream_port))
 
         be_event.connect('inproc://event')
         be_stream.connect('inproc://stream')
@@ -0,0 +1,210 @@
+''' Pre-forked pool of warm simulation nodes.
+
+    Starting a simulation node as a fresh Python process means that every
+    node re-imports bluesky, loads the navigation database, and loads
+    the performance model coefficients. The node pool instead starts a
+    single template process that performs this initialization once, and
+    then forks off new nodes on request of the server. The forked nodes
+    share the memory pages of the preloaded data with the template process
+    (copy-on-write), which strongly reduces both node start time and
+    per-node memory use.
+
+    The template process is started by the server as:
+        python -m bluesky.network.nodepool [--configfile cfgfile]
+
+    It reads spawn requests from stdin, one per line, with an optional
+    scenario file name, and replies with the process id of each forked
+    node on stdout ('PID <pid>'). The template process reaps its nodes, and
+    reports the exit code of each node that finishes ('EXIT <pid> <code>').
+    As a node is only reaped by the template process, its pid cannot be
+    reused before the server has received its exit code.
+
+    Forking is only available on POSIX systems.
+'''
+import gc
+import os
+import select
+import sys
+from subprocess import Popen, PIPE
+
+
+# Interval in seconds at which the template process reaps finished nodes
+REAP_INTERVAL = 0.1
+
+
+def available():
+    ''' Returns True when nodes can be forked on this platform. '''
+    return hasattr(os, 'fork')
+
+
+class PooledProcess:
+    ''' Handle to a node process forked by the template process.
+        Mimics the parts of the Popen interface that the server uses. '''
+    def __init__(self, pool, pid):
+        self.pool = pool
+        self.pid = pid
+        self.returncode = None
+
+    def poll(self):
+        ''' Check if the node process has finished. The exit code is
+            reported by the template process, which reaps the node. '''
+        if self.returncode is None:
+            self.pool.read()
+        return self.returncode
+
+    def wait(self):
+        ''' Wait for the node process to finish. '''
+        while self.returncode is None and self.pool.read(block=True):
+            pass
+        return self.returncode
+
+
+class NodePool:
+    ''' Server-side interface to the template process of the node pool. '''
+    def __init__(self, altconfig=None):
+        args = [sys.executable, '-m', 'bluesky.network.nodepool']
+        if altconfig:
+            args.extend(['--configfile', altconfig])
+        self.template = Popen(args, stdin=PIPE, stdout=PIPE, bufsize=0)
+        # Handles of the nodes that haven't finished yet, by pid
+        self.nodes = dict()
+        # Replies of the template process that are not yet complete
+        self.buffer = b''
+        self.spawned = []
+
+    def spawn(self, startscn=None):
+        ''' Fork a new node from the template process, and return a handle to it. '''
+        self.template.stdin.write(f'SPAWN {startscn or ""}\n'.encode())
+        while not self.spawned:
+            if not self.read(block=True):
+                raise RuntimeError('Node pool template process has stopped')
+        return self.spawned.pop(0)
+
+    def read(self, block=False):
+        ''' Process the replies of the template process. When block is True,
+            wait for at least one reply. Returns False when the template
+            process has stopped. '''
+        fd = self.template.stdout.fileno()
+        while block or select.select([fd], [], [], 0)[0]:
+            data = os.read(fd, 4096)
+            if not data:
+                # Without template process, nodes can no longer be tracked:
+                # they get the exit code of the template process
+                returncode = self.template.wait()
+                for node in self.nodes.values():
+                    node.returncode = returncode
+                self.nodes.clear()
+                return False
+            *lines, self.buffer = (self.buffer + data).split(b'\n')
+            for line in lines:
+                msg, pid, *code = line.split()
+                if msg == b'PID':
+                    node = self.nodes[int(pid)] = PooledProcess(self, int(pid))
+                    self.spawned.append(node)
+                elif msg == b'EXIT':
+                    self.nodes.pop(int(pid)).returncode = int(code[0])
+            block = block and not lines
+        return True
+
+    def close(self):
+        ''' Stop spawning nodes. The template process keeps reaping the nodes
+            that were already forked, and stops when all of them have finished. '''
+        if not self.template.stdin.closed:
+            self.template.stdin.close()
+
+
+def preload(configfile=None):
+    ''' Perform all node initialization that can be shared between nodes. '''
+    import bluesky as bs
+    from bluesky import settings, tools
+    settings.init(configfile)
+    tools.init()
+
+    # Load the navigation database, and import the traffic and performance
+    # modules, which loads the coefficients of the selected performance model
+    from bluesky.navdatabase.loadnavdata import load_navdata
+    load_navdata()
+    import bluesky.traffic
+    import bluesky.simulation
+    if settings.performance_model == 'openap':
+        from bluesky.traffic.performance.openap import coeff
+        coeff.get_coefficient()
+    elif settings.performance_model == 'bada':
+        from bluesky.traffic.performance.bada import coeff_bada
+        coeff_bada.init(settings.perf_path_bada)
+
+    # Move all preloaded objects to the permanent generation, to avoid that
+    # garbage collection in the nodes touches (and thereby copies) their pages
+    gc.collect()
+    gc.freeze()
+
+
+def run_node(configfile=None, scenfile=None):
+    ''' Initialize and run a forked node. Never returns. '''
+    import bluesky as bs
+    try:
+        bs.init(mode='sim', configfile=configfile, scenfile=scenfile or None)
+        bs.net.connect()
+        bs.net.run()
+    finally:
+        os._exit(0)
+
+
+def reap(reply, block=False):
+    ''' Reap finished nodes, and report their exit codes to the server.
+        When block is True, wait until all nodes have finished. '''
+    while True:
+        try:
+            pid, status = os.waitpid(-1, 0 if block else os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            break
+        reply.write(f'EXIT {pid} {os.waitstatus_to_exitcode(status)}\n')
+    reply.flush()
+
+
+def main():
+    ''' Main loop of the template process. '''
+    configfile = None
+    if '--configfile' in sys.argv:
+        configfile = sys.argv[sys.argv.index('--configfile') + 1]
+
+    # Reply channel to the server. Normal prints are redirected to stderr,
+    # so that they don't interfere with the pid replies on stdout.
+    reply = sys.stdout
+    sys.stdout = sys.stderr
+    preload(configfile)
+
+    # Spawn requests are read directly from the stdin file descriptor, as
+    # select doesn't see lines that are buffered by sys.stdin
+    fd = sys.stdin.fileno()
+    buffer = b''
+    while True:
+        readable = select.select([fd], [], [], REAP_INTERVAL)[0]
+        reap(reply)
+        if not readable:
+            continue
+        data = os.read(fd, 4096)
+        if not data:
+            break
+        *lines, buffer = (buffer + data).split(b'\n')
+        for line in lines:
+            cmd, _, scenfile = line.decode().strip().partition(' ')
+            if cmd != 'SPAWN':
+                continue
+            pid = os.fork()
+            if pid == 0:
+                # The forked node doesn't use the server's pipes
+                sys.stdin.close()
+                os.dup2(sys.stderr.fileno(), reply.fileno())
+                run_node(configfile, scenfile)
+            reply.write(f'PID {pid}\n')
+            reply.flush()
+
+    # The server stops spawning nodes: wait for the remaining nodes
+    reap(reply, block=True)
+
+
+if __name__ == '__main__':
+    main()
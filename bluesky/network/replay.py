@@ -0,0 +1,175 @@
+''' Replay node: serves a stream recording back to BlueSky clients.
+
+    A replay node registers with a BlueSky server like a simulation node,
+    but instead of running the traffic simulation it sends the stream
+    messages from a recording made with STREAMREC. Replay speed can be
+    set arbitrarily, and the replay can jump to any time in the recording.
+    At high replay speeds, only the most recent message of each
+    full-state stream (e.g., ACDATA) is sent per update.
+
+    Start a replay node with:
+        python -m bluesky.network.replay recordingfile [--configfile cfgfile]
+
+    The replay node accepts the following stack commands:
+        OP/RUN, HOLD, DTMULT/SPEED factor, SEEK time, ECHO text
+'''
+import os
+import sys
+import time
+import msgpack
+import zmq
+
+from bluesky import settings
+from bluesky.network.common import endpoint
+from bluesky.network.npcodec import encode_ndarray
+from bluesky.network.streamlog import StreamReader
+
+
+# Simulation states (as defined in the bluesky package)
+INIT, HOLD, OP, END = list(range(4))
+
+# Streams of which each message contains the complete state, so that only
+# the most recent message needs to be sent
+FULLSTATE = (b'ACDATA', b'SIMINFO', b'ROUTEDATA*')
+
+# Replay commands, with their help text
+REPLAYCMDS = {
+    'OP': 'Start or continue the replay',
+    'HOLD': 'Pause the replay',
+    'DTMULT': 'Set the replay speed multiplier',
+    'SEEK': 'Jump to a simulation time [s] in the recording',
+    'ECHO': 'Show a text in command window',
+}
+ALIASES = {'RUN': 'OP', 'SPEED': 'DTMULT', 'PRINT': 'ECHO'}
+
+
+class ReplayNode:
+    ''' A node that replays a stream recording. '''
+    def __init__(self, fname, update_rate=20.0):
+        self.node_id = b'\x00' + os.urandom(4)
+        self.host_id = b''
+        self.running = True
+        self.reader = StreamReader(fname)
+        self.dtupdate = 1.0 / update_rate
+
+        # Replay state
+        self.state = HOLD
+        self.dtmult = 1.0
+        self.simt = self.reader.tstart
+        self.syst = 0.0
+        self.records = self.reader.records()
+        self.nextrec = next(self.records, None)
+
+        ctx = zmq.Context.instance()
+        self.event_io = ctx.socket(zmq.DEALER)
+        self.stream_out = ctx.socket(zmq.PUB)
+
+    def connect(self):
+        ''' Connect node to the BlueSky server. '''
+        self.event_io.setsockopt(zmq.IDENTITY, self.node_id)
+        self.event_io.connect(endpoint(settings.sim_protocol, settings.simevent_port))
+        self.stream_out.connect(endpoint(settings.sim_protocol, settings.simstream_port))
+        self.send_event(b'REGISTER', os.getpid())
+        self.host_id = self.event_io.recv_multipart()[0]
+
+    def send_event(self, name, data=None, target=None):
+        pydata = msgpack.packb(data, default=encode_ndarray, use_bin_type=True)
+        self.event_io.send_multipart((target or [b'*']) + [name, pydata])
+
+    def echo(self, text, target):
+        self.send_event(b'ECHO', dict(text=text, flags=0), target)
+
+    def run(self):
+        ''' Main loop of the replay node. '''
+        while self.running:
+            # Process events, waiting at most until the next update
+            if self.event_io.poll(int(self.dtupdate * 1000)):
+                while self.event_io.getsockopt(zmq.EVENTS) & zmq.POLLIN:
+                    self.event()
+            if self.state == OP:
+                self.update()
+
+    def update(self):
+        ''' Send all recorded messages up to the current replay time. '''
+        tnow = time.time()
+        self.simt += (tnow - self.syst) * self.dtmult
+        self.syst = tnow
+
+        latest = dict()
+        while self.nextrec is not None and self.nextrec[0] <= self.simt:
+            _, name, payload = self.nextrec
+            if name in FULLSTATE:
+                latest[name] = payload
+            else:
+                self.stream_out.send_multipart([name + self.node_id, payload])
+            self.nextrec = next(self.records, None)
+        for name, payload in latest.items():
+            self.stream_out.send_multipart([name + self.node_id, payload])
+
+        if self.nextrec is None:
+            self.state = HOLD
+
+    def seek(self, simt):
+        ''' Jump to a simulation time in the recording. '''
+        self.simt = min(max(simt, self.reader.tstart), self.reader.tend)
+        self.records = self.reader.records(self.simt)
+        self.nextrec = next(self.records, None)
+        # Clients need to discard their incrementally built state (e.g., trails)
+        self.send_event(b'RESET', b'ALL')
+
+    def event(self):
+        ''' Process an incoming event. '''
+        msg = self.event_io.recv_multipart()
+        route, eventname, data = msg[:-2], msg[-2], msg[-1]
+        route.reverse()
+        if eventname == b'QUIT':
+            self.running = False
+        elif eventname == b'STACK':
+            for cmdline in msgpack.unpackb(data, raw=False).split(';'):
+                self.stack(cmdline.strip(), route)
+        elif eventname == b'GETSIMSTATE':
+            simstate = dict(pan=(0.0, 0.0), zoom=1.0, stackcmds=REPLAYCMDS,
+                            shapes=[], custacclr={}, custgrclr={},
+                            settings={}, plugins=[])
+            self.send_event(b'SIMSTATE', simstate, route)
+
+    def stack(self, cmdline, route):
+        ''' Process a replay command. '''
+        if not cmdline:
+            return
+        cmd, _, args = cmdline.replace(',', ' ').partition(' ')
+        cmd = ALIASES.get(cmd.upper(), cmd.upper())
+        args = args.split()
+        try:
+            if cmd == 'OP':
+                self.state = OP
+                self.syst = time.time()
+            elif cmd == 'HOLD':
+                self.state = HOLD
+            elif cmd == 'DTMULT':
+                self.dtmult = float(args[0])
+            elif cmd == 'SEEK':
+                self.seek(float(args[0]))
+            elif cmd == 'ECHO':
+                self.echo(cmdline.partition(' ')[2], route)
+            else:
+                self.echo(f'Replay node: unknown command {cmd}. Available '
+                          f'commands are {", ".join(REPLAYCMDS)}', route)
+        except (IndexError, ValueError):
+            self.echo(f'Replay node: invalid arguments for {cmd}', route)
+
+
+def main():
+    ''' Start a replay node for the recording passed on the command line. '''
+    configfile = None
+    if '--configfile' in sys.argv:
+        configfile = sys.argv[sys.argv.index('--configfile') + 1]
+    settings.init(configfile)
+    import bluesky.network.server  # Register network settings defaults
+    node = ReplayNode(sys.argv[1])
+    node.connect()
+    node.run()
+
+
+if __name__ == '__main__':
+    main()
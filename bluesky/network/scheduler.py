@@ -0,0 +1,110 @@
+''' Batch scenario scheduler for the BlueSky server. '''
+import heapq
+import itertools
+import json
+import os
+import time
+from datetime import datetime
+
+
+class BatchScheduler:
+    ''' Priority queue of batch scenarios, with bookkeeping of running,
+        completed, and failed scenarios.
+
+        Scenarios are dicts as produced by split_scenarios(). Higher priority
+        scenarios are dispatched first, scenarios with equal priority in
+        order of submission. When a node dies while running a scenario, the
+        scenario is requeued until it has been attempted max_attempts times.
+    '''
+    def __init__(self, max_attempts=3, manifest_path=''):
+        self.max_attempts = max_attempts
+        self.manifest_path = manifest_path
+        self.queue = []
+        self.running = dict()
+        self.completed = []
+        self.failed = []
+        self.counter = itertools.count()
+
+    def __bool__(self):
+        ''' The scheduler evaluates to True when scenarios are waiting. '''
+        return bool(self.queue)
+
+    def __len__(self):
+        return len(self.queue)
+
+    def add(self, scenarios, priority=0):
+        ''' Add scenarios to the queue with the given priority.
+            Returns the number of added scenarios. '''
+        count = 0
+        for scen in scenarios:
+            scen.setdefault('priority', priority)
+            scen.setdefault('attempts', 0)
+            heapq.heappush(self.queue, (-scen['priority'], next(self.counter), scen))
+            count += 1
+        return count
+
+    def next(self, worker_id):
+        ''' Pop the next scenario from the queue, and register it as
+            running on worker_id. '''
+        scen = heapq.heappop(self.queue)[-1]
+        scen['attempts'] += 1
+        self.running[worker_id] = (scen, time.time())
+        return scen
+
+    def complete(self, worker_id, result=None):
+        ''' Register completion of the scenario running on worker_id.
+            Returns the manifest entry, or None if the worker wasn't
+            running a scenario. '''
+        scen, tstart = self.running.pop(worker_id, (None, 0.0))
+        if scen is None:
+            return None
+        entry = dict(name=scen['name'], priority=scen['priority'],
+                     attempts=scen['attempts'], node=worker_id.hex(),
+                     walltime=time.time() - tstart, status='done')
+        entry.update(result or {})
+        self.completed.append(entry)
+        self.write_manifest()
+        return entry
+
+    def fail(self, worker_id):
+        ''' Register that the node running worker_id has died.
+            The scenario it was running is requeued, or marked as failed
+            when it has reached its maximum number of attempts.
+            Returns True if the scenario was requeued. '''
+        scen, tstart = self.running.pop(worker_id, (None, 0.0))
+        if scen is None:
+            return False
+        if scen['attempts'] < self.max_attempts:
+            heapq.heappush(self.queue, (-scen['priority'], next(self.counter), scen))
+            return True
+        self.failed.append(dict(name=scen['name'], priority=scen['priority'],
+                                attempts=scen['attempts'], node=worker_id.hex(),
+                                walltime=time.time() - tstart, status='failed'))
+        self.write_manifest()
+        return False
+
+    def progress(self):
+        ''' Return a summary of the batch progress. '''
+        done_walltime = [entry['walltime'] for entry in self.completed]
+        return dict(queued=len(self.queue), running=len(self.running),
+                    completed=len(self.completed), failed=len(self.failed),
+                    mean_walltime=sum(done_walltime) / len(done_walltime)
+                    if done_walltime else 0.0)
+
+    def start_manifest(self, log_path):
+        ''' Select a new manifest file in log_path for subsequent results,
+            if no batch is currently in progress. '''
+        if not (self.queue or self.running):
+            timestamp = datetime.now().strftime('%Y%m%d_%H-%M-%S')
+            self.manifest_path = os.path.join(log_path, f'BATCH_{timestamp}.json')
+            self.completed = []
+            self.failed = []
+
+    def write_manifest(self):
+        ''' Write the manifest of completed and failed scenarios as json. '''
+        if not self.manifest_path:
+            return
+        os.makedirs(os.path.dirname(self.manifest_path) or '.', exist_ok=True)
+        with open(self.manifest_path, 'w') as fout:
+            json.dump(dict(progress=self.progress(), scenarios=self.completed + self.failed),
+                      fout, indent=2)
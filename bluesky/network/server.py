@@ -10,13 +10,17 @@ import msgpack
 # Local imports
 import bluesky as bs
 from .discovery import Discovery
+from .common import endpoint, local_protocols
+from .scheduler import BatchScheduler
+from . import nodepool
 
 
 # Register settings defaults
 bs.settings.set_variable_defaults(max_nnodes=cpu_count(),
                                   event_port=9000, stream_port=9001,
                                   simevent_port=10000, simstream_port=10001,
-                                  enable_discovery=False)
+                                  enable_discovery=False, batch_max_attempts=3,
+                                  log_path='output', node_pool=False)
 
 def split_scenarios(scentime, scencmd):
     ''' Split the contents of a batch file into individual scenarios. '''
@@ -36,17 +40,22 @@ class Server(Thread):
         self.spawned_processes = list()
         self.running = True
         self.max_nnodes = min(cpu_count(), bs.settings.max_nnodes)
-        self.scenarios = []
+        self.scenarios = BatchScheduler(bs.settings.batch_max_attempts)
         self.host_id = b'\x00' + os.urandom(4)
         self.clients = []
         self.workers = []
         self.servers = {self.host_id : dict(route=[], nodes=self.workers)}
         self.avail_workers = dict()
+        # Process ids of workers, to detect nodes that have died
+        self.worker_pids = dict()
 
         # Information to pass on to spawned nodes
         self.altconfig = altconfig
         self.startscn = startscn
 
+        # Pool of pre-initialized nodes, created when the first node is added
+        self.nodepool = None
+
         if bs.settings.enable_discovery or discovery:
             self.discovery = Discovery(self.host_id, is_client=False)
         else:
@@ -54,12 +63,52 @@ class Server(Thread):
 
     def sendscenario(self, worker_id):
         # Send a new scenario to the target sim process
-        scen = self.scenarios.pop(0)
-        data = msgpack.packb(scen)
+        scen = self.scenarios.next(worker_id)
+        data = msgpack.packb(dict(name=scen['name'], scentime=scen['scentime'],
+                                  scencmd=scen['scencmd']))
         self.be_event.send_multipart([worker_id, self.host_id, b'BATCH', data])
+        self.sendprogress()
+
+    def sendprogress(self):
+        ''' Send batch progress to all clients. '''
+        data = msgpack.packb(self.scenarios.progress(), use_bin_type=True)
+        for client_id in self.clients:
+            self.fe_event.send_multipart([client_id, self.host_id, b'BATCHPROGRESS', data])
+
+    def check_workers(self):
+        ''' Check for spawned nodes that have died. Scenarios that were
+            running on these nodes are requeued. '''
+        for p in [p for p in self.spawned_processes if p.poll() is not None]:
+            self.spawned_processes.remove(p)
+            worker_id = next((w for w, pid in self.worker_pids.items() if pid == p.pid), None)
+            if worker_id is None:
+                continue
+            print(f'Node {worker_id} exited with code {p.returncode}')
+            del self.worker_pids[worker_id]
+            self.workers.remove(worker_id)
+            self.avail_workers.pop(worker_id, None)
+            data = msgpack.packb({self.host_id : self.servers[self.host_id]}, use_bin_type=True)
+            for client_id in self.clients:
+                self.fe_event.send_multipart([client_id, self.host_id, b'NODESCHANGED', data])
+            if worker_id in self.scenarios.running:
+                self.scenarios.fail(worker_id)
+                self.sendprogress()
+                # Dispatch requeued scenario, or start a replacement node
+                if self.scenarios:
+                    if self.avail_workers:
+                        self.sendscenario(self.avail_workers.popitem()[0])
+                    elif len(self.workers) < self.max_nnodes:
+                        self.addnodes()
 
     def addnodes(self, count=1, startscn=None):
         ''' Add [count] nodes to this server. '''
+        if bs.settings.node_pool and nodepool.available():
+            if self.nodepool is None:
+                self.nodepool = nodepool.NodePool(self.altconfig)
+            for _ in range(count):
+                self.spawned_processes.append(self.nodepool.spawn(startscn))
+            return
+
         for _ in range(count):
             args = [sys.executable, '-m', 'bluesky', '--sim']
             if self.altconfig:
@@ -77,18 +126,21 @@ class Server(Thread):
         # Create connection points for clients
         self.fe_event = ctx.socket(zmq.ROUTER)
         self.fe_event.setsockopt(zmq.IDENTITY, self.host_id)
-        self.fe_event.bind(f'tcp://*:{bs.settings.event_port}')
         self.fe_stream = ctx.socket(zmq.XPUB)
-        self.fe_stream.bind(f'tcp://*:{bs.settings.stream_port}')
-        print(f'Accepting event connections on port {bs.settings.event_port},',
-              f'and stream connections on port {bs.settings.stream_port}')
-
         # Create connection points for sim workers
         self.be_event  = ctx.socket(zmq.ROUTER)
         self.be_event.setsockopt(zmq.IDENTITY, self.host_id)
-        self.be_event.bind(f'tcp://*:{bs.settings.simevent_port}')
         self.be_stream = ctx.socket(zmq.XSUB)
-        self.be_stream.bind(f'tcp://*:{bs.settings.simstream_port}')
+
+        # All connection points are available over tcp, and over the
+        # host-local transports for clients and nodes on the same host
+        for protocol in ['tcp'] + local_protocols():
+            self.fe_event.bind(endpoint(protocol, bs.settings.event_port, bind=True))
+            self.fe_stream.bind(endpoint(protocol, bs.settings.stream_port, bind=True))
+            self.be_event.bind(endpoint(protocol, bs.settings.simevent_port, bind=True))
+            self.be_stream.bind(endpoint(protocol, bs.settings.simstream_port, bind=True))
+        print(f'Accepting event connections on port {bs.settings.event_port},',
+              f'and stream connections on port {bs.settings.stream_port}')
 
         # Create poller for both event connection points and the stream reader
         poller = zmq.Poller()
@@ -106,11 +158,14 @@ class Server(Thread):
 
         while self.running:
             try:
-                events = dict(poller.poll(None))
+                events = dict(poller.poll(1000))
             except zmq.ZMQError:
                 print('ERROR while polling')
                 break  # interrupted
 
+            # Check if any of the spawned nodes has died
+            self.check_workers()
+
             # The socket with incoming data
             for sock, event in events.items():
                 if event != zmq.POLLIN:
@@ -160,6 +215,9 @@ class Server(Thread):
                             src.send_multipart([sender_id, self.host_id, b'NODESCHANGED', data])
                         else:
                             self.workers.append(sender_id)
+                            pid = msgpack.unpackb(data)
+                            if pid:
+                                self.worker_pids[sender_id] = pid
                             data = msgpack.packb({self.host_id : self.servers[self.host_id]}, use_bin_type=True)
                             for client_id in self.clients:
                                 dest.send_multipart([client_id, self.host_id, b'NODESCHANGED', data])
@@ -187,6 +245,10 @@ class Server(Thread):
                     elif eventname == b'STATECHANGE':
                         state = msgpack.unpackb(data)
                         if state < bs.OP:
+                            # A node leaving OP has finished any batch scenario
+                            # it was running, also when it didn't send results
+                            if self.scenarios.complete(sender_id):
+                                self.sendprogress()
                             # If we have batch scenarios waiting, send
                             # the worker a new scenario, otherwise store it in
                             # the available worker list
@@ -198,6 +260,12 @@ class Server(Thread):
                             self.avail_workers.pop(route[0], None)
                         continue
 
+                    elif eventname == b'BATCHRESULT':
+                        # A node has finished its batch scenario
+                        self.scenarios.complete(sender_id, msgpack.unpackb(data, raw=False))
+                        self.sendprogress()
+                        continue
+
                     elif eventname == b'QUIT':
                         self.running = False
                         # Send quit to all nodes and clients
@@ -209,13 +277,16 @@ class Server(Thread):
                         continue
 
                     elif eventname == b'BATCH':
-                        scentime, scencmd = msgpack.unpackb(data, raw=False)
-                        self.scenarios = [scen for scen in split_scenarios(scentime, scencmd)]
+                        scentime, scencmd, *priority = msgpack.unpackb(data, raw=False)
+                        self.scenarios.start_manifest(bs.settings.log_path)
+                        nscen = self.scenarios.add(split_scenarios(scentime, scencmd),
+                                                   *priority)
                         # Check if the batch list contains scenarios
-                        if not self.scenarios:
+                        if not nscen:
                             echomsg = 'No scenarios defined in batch file!'
                         else:
-                            echomsg = f'Found {len(self.scenarios)} scenarios in batch'
+                            echomsg = f'Found {nscen} scenarios in batch, ' + \
+                                f'{len(self.scenarios)} scenarios queued'
                             # Send scenario to available nodes (nodes that are in init or hold mode):
                             while self.avail_workers and self.scenarios:
                                 worker_id = next(iter(self.avail_workers))
@@ -246,5 +317,7 @@ class Server(Thread):
                         dest.send_multipart(msg)
 
         # Wait for all nodes to finish
+        if self.nodepool:
+            self.nodepool.close()
         for n in self.spawned_processes:
             n.wait()
@@ -0,0 +1,215 @@
+''' Recording of simulation stream output to indexed binary files.
+
+    The recorder taps the stream messages that a simulation node sends
+    (ACDATA, TRAILS, ROUTEDATA, SIMINFO, ...), and stores their already
+    serialized payloads together with the simulation time. A recording
+    can be served back to clients by a replay node (see
+    bluesky.network.replay), without running the simulation again.
+
+    File layout:
+    - 8-byte magic
+    - Chunks, each starting with a chunk header (t0, t1, nrecords, nbytes),
+      followed by its records. Each record consists of a record header
+      (simt, name length, payload length), the stream name, and the payload.
+    - An index of (t0, t1, offset) for each chunk, followed by a trailer
+      with the offset of the index. Record times never decrease, so that
+      chunks can be found by time with a binary search. When a recording was not closed properly,
+      the reader rebuilds the index by scanning the chunk headers.
+'''
+from bisect import bisect_left
+import struct
+
+import bluesky as bs
+from bluesky.stack.cmdparser import command
+from bluesky.tools import datalog
+
+
+MAGIC = b'BSSTRM01'
+IDXMAGIC = b'BSSTRIDX'
+CHUNKHDR = struct.Struct('<4sddIQ')
+RECHDR = struct.Struct('<dHI')
+IDXENTRY = struct.Struct('<ddQ')
+TRAILER = struct.Struct('<QI8s')
+
+# Streams recorded by default
+default_topics = (b'ACDATA', b'TRAILS', b'ROUTEDATA', b'SIMINFO')
+
+# The active recorder of this node, if any
+recorder = None
+
+
+@command(name='STREAMREC')
+def streamrec(flag: 'onoff' = None, fname: 'word' = ''):
+    ''' Record the stream output of this simulation to file, for later replay.
+
+        Arguments:
+        - flag: Turn recording on or off
+        - fname: Name of the recording file (optional)
+    '''
+    global recorder
+    if flag is None:
+        if recorder is None:
+            return True, 'STREAMREC is off'
+        return True, f'STREAMREC is recording to {recorder.fname}'
+    if not flag:
+        reset()
+        return True
+    if recorder is not None:
+        return False, f'STREAMREC is already recording to {recorder.fname}'
+    if not fname:
+        fname = datalog.makeLogfileName('STREAMREC')[:-4] + '.bsr'
+    recorder = StreamRecorder(fname)
+    return True, f'Recording stream output to {fname}'
+
+
+def record(name, payload):
+    ''' Record a stream message, if recording is on. '''
+    if recorder is not None:
+        recorder.record(bs.sim.simt, name, payload)
+
+
+def reset():
+    ''' Stop recording. '''
+    global recorder
+    if recorder is not None:
+        recorder.close()
+        recorder = None
+
+
+class StreamRecorder:
+    ''' Writer of stream recording files. '''
+    def __init__(self, fname, topics=default_topics, chunk_size=1 << 22, chunk_dt=60.0):
+        self.fname = fname
+        self.topics = tuple(topics)
+        self.chunk_size = chunk_size
+        self.chunk_dt = chunk_dt
+        self.file = open(fname, 'wb')
+        self.file.write(MAGIC)
+        self.index = []
+        self.buffer = []
+        self.nbytes = 0
+        self.t0 = self.t1 = 0.0
+        # Offset of the recording time from the simulation time, which is
+        # increased when the simulation time jumps back
+        self.toffset = 0.0
+
+    def record(self, simt, name, payload):
+        ''' Add a stream message to the recording. '''
+        if not name.startswith(self.topics):
+            return
+        # Client-specific route data is recorded as broadcast route data
+        if name.startswith(b'ROUTEDATA'):
+            name = b'ROUTEDATA*'
+        simt += self.toffset
+        if (self.buffer or self.index) and simt < self.t1:
+            # Simulation time has jumped back: continue the recording from
+            # the last recorded time, to keep the records ordered in time
+            print(f'STREAMREC: simulation time jumped back {self.t1 - simt:.2f} s, '
+                  'recording continues at the last recorded time')
+            self.toffset += self.t1 - simt
+            simt = self.t1
+        if not self.buffer:
+            self.t0 = simt
+        self.buffer.append(RECHDR.pack(simt, len(name), len(payload)))
+        self.buffer.append(name)
+        self.buffer.append(payload)
+        self.nbytes += RECHDR.size + len(name) + len(payload)
+        self.t1 = simt
+        if self.nbytes >= self.chunk_size or simt - self.t0 >= self.chunk_dt:
+            self.flush()
+
+    def flush(self):
+        ''' Write the buffered records to file as a chunk. '''
+        if not self.buffer:
+            return
+        self.index.append((self.t0, self.t1, self.file.tell()))
+        self.file.write(CHUNKHDR.pack(b'CHNK', self.t0, self.t1,
+                                      len(self.buffer) // 3, self.nbytes))
+        self.file.write(b''.join(self.buffer))
+        self.buffer = []
+        self.nbytes = 0
+
+    def close(self):
+        ''' Write the remaining data and the index, and close the file. '''
+        self.flush()
+        idxoffset = self.file.tell()
+        for entry in self.index:
+            self.file.write(IDXENTRY.pack(*entry))
+        self.file.write(TRAILER.pack(idxoffset, len(self.index), IDXMAGIC))
+        self.file.close()
+
+
+class StreamReader:
+    ''' Reader of stream recording files. '''
+    def __init__(self, fname):
+        self.fname = fname
+        self.file = open(fname, 'rb')
+        if self.file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{fname} is not a BlueSky stream recording')
+        self.index = self._read_index() or self._scan_index()
+        self.tstart = self.index[0][0] if self.index else 0.0
+        self.tend = self.index[-1][1] if self.index else 0.0
+
+    def _read_index(self):
+        ''' Read the index from the end of the file. '''
+        self.file.seek(0, 2)
+        size = self.file.tell()
+        if size < len(MAGIC) + TRAILER.size:
+            return []
+        self.file.seek(size - TRAILER.size)
+        idxoffset, nchunks, idxmagic = TRAILER.unpack(self.file.read(TRAILER.size))
+        if idxmagic != IDXMAGIC:
+            return []
+        self.file.seek(idxoffset)
+        data = self.file.read(nchunks * IDXENTRY.size)
+        return list(IDXENTRY.iter_unpack(data))
+
+    def _scan_index(self):
+        ''' Rebuild the index of an unclosed recording from its chunk headers. '''
+        index = []
+        offset = len(MAGIC)
+        while True:
+            self.file.seek(offset)
+            hdr = self.file.read(CHUNKHDR.size)
+            if len(hdr) < CHUNKHDR.size:
+                break
+            tag, t0, t1, _, nbytes = CHUNKHDR.unpack(hdr)
+            if tag != b'CHNK':
+                break
+            # Skip a chunk that was only partially written
+            if len(self.file.read(nbytes)) < nbytes:
+                break
+            index.append((t0, t1, offset))
+            offset += CHUNKHDR.size + nbytes
+        return index
+
+    def read_chunk(self, ichunk):
+        ''' Return the records of chunk ichunk as a list of
+            (simt, name, payload) tuples. '''
+        self.file.seek(self.index[ichunk][2])
+        _, _, _, nrec, nbytes = CHUNKHDR.unpack(self.file.read(CHUNKHDR.size))
+        data = memoryview(self.file.read(nbytes))
+        records = []
+        pos = 0
+        for _ in range(nrec):
+            simt, namelen, paylen = RECHDR.unpack_from(data, pos)
+            pos += RECHDR.size
+            name = bytes(data[pos:pos + namelen])
+            pos += namelen
+            records.append((simt, name, bytes(data[pos:pos + paylen])))
+            pos += paylen
+        return records
+
+    def records(self, tstart=None):
+        ''' Iterate over all records, starting at simulation time tstart. '''
+        ichunk = 0
+        if tstart is not None:
+            # First chunk that ends at or after tstart
+            ichunk = bisect_left([entry[1] for entry in self.index], tstart)
+        for i in range(ichunk, len(self.index)):
+            for rec in self.read_chunk(i):
+                if tstart is None or rec[0] >= tstart:
+                    yield rec
+
+    def close(self):
+        self.file.close()
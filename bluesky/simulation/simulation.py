@@ -10,6 +10,7 @@ import bluesky.core as core
 from bluesky.core import plugin, simtime
 from bluesky.stack import simstack, recorder
 from bluesky.tools import datalog, areafilter, plotter
+from bluesky.network import streamlog
 
 # Minimum sleep interval
 MINSLEEP = 1e-3
@@ -53,6 +54,10 @@ class Simulation:
         # Keep track of known clients
         self.clients = set()
 
+        # Name and start wall time of the batch scenario that is currently running
+        self.batchscen = ''
+        self.batchstart = 0.0
+
     def step(self):
         ''' Perform a simulation timestep. '''
         # Simulation starts as soon as there is traffic, or pending commands
@@ -96,6 +101,7 @@ class Simulation:
 
             # Update traffic and other update functions for the next timestep
             bs.traf.update()
+            areafilter.update()
             simtime.update()
 
         # Always update syst
@@ -113,6 +119,9 @@ class Simulation:
 
         # Inform main of our state change
         if self.state != self.prevstate:
+            # A batch scenario is finished when the simulation leaves OP
+            if self.batchscen and self.state != bs.OP:
+                self.send_batchresult()
             bs.net.send_event(b'STATECHANGE', self.state)
             self.prevstate = self.state
 
@@ -127,6 +136,7 @@ class Simulation:
             the server. '''
         bs.net.quit()
         datalog.reset()
+        streamlog.reset()
 
         # Close savefile which may be open for recording
         recorder.saveclose()  # Close reording file if it is on
@@ -163,6 +173,7 @@ class Simulation:
         bs.traf.reset()
         simstack.reset()
         datalog.reset()
+        streamlog.reset()
         areafilter.reset()
         bs.scr.reset()
         plotter.reset()
@@ -190,19 +201,43 @@ class Simulation:
         self.bencht  = 0.0  # Start time will be set at next sim cycle
         self.benchdt = dt
 
-    def batch(self, fname):
-        ''' Run a batch of scenarios. '''
+    def batch(self, fname, priority=0):
+        ''' Run a batch of scenarios.
+
+            Arguments:
+            - fname: The scenario file name (which may contain spaces),
+              optionally followed by a comma and the priority of the batch
+            - priority: The priority of the batch, when not given in fname
+        '''
+        name, sep, prio = fname.rpartition(',')
+        if sep and prio.strip().lstrip('+-').isdigit():
+            fname, priority = name.strip(), int(prio)
+
         # The contents of the scenario file are meant as a batch list:
         # send to server and clear stack
         self.reset()
         try:
             scentime, scencmd = zip(*[tc for tc in simstack.readscn(fname)])
-            bs.net.send_event(b'BATCH', (scentime, scencmd))
+            bs.net.send_event(b'BATCH', (scentime, scencmd, priority))
         except FileNotFoundError:
             return False, f'BATCH: File not found: {fname}'
 
         return True
 
+    def send_batchresult(self):
+        ''' Send the log files and summary metrics of the finished batch
+            scenario to the server. '''
+        # Write the rows that the log writer still holds, so that the
+        # reported log files are complete
+        datalog.flush()
+        result = dict(simt=self.simt, ntraf=bs.traf.ntraf,
+                      simwalltime=time.time() - self.batchstart,
+                      nconf_tot=len(bs.traf.cd.confpairs_all),
+                      nlos_tot=len(bs.traf.cd.lospairs_all),
+                      logfiles=datalog.logfiles())
+        bs.net.send_event(b'BATCHRESULT', result)
+        self.batchscen = ''
+
     def event(self, eventname, eventdata, sender_rte):
         ''' Handle events coming from the network. '''
         # Keep track of event processing
@@ -217,6 +252,8 @@ class Simulation:
             # We are in a batch simulation, and received an entire scenario. Assign it to the stack.
             self.reset()
             bs.stack.set_scendata(eventdata['scentime'], eventdata['scencmd'])
+            self.batchscen = eventdata.get('name', '')
+            self.batchstart = time.time()
             self.op()
             event_processed = True
 
@@ -193,7 +193,7 @@ class WptArg(Parser):
             name = name + "," + arg
 
         # apt,runway ? Combine into one string with a slash as separator
-        elif argstring[:2].upper() == "RW" and name in bs.navdb.aptid:
+        elif argstring[:2].upper() == "RW" and name in bs.navdb.aptidindex:
             arg, argstring = re_getarg.match(argstring).groups()
             name = name + "/" + arg.upper()
 
@@ -231,7 +231,7 @@ class PosArg(Parser):
             return txt2lat(argu), txt2lon(nextarg), argstring
 
         # apt,runway ? Combine into one string with a slash as separator
-        if argstring[:2].upper() == "RW" and argu in bs.navdb.aptid:
+        if argstring[:2].upper() == "RW" and argu in bs.navdb.aptidindex:
             arg, argstring = re_getarg.match(argstring).groups()
             argu = argu + "/" + arg.upper()
 
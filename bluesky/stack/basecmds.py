@@ -74,6 +74,13 @@ def initbasecmds():
             bs.traf.cond.atdistcmd,
             "When a/c passing this distance[nm] to position, execute the command cmd",
         ],
+        "ATMOSTABLE": [
+            "ATMOSTABLE [ON/OFF]",
+            "[onoff]",
+            aero.atmostable,
+            """Use a tabulated ISA atmosphere instead of the ISA equations in
+               the vectorized atmosphere and speed conversion functions.""",
+        ],
         "ATSPD": [
             "acid ATSPD spd cmd ",
             "acid,spd,string",
@@ -87,7 +94,7 @@ def initbasecmds():
             "Set or show bank limit for this vehicle",
         ],
         "BATCH": [
-            "BATCH filename",
+            "BATCH filename[,priority]",
             "string",
             bs.sim.batch,
             "Start a scenario file as batch simulation",
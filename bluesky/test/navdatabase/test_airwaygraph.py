@@ -0,0 +1,71 @@
+"""
+Tests shortest routes along airways.
+"""
+import numpy as np
+from bluesky.tools import geo
+from bluesky.navdatabase import airwaygraph
+from bluesky.navdatabase.nameindex import NameIndex
+
+
+def shortest(nwp, legs):
+    ''' Shortest distances between all waypoints, with Floyd-Warshall. '''
+    dist = np.full((nwp, nwp), np.inf)
+    np.fill_diagonal(dist, 0.0)
+    for i, j, d in legs:
+        dist[i, j] = dist[j, i] = min(dist[i, j], d)
+    for k in range(nwp):
+        dist = np.minimum(dist, dist[:, k:k + 1] + dist[k:k + 1, :])
+    return dist
+
+
+def test_airwaygraph():
+    """ Routes along the airway graph are the shortest routes. """
+    rng = np.random.default_rng(1)
+    nwp, nlegs = 60, 90
+    wplat = rng.uniform(50.0, 54.0, nwp)
+    wplon = rng.uniform(2.0, 8.0, nwp)
+    # Duplicate names: the waypoint closest to the airway leg end point is used
+    wpid = [f'W{i % 40}' for i in range(nwp)]
+    ifrom, ito = rng.integers(0, nwp, nlegs), rng.integers(0, nwp, nlegs)
+    awydata = dict(awid=[f'A{i}' for i in range(nlegs)],
+                   awfromwpid=[wpid[i] for i in ifrom], awtowpid=[wpid[i] for i in ito],
+                   awfromlat=wplat[ifrom] + 0.01, awfromlon=wplon[ifrom],
+                   awtolat=wplat[ito], awtolon=wplon[ito] - 0.01)
+    # A leg with an unknown waypoint, and one too far from its waypoint
+    awydata['awtowpid'][0] = 'UNKNOWN'
+    awydata['awfromlat'][1] += 1.0
+
+    graph = airwaygraph.AirwayGraph.fromnavdata(wplat, wplon, NameIndex(wpid), awydata)
+    legs = [(i, j, geo.kwikdist(wplat[i], wplon[i], wplat[j], wplon[j]))
+            for i, j in zip(ifrom[2:], ito[2:]) if i != j]
+    assert graph.matrix.nnz == 2 * len({(min(i, j), max(i, j)) for i, j, _ in legs})
+    ref = shortest(nwp, legs)
+
+    orig, dest = rng.integers(0, nwp, 200), rng.integers(0, nwp, 200)
+    routes, dist = graph.routes(orig, dest)
+    assert np.allclose(dist, ref[orig, dest])
+    for route, o, d, length in zip(routes, orig, dest, dist):
+        if np.isinf(length):
+            assert len(route) == 0
+            continue
+        assert route[0] == o and route[-1] == d
+        assert np.isclose(graph.matrix[route[:-1], route[1:]].sum(), length)
+
+    # Small search batches give the same routes
+    airwaygraph.MAXSEARCH, maxsearch = nwp, airwaygraph.MAXSEARCH
+    try:
+        routes2, dist2 = graph.routes(orig, dest)
+    finally:
+        airwaygraph.MAXSEARCH = maxsearch
+    assert np.array_equal(dist, dist2)
+    assert all(np.array_equal(r1, r2) for r1, r2 in zip(routes, routes2))
+
+    # Waypoints outside the graph (e.g., added with DEFWPT) have no route
+    routes, dist = graph.routes([orig[0], nwp, nwp + 1, -1], [nwp, dest[0], nwp + 1, dest[0]])
+    assert np.all(np.isinf(dist)) and all(len(route) == 0 for route in routes)
+
+    # Columns give the same graph, nearest waypoint on the airway network
+    graph2 = airwaygraph.AirwayGraph(**graph.tocolumns())
+    assert graph2.route(orig[0], dest[0])[1] == dist[0]
+    inode = graph.nearest(wplat[ifrom[5]], wplon[ifrom[5]])
+    assert inode == ifrom[5]
@@ -0,0 +1,52 @@
+"""
+Tests the grid index of the navigation database against brute-force searches.
+"""
+import numpy as np
+from bluesky.navdatabase.gridindex import GridIndex
+
+
+def nearest_bruteforce(lat, lon, qlat, qlon):
+    # The search of Navdatabase.getinear
+    f = np.cos(np.radians(qlat))
+    dlat = (lat - qlat + 180.) % 360. - 180.
+    dlon = f * ((lon - qlon + 180.) % 360. - 180.)
+    return np.argmin(dlat * dlat + dlon * dlon)
+
+
+def test_nearest():
+    """ Batched and single nearest queries, also near the poles and the
+        date line, and after inserting points. """
+    rng = np.random.default_rng(0)
+    lat = np.round(np.concatenate((rng.uniform(-90.0, 90.0, 5000),
+                                   rng.normal(52.0, 3.0, 15000))), 2)
+    lon = np.round(np.concatenate((rng.uniform(-180.0, 180.0, 5000),
+                                   rng.normal(5.0, 6.0, 15000))), 2)
+    index = GridIndex(lat, lon)
+    qlat = np.concatenate((rng.uniform(-90.0, 90.0, 300), [89.99, -89.99, 0.0, 52.0]))
+    qlon = np.concatenate((rng.uniform(-180.0, 180.0, 300), [0.0, 179.99, 180.0, -180.0]))
+    ref = [nearest_bruteforce(lat, lon, a, b) for a, b in zip(qlat, qlon)]
+    assert np.array_equal(index.nearest(qlat, qlon), ref)
+    assert index.nearest(qlat[0], qlon[0]) == ref[0]
+
+    for _ in range(400):
+        a, b = rng.uniform(-90.0, 90.0), rng.uniform(-180.0, 180.0)
+        index.insert(a, b)
+        lat, lon = np.append(lat, a), np.append(lon, b)
+    ref = [nearest_bruteforce(lat, lon, a, b) for a, b in zip(qlat, qlon)]
+    assert np.array_equal(index.nearest(qlat, qlon), ref)
+
+
+def test_inside():
+    """ Box queries give the same points as Navdatabase.getinside. """
+    rng = np.random.default_rng(1)
+    lat = rng.uniform(-90.0, 90.0, 20000)
+    lon = rng.uniform(-180.0, 180.0, 20000)
+    index = GridIndex(lat, lon)
+    for _ in range(200):
+        lat0, lon0 = rng.uniform(-90.0, 90.0), rng.uniform(-200.0, 200.0)
+        lat1, lon1 = lat0 + rng.uniform(-5.0, 20.0), lon0 + rng.uniform(-5.0, 40.0)
+        if lat0 < lat1:
+            mask = (lat > lat0) * (lat < lat1) * (lon > lon0) * (lon < lon1)
+        else:
+            mask = (lat > lat1) + (lat < lat0) * (lon > lon0) * (lon < lon1)
+        assert np.array_equal(index.inside(lat0, lat1, lon0, lon1), np.flatnonzero(mask))
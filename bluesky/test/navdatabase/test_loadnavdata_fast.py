@@ -0,0 +1,114 @@
+"""
+Tests the fast navdata parser against the line-by-line parser.
+"""
+from zipfile import ZipFile
+import numpy as np
+from bluesky import settings
+from bluesky.navdatabase import loadnavdata, loadnavdata_fast, loadnavdata_txt
+
+
+NAV = '''I
+1100 Version - data cycle 2110
+
+# comment
+2  58.61466599  125.42666626    451   522  30    0.0 A    Aldan NDB
+3  31.26894444 -085.72630556    334 11120  40   -3.0 OZR  CAIRNS VOR-DME
+12 52.33000000  004.75000000     -5 11300  40    0.0 SPY  SPIJKERBOOR DME
+13 -0.0          1e1              0 11300  40    0.0 TCN  TACAN
+4  52.30000000  004.70000000     -5 10910  40   45.0 IAA  EHAM ILS
+99
+'''
+
+FIX = '''I
+1101 Version
+
+  30.580372 -094.384169 FAREL
+-45.000000  170.100000 SOUTH extra
+52.1234567890123456  4.5 LONGDIGIT
+#12.5 1.0 COMMENT
+12 3.4 SKIP
+1.5 2.5 SKIPTOO
+99
+'''
+
+AWY = '''I
+640 Version
+
+ABAGO  56.291668  144.236667 GINOL  54.413334  142.011667 1 177 528 A218
+# comment
+BAD  x  y Z 1 2 3 4 5 A1
+SHORT 1.0 2.0
+BUGYE -82.624766 -174.050051 BEGAC  56.388643  148.592008 2 151 481 A511-UN270-B1
+NAN nan 1.0 INF 1e3 -0.0 +1 0 999 B2
+99
+'''
+
+AIRPORTS = '''# id, name, lat, lon, type, rwy, country, elev
+EHAM, SCHIPHOL, 52.309, 4.764, Large, 12467, NL, -11
+EHLE, LELYSTAD, 52.460, 5.527, Small, , NL
+EHXX, CLOSED FIELD, 52.0, 5.0, Closed, 1000, NL, 0
+, NO ID, 0.0, 0.0, Small, 0, NL, 0
+EHHE, HELIPORT, 52.1, 4.1, Medium, abc, NL, 3.5
+'''
+
+APT = '''I
+1000 Version
+
+1      -11 1 0 EHAM Schiphol
+100 60.00 1 0 0.25 1 3 0 06  52.28870000  004.73744000    0.00  100.00 3 0 0 1 24  52.30429000  004.78017000    0.00    0.00 3 0 0 1
+100 45.00 3 0 0.25 1 3 0 04  52.30000000  004.70000000    0.00    0.00 3 0 0 1 22  52.31000000  004.72000000    0.00    0.00 3 0 0 1
+1     -13 1 0 EHLE Lelystad
+  100 30.00 2 0 0.25 1 3 0 05  52.45000000  005.51000000   10.00    0.00 3 0 0 1 23  52.46600000  005.54300000    0.00    0.00 3 0 0 1
+1      -11 1 0 EHAM Schiphol again
+100 60.00 1 0 0.25 1 3 0 18R 52.36000000  004.71000000    0.00    0.00 3 0 0 1 36L 52.33000000  004.71000000    0.00    0.00 3 0 0 1
+100 60.00 1 0 0.25 1 3 0 18R 52.36100000  004.71100000    0.00    0.00 3 0 0 1 36L 52.33100000  004.71100000    0.00    0.00 3 0 0 1
+1000 Not an airport
+99
+'''
+
+FIR = '''N052.00.00.000 E004.00.00.000
+N053.00.00.000 E005.00.00.000
+N052.30.00.000 E006.00.00.000
+'''
+
+COUNTRIES = '''# name, a2, a3, nr
+Netherlands, nl, nld, 528
+Nowhere, xx, xxx,
+'''
+
+
+def write_navdata(path):
+    (path / 'fir').mkdir()
+    for fname, text in (('nav.dat', NAV), ('fix.dat', FIX), ('awy.dat', AWY),
+                        ('airports.dat', AIRPORTS), ('icao-countries.dat', COUNTRIES),
+                        ('fir/EHAA.txt', FIR)):
+        (path / fname).write_text(text)
+    with ZipFile(path / 'apt.zip', 'w') as zfile:
+        zfile.writestr('apt.dat', APT.replace('\n', '\r\n'))
+
+
+def assert_same(ref, data):
+    ''' Navigation data is the same when stored in the navdata cache. '''
+    ref = loadnavdata.pack_navdata(*ref, nameindex={})
+    data = loadnavdata.pack_navdata(*data, nameindex={})
+    assert ref.keys() == data.keys()
+    for name, table in ref.items():
+        assert list(table) == list(data[name]), name
+        for key, col in table.items():
+            if isinstance(col, np.ndarray):
+                assert col.dtype == data[name][key].dtype, (name, key)
+                # Compare bit patterns, to also compare nan and the sign of zero
+                assert np.array_equal(col.view(np.uint8), data[name][key].view(np.uint8)), (name, key)
+            else:
+                assert col == data[name][key], (name, key)
+
+
+def test_fast_parser(tmp_path, monkeypatch):
+    """ The fast parser gives the same data as the line-by-line parser. """
+    write_navdata(tmp_path)
+    monkeypatch.setattr(settings, 'navdata_path', str(tmp_path))
+    ref = loadnavdata_txt.loadnavdata_txt() + (loadnavdata_txt.loadthresholds_txt(),)
+    assert_same(ref, loadnavdata_fast.loadnavdata_fast(workers=0))
+    # Parts of the navdata can be parsed in worker processes
+    assert_same(ref, loadnavdata_fast.loadnavdata_fast(workers=2))
+
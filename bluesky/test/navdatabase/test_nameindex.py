@@ -0,0 +1,27 @@
+"""
+Tests the name index of the navigation database.
+"""
+import pickle
+from bluesky.navdatabase.nameindex import NameIndex
+
+
+def test_nameindex():
+    """ The index gives the same indices as scanning the list of names,
+        also for names added later, and after pickling. """
+    names = ['SPY', 'EHAM', 'SPY', 'ARTIP', 'SPY', 'EHAM']
+    index = pickle.loads(pickle.dumps(NameIndex(names)))
+    for name in set(names) | {'NONE'}:
+        ref = [i for i, n in enumerate(names) if n == name]
+        assert index.get(name).tolist() == ref
+        assert index.count(name) == len(ref)
+        assert index.first(name) == (ref[0] if ref else -1)
+        assert (name in index) == bool(ref)
+
+    # Added names are not shared with copies of the index
+    added = index.copy()
+    added.add('SPY', 6)
+    added.add('NEW', 7)
+    assert added.get('SPY').tolist() == [0, 2, 4, 6]
+    assert added.first('NEW') == 7 and 'NEW' in added
+    assert 'NEW' not in index and index.count('SPY') == 3
+    assert NameIndex().first('SPY') == -1
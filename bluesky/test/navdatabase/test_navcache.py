@@ -0,0 +1,104 @@
+"""
+Tests storing navigation data in the column cache.
+"""
+import numpy as np
+import pytest
+from bluesky import settings
+from bluesky.tools import cachefile, columncache
+from bluesky.navdatabase import airwaygraph, loadnavdata
+
+
+def navdata():
+    wptdata = dict(wpid=['SPY', 'ARTIP', 'SPY'], wplat=np.array([52.5, 52.2, 10.0]),
+                   wplon=np.array([4.8, 5.1, 20.0]), wptype=['VOR', 'FIX', 'FIX'],
+                   wpelev=[0.0, 0.0, 12.0], wpvar=[0.0, 1.5, 0.0], wpfreq=[113.3, 0.0, 0.0],
+                   wpdesc=['SPIJKERBOOR VOR/DME', '', 'Fix ÄÖ'])
+    aptdata = dict(apid=['EHAM'], apname=['SCHIPHOL'], aplat=np.array([52.31]),
+                   aplon=np.array([4.76]), apmaxrwy=np.array([3800.0]), aptype=np.array([1]),
+                   apco=['NL'], apelev=np.array([-3.0]))
+    awydata = dict(awid=['A1', 'B2'], awfromwpid=['SPY', 'SPY'], awfromlat=np.array([52.5, 52.5]),
+                   awfromlon=np.array([4.8, 4.8]), awtowpid=['ARTIP', 'ARTIP'],
+                   awtolat=np.array([52.2, 52.2]), awtolon=np.array([5.1, 5.1]),
+                   awndir=[2, 1], awlowfl=[100, 245], awupfl=[245, 660])
+    firdata = dict(fir=[['EHAA', [52.0, 53.0, 52.0], [4.0, 5.0, 6.0]], ['EMPTY', [], []]],
+                   firlat0=np.array([52.0, 53.0]), firlon0=np.array([4.0, 5.0]),
+                   firlat1=np.array([53.0, 52.0]), firlon1=np.array([5.0, 6.0]))
+    codata = dict(coname=['Netherlands'], cocode2=['NL'], cocode3=['NLD'], conr=[528])
+    rwythresholds = dict(EHAM={'06': (52.3, 4.7, 58.0), '24': (52.3, 4.8, 238.0)}, EHLE={})
+    nameindex = loadnavdata.make_nameindex(wptdata, aptdata, awydata)
+    return wptdata, aptdata, awydata, firdata, codata, rwythresholds, nameindex
+
+
+def test_navcache(tmp_path, monkeypatch):
+    """ Navigation data is the same after storing and loading it, and the
+        cache is invalidated when the version changes. """
+    monkeypatch.setattr(settings, 'cache_path', str(tmp_path), raising=False)
+    data = navdata()
+    columncache.save('navdata', 'v1', loadnavdata.pack_navdata(*data))
+    loaded = loadnavdata.unpack_navdata(columncache.load('navdata', 'v1'))
+    for ref, table in zip(data[:5], loaded[:5]):
+        assert ref.keys() == table.keys()
+        for key, value in ref.items():
+            if isinstance(value, list) and (key == 'fir' or value and isinstance(value[0], str)):
+                assert list(table[key]) == value
+            else:
+                assert np.array_equal(table[key], value)
+    # String columns decode single strings, and keep appended strings separately
+    wpdesc = loaded[0]['wpdesc'].copy()
+    wpdesc.append('Custom waypoint')
+    assert wpdesc[2] == 'Fix ÄÖ' and wpdesc[-1] == 'Custom waypoint' and len(wpdesc) == 4
+    assert len(loaded[0]['wpdesc']) == 3
+    assert dict(loaded[5]) == data[5]
+    assert loaded[6]['wpid'].get('SPY').tolist() == [0, 2]
+    assert loaded[6]['apid'].first('EHAM') == 0
+
+    with pytest.raises(cachefile.CacheError):
+        columncache.load('navdata', 'v2')
+
+
+def test_stringcolumn(tmp_path, monkeypatch):
+    """ A string column behaves as a list of strings, also after appending to it. """
+    monkeypatch.setattr(settings, 'cache_path', str(tmp_path), raising=False)
+    columncache.save('strings', 'v1', dict(table=dict(col=['SPY', 'ÄÖ', 'SPY'])))
+    col = columncache.load('strings', 'v1')['table']['col']
+    assert col[-3] == 'SPY' and col[1] == 'ÄÖ'
+    with pytest.raises(IndexError):
+        col[-4]
+    with pytest.raises(IndexError):
+        col[3]
+    assert col.index('ÄÖ') == 1 and col.count('SPY') == 2 and 'NEW' not in col
+    col.append('NEW')
+    assert col.index('NEW') == 3 and 'NEW' in col and col[-1] == 'NEW'
+    assert col.tolist() == ['SPY', 'ÄÖ', 'SPY', 'NEW']
+    for name in ('A', 'B', 'C'):
+        col.append(name)
+    with pytest.raises(IndexError):
+        col[-8]
+
+
+def test_lazy_navdb(tmp_path, monkeypatch):
+    """ Parts of the navigation database are loaded on first use. """
+    monkeypatch.setattr(settings, 'cache_path', str(tmp_path), raising=False)
+    monkeypatch.setattr(loadnavdata, '_navparts', dict())
+    monkeypatch.setattr(airwaygraph, '_graph', None)
+    columncache.save('navdata', loadnavdata.navdb_version, loadnavdata.pack_navdata(*navdata()))
+    from bluesky.navdatabase import Navdatabase
+    from bluesky.navdatabase.navdatabase import PARTATTRS
+
+    navdb = Navdatabase()
+    assert not navdb.loaded and not loadnavdata._navparts
+    assert navdb.getwpidx('SPY', 10.0, 20.0) == 2
+    assert navdb.loaded == {'wpt'} and list(loadnavdata._navparts) == ['wpt']
+    assert navdb.getaptidx('EHAM') == 0 and navdb.aptlat[0] == 52.31
+    assert navdb.loaded == {'wpt', 'apt'}
+    with pytest.raises(AttributeError):
+        navdb.wpco
+
+    # Reset unloads all parts, prefetch loads all parts
+    navdb.wpid.append('NEW')
+    navdb.reset()
+    assert not navdb.loaded and len(navdb.wpid) == 3
+    navdb.prefetch()
+    assert navdb.loaded == set(PARTATTRS)
+    assert navdb.listairway('A1') == [['SPY', 'ARTIP']]
+    assert navdb.awgraph.route(0, 1)[0].tolist() == [0, 1]
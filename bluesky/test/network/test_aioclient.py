@@ -0,0 +1,60 @@
+"""
+Tests the asyncio client against a minimal in-test stand-in for the
+BlueSky server, which registers the client, announces one node, and
+echoes stack commands back from that node.
+"""
+import asyncio
+import msgpack
+import zmq
+import zmq.asyncio
+from bluesky.network.aioclient import AsyncClient
+
+
+HOST_ID = b'\x00host'
+NODE_ID = b'\x00node'
+
+
+async def fake_server(router, pub):
+    ''' Serve one client: register, announce a node, and echo stack commands. '''
+    while True:
+        client_id, *_, name, data = await router.recv_multipart()
+        if name == b'REGISTER':
+            await router.send_multipart([client_id, HOST_ID, b'REGISTER', b''])
+            servers = {HOST_ID: dict(route=[], nodes=[NODE_ID])}
+            await router.send_multipart([client_id, HOST_ID, b'NODESCHANGED',
+                                         msgpack.packb(servers, use_bin_type=True)])
+        elif name == b'STACK':
+            for cmd in msgpack.unpackb(data, raw=False).split(';'):
+                text = cmd.split(' ', 1)[1] if cmd.startswith('ECHO') else f'ran {cmd}'
+                await router.send_multipart([client_id, NODE_ID, b'ECHO', msgpack.packb(
+                    dict(text=text, flags=0), use_bin_type=True)])
+            # Report a state change through the SIMINFO stream
+            await pub.send_multipart([b'SIMINFO' + NODE_ID, msgpack.packb(
+                (1.0, 0.05, 0.0, '', 0, 2, ''), use_bin_type=True)])
+
+
+def test_aioclient_stack():
+    """ Stack command completes, returns its echo text, and state is tracked. """
+    async def run():
+        ctx = zmq.asyncio.Context.instance()
+        router = ctx.socket(zmq.ROUTER)
+        pub = ctx.socket(zmq.PUB)
+        eport = router.bind_to_random_port('tcp://127.0.0.1')
+        sport = pub.bind_to_random_port('tcp://127.0.0.1')
+        server = asyncio.ensure_future(fake_server(router, pub))
+
+        async with AsyncClient() as client:
+            await client.connect('127.0.0.1', eport, sport)
+            assert await client.wait_for_nodes(1, timeout=5) == [NODE_ID]
+            assert client.actnode() == NODE_ID
+            # Allow the SUB socket to finish subscribing
+            await asyncio.sleep(0.2)
+            lines = await client.stack('OP', timeout=5)
+            assert lines == ['ran OP']
+            assert await client.wait_for_state(2, timeout=5) == 2
+
+        server.cancel()
+        router.close(linger=0)
+        pub.close(linger=0)
+
+    asyncio.run(run())
@@ -0,0 +1,46 @@
+"""
+Tests the batch scenario scheduler of the server.
+"""
+import json
+from bluesky.network.server import split_scenarios
+from bluesky.network.scheduler import BatchScheduler
+
+
+def make_scenarios(*names):
+    """ Create a batch of scenarios with the given names. """
+    scencmd = [line for name in names for line in (f'SCEN {name}', 'CRE KL1', 'HOLD')]
+    scentime = [0.0] * len(scencmd)
+    return list(split_scenarios(scentime, scencmd))
+
+
+def test_scheduler_priority():
+    """ Higher priority scenarios are dispatched first, then in submission order. """
+    sched = BatchScheduler()
+    assert not sched
+    sched.add(make_scenarios('A', 'B'))
+    sched.add(make_scenarios('C'), priority=1)
+    assert len(sched) == 3
+    names = [sched.next(bytes([i]))['name'] for i in range(3)]
+    assert names == ['C', 'A', 'B']
+    assert not sched
+
+
+def test_scheduler_requeue(tmp_path):
+    """ Scenarios of dead nodes are requeued until max_attempts is reached. """
+    sched = BatchScheduler(max_attempts=2)
+    sched.start_manifest(str(tmp_path))
+    sched.add(make_scenarios('A', 'B'))
+    sched.next(b'n1')
+    sched.next(b'n2')
+    assert sched.fail(b'n1')
+    assert sched.next(b'n3')['name'] == 'A'
+    assert not sched.fail(b'n3')
+    entry = sched.complete(b'n2', dict(logfiles=['x.log']))
+    assert entry['name'] == 'B' and entry['logfiles'] == ['x.log']
+    assert sched.complete(b'n2') is None
+
+    progress = sched.progress()
+    assert progress['completed'] == 1 and progress['failed'] == 1
+    with open(sched.manifest_path) as fin:
+        manifest = json.load(fin)
+    assert [s['status'] for s in manifest['scenarios']] == ['done', 'failed']
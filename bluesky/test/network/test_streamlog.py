@@ -0,0 +1,66 @@
+"""
+Tests writing and reading of stream recordings.
+"""
+from bluesky.network.streamlog import StreamRecorder, StreamReader
+
+
+def record(fname, close=True):
+    """ Record 100 s of ACDATA and TRAILS messages in 10-second chunks. """
+    rec = StreamRecorder(fname, chunk_dt=10.0)
+    for i in range(101):
+        rec.record(float(i), b'ACDATA', b'ac%d' % i)
+        rec.record(float(i), b'TRAILS', b'tr%d' % i)
+        rec.record(float(i), b'PLOT*', b'not recorded')
+    rec.record(100.0, b'ROUTEDATA\x00abcd', b'route')
+    if close:
+        rec.close()
+    else:
+        rec.flush()
+        rec.file.close()
+
+
+def test_streamlog_roundtrip(tmp_path):
+    """ All recorded messages are read back in order, and seeking works. """
+    fname = str(tmp_path / 'rec.bsr')
+    record(fname)
+    reader = StreamReader(fname)
+    assert reader.tstart == 0.0 and reader.tend == 100.0
+    assert len(reader.index) > 5
+    records = list(reader.records())
+    assert len(records) == 203
+    assert records[0] == (0.0, b'ACDATA', b'ac0')
+    assert records[-1] == (100.0, b'ROUTEDATA*', b'route')
+
+    records = list(reader.records(tstart=55.0))
+    assert records[0] == (55.0, b'ACDATA', b'ac55')
+    assert len(records) == 2 * 46 + 1
+    reader.close()
+
+
+def test_streamlog_timejump(tmp_path):
+    """ Recording times keep increasing when the simulation time jumps back. """
+    fname = str(tmp_path / 'rec.bsr')
+    rec = StreamRecorder(fname, chunk_dt=10.0)
+    for simt in [float(i) for i in range(30)] + [float(i) for i in range(5, 30)]:
+        rec.record(simt, b'ACDATA', b'ac%d' % simt)
+    rec.close()
+    reader = StreamReader(fname)
+    assert reader.tend == 53.0
+    t0, t1, _ = zip(*reader.index)
+    assert list(t0) == sorted(t0) and list(t1) == sorted(t1)
+    records = list(reader.records())
+    assert [rec[0] for rec in records] == sorted(rec[0] for rec in records)
+    # Records after the jump continue from the last recorded time
+    assert records[30] == (29.0, b'ACDATA', b'ac5')
+    assert list(reader.records(tstart=40.0))[0] == (40.0, b'ACDATA', b'ac16')
+    reader.close()
+
+
+def test_streamlog_unclosed(tmp_path):
+    """ The index of a recording that wasn't closed is rebuilt. """
+    fname = str(tmp_path / 'rec.bsr')
+    record(fname, close=False)
+    reader = StreamReader(fname)
+    assert reader.tend == 100.0
+    assert len(list(reader.records())) == 203
+    reader.close()
@@ -0,0 +1,44 @@
+"""
+Tests the tabulated atmosphere against the ISA equations.
+"""
+import numpy as np
+import pytest
+from bluesky.tools import aero
+
+
+@pytest.fixture
+def atmosdata(monkeypatch):
+    monkeypatch.setattr(aero, 'atmtable', None)
+    rng = np.random.default_rng(0)
+    h = np.concatenate((rng.uniform(-500.0, 25000.0, 2000), [0.0, 11000.0, 29999.0]))
+    # Speeds as Mach numbers and as CAS, and negative speeds
+    spd = np.where(rng.random(len(h)) < 0.5, rng.uniform(0.2, 0.95, len(h)),
+                   rng.uniform(-20.0, 250.0, len(h)))
+    return h, spd
+
+
+def conversions(h, spd):
+    cas = np.abs(spd) + 50.0
+    return (*aero.vatmos(h), aero.vtemp(h), aero.vpressure(h), aero.vdensity(h),
+            aero.vvsound(h), aero.vcas2tas(cas, h), aero.vtas2cas(cas, h),
+            aero.vmach2cas(spd, h), aero.vcas2mach(cas, h), *aero.vcasormach(spd, h),
+            aero.vcasormach2tas(spd, h))
+
+
+def test_atmostable(atmosdata):
+    """ The tabulated atmosphere matches the ISA equations within its tolerance. """
+    h, spd = atmosdata
+    ref = conversions(h, spd)
+    aero.atmostable(True)
+    result = conversions(h, spd)
+    for r, v in zip(ref, result):
+        assert np.allclose(v, r, rtol=1e-7, atol=1e-4)
+
+    # Outside the table the ISA equations are used
+    hout = np.array([-3000.0, 40000.0])
+    assert np.array_equal(aero.vatmos(hout), aero.isaatmos(hout))
+    # Scalars
+    tas = aero.vcas2tas(100.0, 3000.0)
+    aero.atmostable(False)
+    assert tas == pytest.approx(aero.vcas2tas(100.0, 3000.0), abs=1e-4)
+
@@ -0,0 +1,141 @@
+"""
+Tests the vectorized point-in-area engine of the areafilter.
+"""
+import numpy as np
+from matplotlib.path import Path
+from bluesky.tools import areafilter
+
+
+def test_checkinsideall(monkeypatch):
+    """ The engine gives the same results as the individual shape checks,
+        and polygons match matplotlib's point-in-polygon test. """
+    monkeypatch.setattr(areafilter, 'basic_shapes', dict())
+    rng = np.random.default_rng(1)
+    poly = [52.0, 4.0, 53.0, 4.5, 52.5, 5.5, 53.2, 6.0, 51.8, 6.2, 51.5, 5.0]
+    shapes = [areafilter.Box('BOX', [52.6, 4.2, 51.9, 5.1]),
+              areafilter.Circle('CIRCLE', [52.3, 5.0, 30.0], top=5000.0),
+              areafilter.Poly('POLY', poly, top=10000.0, bottom=1000.0),
+              areafilter.Line('LINE', [52.0, 4.0, 53.0, 6.0])]
+    for shape in shapes:
+        areafilter.basic_shapes[shape.name] = shape
+
+    lat = rng.uniform(51.0, 54.0, 5000)
+    lon = rng.uniform(3.5, 6.5, 5000)
+    alt = rng.uniform(0.0, 12000.0, 5000)
+    names, inside = areafilter.checkInsideAll(lat, lon, alt)
+    assert names == ['BOX', 'CIRCLE', 'POLY', 'LINE']
+    for shape, row in zip(shapes[:3], inside):
+        assert np.array_equal(row, shape.checkInside(lat, lon, alt))
+    assert not inside[3].any()
+
+    ref = Path(np.reshape(poly, (-1, 2))).contains_points(np.vstack((lat, lon)).T)
+    ref &= (alt >= 1000.0) & (alt <= 10000.0)
+    assert np.array_equal(inside[2], ref)
+
+    # Selection of areas, and sparse output
+    names, (iarea, ipoint) = areafilter.checkInsideAll(
+        lat, lon, alt, ['POLY', 'UNKNOWN', 'BOX'], sparse=True)
+    assert set(iarea) == {0, 2}
+    assert np.array_equal(np.sort(ipoint[iarea == 0]), np.flatnonzero(ref))
+
+    # A newly defined area is picked up by the engine
+    areafilter.basic_shapes['BOX2'] = areafilter.Box('BOX2', [51.0, 3.5, 54.0, 6.5])
+    names, inside = areafilter.checkInsideAll(lat, lon, alt)
+    assert inside[-1].all()
+
+
+def test_areatracker(monkeypatch):
+    """ Incremental tracking gives the same membership as a full check in
+        every step, and reports all entries and exits. """
+    monkeypatch.setattr(areafilter, 'basic_shapes', dict())
+    rng = np.random.default_rng(2)
+    shapes = [areafilter.Box('BOX', [52.0, 4.0, 52.6, 5.0], top=6000.0),
+              areafilter.Circle('CIRCLE', [52.3, 5.0, 20.0]),
+              areafilter.Poly('POLY', [52.0, 4.0, 53.0, 4.5, 52.5, 5.5, 51.8, 5.2])]
+    names = [shape.name for shape in shapes]
+    for shape in shapes:
+        areafilter.basic_shapes[shape.name] = shape
+    tracker = areafilter.AreaTracker()
+    events = dict()
+    for name in names:
+        tracker.subscribe(name, lambda name, entered, exited:
+                          events.__setitem__(name, (set(entered), set(exited))))
+
+    ntraf = 300
+    ids = np.array([f'AC{i}' for i in range(ntraf)], dtype=object)
+    lat, lon, alt = rng.uniform((51.5, 3.7, 0.0), (53.3, 5.8, 10000.0), (ntraf, 3)).T
+    vlat, vlon = rng.uniform(-0.01, 0.01, (2, ntraf))
+    prev = np.zeros((3, ntraf), dtype=bool)
+    for step in range(60):
+        deleted = set()
+        if step == 30:
+            # Delete some aircraft, and create new ones
+            deleted = {(i, acid) for i in range(3) for acid in ids[:50][prev[i, :50]]}
+            ids = np.append(ids[50:], [f'NEW{i}' for i in range(20)])
+            lat, lon, alt, vlat, vlon = (np.append(v[50:], v[:20]) for v in (lat, lon, alt, vlat, vlon))
+            prev = np.hstack((prev[:, 50:], np.zeros((3, 20), dtype=bool)))
+        events.clear()
+        lat, lon, alt = lat + vlat, lon + vlon, alt + 50.0
+        tracker.update(list(ids), lat, lon, alt)
+        _, ref = areafilter.checkInsideAll(lat, lon, alt, names)
+        assert np.array_equal(tracker.member.T, ref)
+        for i, name in enumerate(names):
+            entered, exited = events.get(name, (set(), set()))
+            assert entered == set(np.flatnonzero(ref[i] & ~prev[i]))
+            assert exited == set(ids[prev[i] & ~ref[i]]) | {acid for j, acid in deleted if j == i}
+        prev = ref
+
+    # Most pairs are far enough from the area boundaries to skip retesting
+    hmargin, vmargin = np.array([tracker.margins(name) for name in names]).transpose(1, 0, 2)
+    assert np.mean((hmargin > 0.5) & (vmargin > 0.0)) > 0.8
+
+
+def test_segcrossing():
+    """ Segment/polygon intersection matches matplotlib for closed polygons. """
+    rng = np.random.default_rng(3)
+    poly = [52.0, 4.0, 53.0, 4.5, 52.5, 5.5, 53.2, 6.0, 51.8, 6.2, 51.5, 5.0]
+    edges = areafilter.polyedges(poly)
+    pts = np.reshape(poly, (-1, 2))
+    border = Path(np.vstack((pts, pts[:1])), closed=True)
+    lat0 = rng.uniform(51.0, 54.0, 2000)
+    lon0 = rng.uniform(3.5, 6.5, 2000)
+    lat1, lon1 = lat0 + rng.uniform(-0.5, 0.5, 2000), lon0 + rng.uniform(-0.5, 0.5, 2000)
+    first, count = np.zeros(2000, dtype=int), np.full(2000, edges.shape[1])
+    hit = areafilter.segcrossing(lat0, lon0, lat1, lon1, edges, first, count) | \
+        areafilter.inpolys(lat0, lon0, edges, first, count)
+    ref = [border.intersects_path(Path([(a, b), (c, d)]), filled=True)
+           for a, b, c, d in zip(lat0, lon0, lat1, lon1)]
+    assert np.array_equal(hit, ref)
+
+
+def test_subscribe_seeds_area(monkeypatch):
+    """ A new area gets its membership on subscription, without an update
+        of the other areas. """
+    monkeypatch.setattr(areafilter, 'basic_shapes', dict())
+    rng = np.random.default_rng(3)
+    for shape in (areafilter.Box('BOX', [52.0, 4.0, 52.6, 5.0]),
+                  areafilter.Circle('CIRCLE', [52.3, 5.0, 20.0])):
+        areafilter.basic_shapes[shape.name] = shape
+    tracker = areafilter.AreaTracker()
+    events = []
+    tracker.subscribe('BOX', lambda *args: events.append(args))
+
+    ids = [f'AC{i}' for i in range(200)]
+    lat, lon, alt = rng.uniform((51.5, 3.7, 0.0), (53.3, 5.8, 10000.0), (200, 3)).T
+    tracker.update(ids, lat, lon, alt)
+    events.clear()
+    nbox = tracker.count('BOX')
+
+    seeded = []
+    tracker.subscribe('CIRCLE', lambda *args: seeded.append(args))
+    assert not events and tracker.count('BOX') == nbox
+    _, ref = areafilter.checkInsideAll(lat, lon, alt, ['CIRCLE'])
+    assert np.array_equal(tracker.inside('CIRCLE'), ref[0])
+    assert len(seeded) == 1 and set(seeded[0][1]) == set(np.flatnonzero(ref[0]))
+
+    # Subsequent updates keep all areas up to date
+    seeded.clear()
+    lat = lat + 0.05
+    tracker.update(ids, lat, lon, alt)
+    _, ref = areafilter.checkInsideAll(lat, lon, alt, ['BOX', 'CIRCLE'])
+    assert np.array_equal(tracker.member.T, ref)
@@ -0,0 +1,35 @@
+"""
+Tests the columnar binary log format.
+"""
+import numpy as np
+from bluesky.tools.binlog import BinWriter, BinLogReader
+
+
+def test_binlog_roundtrip(tmp_path):
+    """ Typed columns and interned strings are read back over multiple blocks. """
+    fname = str(tmp_path / 'test.blog')
+    writer = BinWriter(fname, 'TESTLOG', ['Test log'], block_rows=5)
+    names = ['simt', 'id', 'alt', 'inconf', 'count']
+    for i in range(4):
+        writer.write([np.full(3, float(i)), ['KL1', 'KL2', f'NEW{i}'],
+                      np.arange(3) * 1000.0, np.array([True, False, i % 2 == 0]),
+                      np.arange(3) + i], names)
+    writer.close()
+
+    reader = BinLogReader(fname)
+    assert reader.name == 'TESTLOG' and reader.header == ['Test log']
+    assert reader.colnames == names
+    assert reader.nrows == 12 and len(reader.blocks) == 2
+    assert np.all(reader.column('simt') == np.repeat(np.arange(4.0), 3))
+    assert list(reader.column('id')[:6]) == ['KL1', 'KL2', 'NEW0', 'KL1', 'KL2', 'NEW1']
+    assert reader.column('inconf').dtype == bool
+    assert reader.column('count').dtype == np.int64
+    assert len(reader.strings) == 6
+
+    csvname = str(tmp_path / 'test.log')
+    reader.to_csv(csvname)
+    with open(csvname) as fin:
+        lines = fin.read().splitlines()
+    assert lines[:2] == ['# Test log', '# simt, id, alt, inconf, count']
+    assert lines[2] == '0.00000000,KL1,0.00000000,1,0'
+    assert len(lines) == 14
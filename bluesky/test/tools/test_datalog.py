@@ -0,0 +1,138 @@
+"""
+Tests the background log writer of the datalogger.
+"""
+import threading
+import numpy as np
+from bluesky.tools import datalog
+
+
+def test_logwriter_order_and_flush():
+    """ Queued writes are done in order, and flush waits for all of them. """
+    writer = datalog.LogWriter(maxsize=10)
+    writer.start()
+    written = []
+    for i in range(100):
+        writer.submit(written.append, i)
+    writer.flush()
+    assert written == list(range(100))
+
+
+def test_logwriter_drop_when_full():
+    """ Non-blocking writes are dropped, and counted, when the queue is full. """
+    writer = datalog.LogWriter(maxsize=2)
+    started, release = threading.Event(), threading.Event()
+
+    def busy():
+        started.set()
+        release.wait()
+
+    writer.start()
+    # Keep the writer busy, so that the queue fills up
+    writer.submit(busy)
+    started.wait()
+    written = []
+    for i in range(5):
+        writer.submit(written.append, i, block=False)
+    release.set()
+    writer.flush()
+    assert written == [0, 1]
+    assert writer.ndropped == 3
+
+
+def test_snapshot_copies():
+    """ Snapshots are not affected by later changes to the logged variables. """
+    arr = np.arange(3.0)
+    lst = ['KL1', 'KL2']
+    sarr, slst = datalog.snapshot(arr), datalog.snapshot(lst)
+    arr[0] = 10.0
+    lst.append('KL3')
+    assert sarr[0] == 0.0 and slst == ['KL1', 'KL2']
+
+
+def test_rotated_compressed_log(tmp_path, monkeypatch):
+    """ Rotated, compressed log segments are read back as a single log. """
+    monkeypatch.setattr(datalog.settings, 'log_rotate_interval', 10.0, raising=False)
+    names = iter(str(tmp_path / f'TESTLOG_{i:03d}.log.gz') for i in range(1, 100))
+    logfile = datalog.LogFile(str(tmp_path / 'TESTLOG_000.log.gz'),
+                              b'# Test log\n# simt, alt\n', lambda: next(names))
+    for simt in np.arange(0.0, 30.0, 2.5):
+        datalog.CSVLogger.writerows(logfile, [simt, np.array([1.0, 2.0])])
+    logfile.close()
+
+    segments = datalog.logsegments(str(tmp_path / 'TESTLOG_*'))
+    assert len(segments) == 3
+    lines = list(datalog.readlog(str(tmp_path / 'TESTLOG_*')))
+    assert lines[:2] == ['# Test log', '# simt, alt']
+    assert len(lines) == 2 + 2 * 12
+    assert lines[2] == '0.00000000,1.00000000'
+    assert lines[-1] == '27.50000000,2.00000000'
+
+
+def test_changefilter(monkeypatch):
+    """ Only rows that changed more than their deadband are logged, matched by aircraft id. """
+    monkeypatch.setattr(datalog.stack, 'append_commands', lambda cmds: None)
+    traf = type('Traf', (), {})()
+    monkeypatch.setattr(datalog.bs, 'traf', traf, raising=False)
+    logger = datalog.CSVLogger('TESTLOG', 1.0, '')
+    logger.selvars = [type('Var', (), dict(varname=name))() for name in ('alt', 'selspd')]
+    logger.deadbands['ALT'] = 10.0
+    logger.changemode = True
+
+    traf.id = ['KL1', 'KL2', 'KL3']
+    rows = logger.changefilter([0.0, np.array([1000.0, 2000.0, 3000.0]), np.array([100.0, 200.0, 300.0])])
+    assert len(rows[1]) == 3
+    # Changes within the deadband, and a changed selected speed for KL3
+    rows = logger.changefilter([1.0, np.array([1005.0, 2005.0, 3000.0]), np.array([100.0, 200.0, 310.0])])
+    assert list(rows[2]) == [310.0]
+    # Drift exceeds the deadband with respect to the last logged row of KL1
+    rows = logger.changefilter([2.0, np.array([1011.0, 2005.0, 3000.0]), np.array([100.0, 200.0, 310.0])])
+    assert list(rows[1]) == [1011.0]
+    # KL2 is deleted, and a new aircraft KL4 is always logged
+    traf.id = ['KL1', 'KL3', 'KL4']
+    rows = logger.changefilter([3.0, np.array([1011.0, 3000.0, 500.0]), np.array([100.0, 310.0, 50.0])])
+    assert list(rows[1]) == [500.0]
+    assert logger.changefilter([4.0, np.array([1011.0, 3000.0, 500.0]), np.array([100.0, 310.0, 50.0])]) is None
+
+
+def test_changefilter_add(monkeypatch):
+    """ Adding variables to a logger in change mode starts from a fresh reference. """
+    monkeypatch.setattr(datalog.stack, 'append_commands', lambda cmds: None)
+    traf = type('Traf', (), dict(id=['KL1', 'KL2']))()
+    monkeypatch.setattr(datalog.bs, 'traf', traf, raising=False)
+    variables = {name: type('Var', (), dict(varname=name))() for name in ('alt', 'tas', 'vs')}
+    monkeypatch.setattr(datalog.ve, 'findvar', lambda name: variables.get(name.lower()))
+    logger = datalog.CSVLogger('TESTLOG', 1.0, '')
+    assert logger.stackio('ADD', 'alt', 'tas') is True
+    assert logger.stackio('CHANGE', 'ON') is True
+    alt, tas, vs = np.array([1000.0, 2000.0]), np.array([100.0, 200.0]), np.array([0.0, 5.0])
+    assert logger.changefilter([0.0, alt, tas]) is not None
+    assert logger.changefilter([1.0, alt, tas]) is None
+    # Two to three columns: all rows are logged again
+    assert logger.stackio('ADD', 'alt', 'tas', 'vs') is True
+    assert len(logger.changefilter([2.0, alt, tas, vs])[1]) == 2
+    assert logger.changefilter([3.0, alt, tas, vs]) is None
+    # A change in the number of columns without ADD is not compared either
+    assert len(logger.changefilter([4.0, alt, tas, vs, np.array([1.0, 2.0])])[1]) == 2
+
+
+def test_reset_clears_files_after_flush(monkeypatch):
+    """ Files opened by queued writes of the previous run are not reported after reset. """
+    writer = datalog.LogWriter()
+    monkeypatch.setattr(datalog, 'writer', writer)
+    monkeypatch.setattr(datalog, 'allloggers', dict())
+    release = threading.Event()
+
+    def rotate():
+        release.wait()
+        datalog.openedfiles.append('OLDRUN_001.log')
+
+    def flush():
+        # The queued write only finishes once reset flushes the writer
+        release.set()
+        datalog.LogWriter.flush(writer)
+
+    monkeypatch.setattr(writer, 'flush', flush)
+    writer.start()
+    writer.submit(rotate)
+    datalog.reset()
+    assert datalog.logfiles() == []
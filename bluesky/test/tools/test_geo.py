@@ -0,0 +1,41 @@
+"""
+Tests the geodetic to ECEF and ENU transforms in geo.
+"""
+import numpy as np
+from bluesky.tools import geo
+
+
+def test_geodetic2ecef():
+    """ ECEF coordinates of known positions. """
+    assert np.allclose(geo.geodetic2ecef(0.0, 0.0, 0.0), (6378137.0, 0.0, 0.0))
+    assert np.allclose(geo.geodetic2ecef(90.0, 0.0, 0.0), (0.0, 0.0, 6356752.314245), atol=1e-6)
+    assert np.allclose(geo.geodetic2ecef(42.0, -82.0, 200.0),
+                       (660675.2518, -4700948.683, 4245737.662), atol=1e-3)
+
+
+def test_geodetic2enu():
+    """ ENU coordinates relative to an origin. """
+    lat0, lon0, alt0 = 52.3, 4.76, 10.0
+    assert np.allclose(geo.geodetic2enu(lat0, lon0, alt0, lat0, lon0, alt0), 0.0)
+    assert np.allclose(geo.geodetic2enu(lat0, lon0, alt0 + 100.0, lat0, lon0, alt0), (0.0, 0.0, 100.0))
+    east, north, up = geo.geodetic2enu(lat0 + 0.01, lon0 + 0.01, alt0, lat0, lon0, alt0)
+    assert east > 0.0 and north > 0.0 and up < 0.0
+
+    # The rotation to ENU axes is the rotation about z, then x, used before
+    rz = np.radians(-(90.0 + lon0))
+    rx = np.radians(-(90.0 - lat0))
+    rotz = np.array([[np.cos(rz), -np.sin(rz), 0.0], [np.sin(rz), np.cos(rz), 0.0], [0.0, 0.0, 1.0]])
+    rotx = np.array([[1.0, 0.0, 0.0], [0.0, np.cos(rx), -np.sin(rx)], [0.0, np.sin(rx), np.cos(rx)]])
+    assert np.allclose(geo.ecef2enu_matrix(lat0, lon0), rotx.dot(rotz))
+
+
+def test_batched():
+    """ Positions can be converted in one call, with the same results per position. """
+    rng = np.random.default_rng(1)
+    lat = rng.uniform(50.0, 54.0, 100)
+    lon = rng.uniform(2.0, 7.0, 100)
+    alt = rng.uniform(0.0, 12000.0, 100)
+    enu = np.vstack(geo.geodetic2enu(lat, lon, alt, 52.3, 4.76))
+    for i in range(len(lat)):
+        assert np.allclose(enu[:, i], geo.geodetic2enu(lat[i], lon[i], alt[i], 52.3, 4.76))
+    assert geo.enutransform(52.3, 4.76, 0.0) is geo.enutransform(52.3, 4.76, 0.0)
@@ -0,0 +1,112 @@
+"""
+Tests the geodesy kernels against the geo functions.
+"""
+import numpy as np
+import pytest
+from bluesky.tools import geo, geokernels
+
+
+@pytest.fixture(params=['numpy', 'numba'])
+def backend(request, monkeypatch):
+    if request.param == 'numba':
+        pytest.importorskip('numba')
+    monkeypatch.setattr(geokernels, 'backend', request.param)
+    return request.param
+
+
+def positions(n, seed=0):
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(-80.0, 80.0, n)
+    lon = rng.uniform(-180.0, 180.0, n)
+    # Positions close to each other, on both hemispheres and across the date line
+    lat[:4] = [0.0, 0.0, -0.001, 52.0]
+    lon[:4] = [179.99, -179.99, 5.0, 4.0]
+    return lat, lon
+
+
+def close(result, ref, **tol):
+    """ Results match, where the reference is defined (geo.latlondist gives
+        nan for two positions on the equator). """
+    defined = np.isfinite(ref)
+    return np.all(np.isfinite(result)) and np.allclose(result[defined], ref[defined], **tol)
+
+
+def test_kernels(backend):
+    """ The kernels give the same results as the geo functions. """
+    lat1, lon1 = positions(500)
+    lat2, lon2 = positions(500, 1)
+    lat2[:4], lon2[:4] = lat1[:4] + [0.0, 0.0, 0.002, 1e-5], lon1[:4] + [0.0, 0.01, 0.0, 1e-5]
+
+    assert np.allclose(geokernels.rwgs84(lat1), geo.rwgs84(lat1), rtol=1e-12)
+    qdr, dist = geokernels.qdrdist(lat1, lon1, lat2, lon2)
+    qdrref, distref = geo.qdrdist(lat1, lon1, lat2, lon2)
+    assert np.allclose(qdr, qdrref, atol=1e-8)
+    # geo.qdrdist uses the (less accurate) spherical law of cosines
+    assert np.allclose(dist, distref, rtol=1e-9, atol=1e-4)
+    assert close(geokernels.latlondist(lat1, lon1, lat2, lon2),
+                 geo.latlondist(lat1, lon1, lat2, lon2), rtol=1e-12)
+    assert np.allclose(geokernels.kwikdist(lat1, lon1, lat2, lon2),
+                       geo.kwikdist(lat1, lon1, lat2, lon2), rtol=1e-12)
+    qdr, dist = geokernels.kwikqdrdist(lat1, lon1, lat2, lon2)
+    qdrref, distref = geo.kwikqdrdist(lat1, lon1, lat2, lon2)
+    assert np.allclose(qdr, qdrref, atol=1e-8) and np.allclose(dist, distref, rtol=1e-12)
+
+    # Scalars give 0-d arrays
+    qdr, dist = geokernels.kwikqdrdist(52.0, 4.0, 53.0, 5.0)
+    assert qdr.shape == () and dist == pytest.approx(geo.kwikdist(52.0, 4.0, 53.0, 5.0))
+
+
+def test_matrix(backend):
+    """ Matrix kernels give arrays with the values between all pairs of positions. """
+    lat1, lon1 = positions(40)
+    lat2, lon2 = positions(30, 1)
+    qdr, dist = geokernels.kwikqdrdist_matrix(lat1, lon1, lat2, lon2)
+    assert type(qdr) is np.ndarray and qdr.shape == (40, 30)
+    qdrref, distref = geo.kwikqdrdist(lat1[:, None], lon1[:, None], lat2, lon2)
+    assert np.allclose(qdr, qdrref, atol=1e-8) and np.allclose(dist, distref)
+    assert np.allclose(geokernels.kwikdist_matrix(lat1, lon1, lat2, lon2), distref)
+    assert close(geokernels.latlondist_matrix(lat1, lon1, lat2, lon2),
+                 geo.latlondist(lat1[:, None], lon1[:, None], lat2, lon2))
+    qdr, dist = geokernels.qdrdist_matrix(lat1, lon1, lat2, lon2)
+    qdrref, distref = geo.qdrdist(lat1[:, None], lon1[:, None], lat2, lon2)
+    assert np.allclose(qdr, qdrref, atol=1e-8) and np.allclose(dist, distref, atol=1e-4)
+
+    # The geo matrix functions take 1 x n matrices, and return arrays
+    qdr2, dist2 = geo.qdrdist_matrix(np.asmatrix(lat1), np.asmatrix(lon1),
+                                     np.asmatrix(lat2), np.asmatrix(lon2))
+    assert not isinstance(qdr2, np.matrix)
+    assert np.array_equal(qdr2, qdr) and np.array_equal(dist2, dist)
+
+
+def test_out_float32(backend):
+    """ Results are written to out arrays, and can be calculated in float32. """
+    lat1, lon1 = positions(200)
+    lat2, lon2 = positions(200, 1)
+    qdr, dist = np.empty(200), np.empty(200)
+    result = geokernels.kwikqdrdist(lat1, lon1, lat2, lon2, out=(qdr, dist))
+    assert result[0] is qdr and result[1] is dist
+    assert np.allclose(dist, geo.kwikdist(lat1, lon1, lat2, lon2))
+
+    out = np.empty((200, 200), dtype=np.float32)
+    geokernels.latlondist_matrix(lat1, lon1, lat2, lon2, out=out)
+    ref = geokernels.latlondist_matrix(lat1, lon1, lat2, lon2)
+    assert np.allclose(out, ref, rtol=1e-4, atol=10.0)
+
+    qdr, dist = geokernels.qdrdist(lat1, lon1, lat2, lon2, dtype=np.float32)
+    qdrref, distref = geokernels.qdrdist(lat1, lon1, lat2, lon2)
+    assert qdr.dtype == dist.dtype == np.float32
+    assert np.allclose(dist, distref, rtol=1e-4, atol=0.01)
+    assert np.allclose(qdr, qdrref, atol=0.01)
+
+
+def test_scalar_kernels():
+    """ The scalar kernels (compiled with numba) match the numpy kernels. """
+    lat1, lon1 = positions(100)
+    lat2, lon2 = positions(100, 1)
+    scalar = lambda kernel, *args: np.array([getattr(kernel, 'py_func', kernel)(*values)
+                                             for values in zip(*args)]).T
+    assert np.allclose(scalar(geokernels._rwgs84, lat1), geokernels.rwgs84(lat1), rtol=1e-12)
+    for name in ('qdrdist', 'latlondist', 'kwikdist', 'kwikqdrdist'):
+        ref = getattr(geokernels, name)(lat1, lon1, lat2, lon2)
+        assert np.allclose(scalar(getattr(geokernels, '_' + name), lat1, lon1, lat2, lon2),
+                           ref, rtol=1e-12, atol=1e-9), name
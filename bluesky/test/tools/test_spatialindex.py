@@ -0,0 +1,54 @@
+"""
+Tests the numpy spatial index that replaces rtree when it is not installed.
+"""
+import numpy as np
+import pytest
+from bluesky.tools.spatialindex import Index
+
+
+def randomboxes(rng, n):
+    lo = rng.uniform(0.0, 100.0, (n, 2))
+    return np.hstack((lo, lo + rng.uniform(0.0, 3.0, (n, 2))))
+
+
+def test_intersection():
+    """ Intersection and count match a brute-force search, also after
+        inserts and deletes between queries. """
+    rng = np.random.default_rng(0)
+    boxes = randomboxes(rng, 2000)
+    idx = Index()
+    live = set()
+    for i, box in enumerate(boxes):
+        idx.insert(i, box)
+        live.add(i)
+        if i % 5 == 0:
+            j = rng.integers(0, i + 1)
+            if j in live:
+                idx.delete(j, boxes[j])
+                live.remove(j)
+        if i % 100 == 0:
+            q = randomboxes(rng, 1)[0] * [1, 1, 2, 2]
+            ref = [k for k in live if boxes[k, 0] <= q[2] and q[0] <= boxes[k, 2]
+                   and boxes[k, 1] <= q[3] and q[1] <= boxes[k, 3]]
+            assert sorted(idx.intersection(q)) == sorted(ref)
+            assert idx.count(q) == len(ref)
+    assert len(idx) == len(live)
+
+
+def test_rtree_equivalence():
+    """ Intersection and nearest (including ties) give the same results as rtree. """
+    rtree = pytest.importorskip('rtree')
+    rng = np.random.default_rng(1)
+    a, b = Index(), rtree.index.Index()
+    # Integer boxes to create ties in nearest distance
+    boxes = np.round(randomboxes(rng, 1000))
+    for i, box in enumerate(boxes):
+        a.insert(i, box)
+        b.insert(i, box)
+    for i in range(0, 1000, 3):
+        a.delete(i, boxes[i])
+        b.delete(i, boxes[i])
+    for q in np.round(rng.uniform(0.0, 100.0, (200, 2))):
+        assert sorted(a.intersection(q)) == sorted(b.intersection(q))
+        for k in (1, 4):
+            assert sorted(a.nearest(q, k)) == sorted(b.nearest(q, k))
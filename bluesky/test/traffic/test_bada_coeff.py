@@ -0,0 +1,118 @@
+"""
+Tests the BADA coefficient cache and coefficient table, with generated BADA files.
+"""
+import importlib
+import re
+import numpy as np
+import pytest
+from bluesky import settings
+
+
+def dataline(fmt, values):
+    ''' Format values as a fixed-width data line of format fmt. '''
+    line = ''
+    values = iter(values)
+    for token in re.split(r'[\s,]+', fmt.strip()):
+        width, kind = token[:-1], token[-1].upper()
+        if not width.isdigit():
+            line += token
+        elif kind == 'X':
+            line += ' ' * int(width)
+        else:
+            line += str(next(values)).rjust(int(width))[:int(width)]
+    return line + '\n'
+
+
+def write_bada(path, types, coeff_bada):
+    ''' Write a synonym file, and OPF and APF files, for aircraft types
+        (a dict of the coefficient file name per type). '''
+    with open(path / 'SYNONYM.NEW', 'w') as f:
+        for accode, fname in types.items():
+            f.write(dataline(coeff_bada.syn_format[0],
+                             ['-', accode, 'MAKER', f'MODEL {accode}', fname, 'Y']))
+    for i, fname in enumerate(sorted(set(types.values()) - {'NOFILE'})):
+        engtype = ('Jet', 'Turboprop', 'Piston')[i % 3]
+        with open(path / f'{fname}.OPF', 'w') as f:
+            f.write('CC comment line\n')
+            f.write(dataline(coeff_bada.opf_format[0], [fname, 2, engtype, 'M']))
+            for j, fmt in enumerate(coeff_bada.opf_format[1:]):
+                nvalues = len(re.findall(r'\d+[FIS]', fmt, re.IGNORECASE))
+                f.write(dataline(fmt, [f'{(i + 1) * 10.0 + j + k / 10:.4f}' for k in range(nvalues)]))
+        if i % 2 == 0:
+            with open(path / f'{fname}.APF', 'w') as f:
+                f.write(dataline(coeff_bada.apt_format[0], ['AAA', 'BB', 'COMPANY']))
+                for j, fmt in enumerate(coeff_bada.apt_format[1:]):
+                    f.write(dataline(fmt, [(i + 2) * 10 + j + k for k in range(12)]))
+
+
+@pytest.fixture
+def bada(tmp_path, monkeypatch):
+    ''' Generated BADA files, and the coeff_bada module. The BADA package
+        can only be imported when there are BADA files. '''
+    (tmp_path / 'ReleaseSummary').write_text('Summary Date: 01/01/2020\nBADA Release: 3.99\n')
+    (tmp_path / 'SYNONYM.NEW').write_text('')
+    monkeypatch.setattr(settings, 'perf_path_bada', str(tmp_path), raising=False)
+    (tmp_path / 'cache').mkdir()
+    monkeypatch.setattr(settings, 'cache_path', str(tmp_path / 'cache'))
+    coeff_bada = importlib.import_module('bluesky.traffic.performance.bada.coeff_bada')
+    write_bada(tmp_path, dict(B744='B744__', A320='A320__', A319='A320__',
+                              C172='C172__', XXXX='NOFILE'), coeff_bada)
+    monkeypatch.setattr(coeff_bada, 'coefftable', None)
+    return tmp_path, coeff_bada
+
+
+def reinit(bada_path, coeff_bada, monkeypatch):
+    for name in ('synonyms', 'accoeffs'):
+        monkeypatch.setattr(coeff_bada, name, dict())
+    assert coeff_bada.init(str(bada_path))
+    return coeff_bada.synonyms, coeff_bada.accoeffs, coeff_bada.coefftable
+
+
+def test_cache(bada, monkeypatch):
+    ''' The parsed BADA files are stored in, and loaded from the cache. '''
+    path, coeff_bada = bada
+    synonyms, accoeffs, _ = reinit(path, coeff_bada, monkeypatch)
+    assert (path / 'cache' / 'bada.p').is_file()
+    assert sorted(synonyms) == ['A319', 'A320', 'B744', 'C172', 'XXXX']
+    assert sorted(accoeffs) == ['A320__', 'B744__', 'C172__']
+
+    # Files are not parsed again when the cache exists
+    def noparse(bada_path):
+        raise AssertionError('BADA files parsed again')
+    monkeypatch.setattr(coeff_bada, 'parse_files', noparse)
+    cached_synonyms, cached_accoeffs, _ = reinit(path, coeff_bada, monkeypatch)
+    assert {k: vars(v) for k, v in cached_synonyms.items()} == {k: vars(v) for k, v in synonyms.items()}
+    assert {k: vars(v) for k, v in cached_accoeffs.items()} == {k: vars(v) for k, v in accoeffs.items()}
+
+
+def test_coefftable(bada, monkeypatch):
+    ''' The coefficient table has the coefficients of each set, per type. '''
+    path, coeff_bada = bada
+    _, accoeffs, table = reinit(path, coeff_bada, monkeypatch)
+    idx = table.index(['A320', 'XXXX', 'C172', 'A319', 'UNKNOWN', 'A320', 'B744'])
+    assert idx.tolist()[1] == idx.tolist()[4] == -1
+    assert idx[0] == idx[3] == idx[5] == table.actypes.index('A320__')
+
+    coeff = table.rows(idx[[0, 2]])
+    for i, ac in enumerate((accoeffs['A320__'], accoeffs['C172__'])):
+        for name in table.scalars:
+            assert getattr(coeff, name)[i] == getattr(ac, name)
+        assert coeff.CTC_4[i] == ac.CTC[4]
+        assert coeff.Mcl_0[i] == ac.Mcl[0] and coeff.CASdes1_2[i] == ac.CASdes1[2]
+        assert coeff.jet[i] == (ac.engtype == 'Jet')
+    assert not np.isnan(table.data).any()
+    assert coeff.CVmin == coeff_bada.ACData.CVmin
+
+    # The B744 set has no APF file: it is not used, and the first available
+    # type replaces B744 as default type
+    assert idx[6] == -1 and 'B744__' not in table.actypes
+    assert table.defaulttype == 'A320'
+
+
+def test_default_type(bada, monkeypatch):
+    ''' B744 is the default type when it has a complete coefficient set. '''
+    path, coeff_bada = bada
+    (path / 'B744__.APF').write_text((path / 'A320__.APF').read_text())
+    _, _, table = reinit(path, coeff_bada, monkeypatch)
+    assert table.defaulttype == 'B744'
+    assert table.actypes[table.typeindex['B744']] == 'B744__'
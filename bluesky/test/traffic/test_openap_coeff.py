@@ -0,0 +1,41 @@
+"""
+Tests the cached OpenAP coefficient store.
+"""
+import pickle
+from pathlib import Path
+from bluesky import settings
+from bluesky.traffic.performance.openap import coeff
+
+
+def test_coefficient_cache(tmp_path, monkeypatch):
+    """ Coefficients from the cache are the parsed coefficients, loaded per type on first use. """
+    monkeypatch.setattr(settings, 'cache_path', str(tmp_path))
+    ref = coeff.load_coefficients(Path(settings.perf_path_openap))
+    built = coeff.Coefficient()
+    assert (tmp_path / 'openap.p').is_file()
+    cached = coeff.Coefficient()
+
+    for c in (built, cached):
+        assert c.actypes_fixwing == list(ref['fixwing'])
+        assert c.actypes_rotor == list(ref['rotor'])
+        assert c.synodict == ref['synonyms']
+        assert not c.acs_fixwing.loaded and not c.limits_fixwing.loaded
+
+    mdl = cached.actypes_fixwing[0]
+    assert cached.acs_fixwing[mdl] == pickle.loads(ref['fixwing'][mdl])
+    assert list(cached.acs_fixwing.loaded) == [mdl]
+    assert cached.limits_fixwing[mdl] == pickle.loads(ref['fixwing_limits'][mdl])
+
+    # Synonyms (also of synonyms) give the envelope of their type
+    for syno, mdl in cached.limits_fixwing.aliases.items():
+        assert mdl in ref['fixwing_limits']
+        assert cached.limits_fixwing[syno] is cached.limits_fixwing[mdl]
+    assert 'A124' in cached.limits_fixwing and 'A124' not in cached.acs_fixwing
+
+    # The engine table is read once, on first use
+    assert cached._engines_fixwing is None
+    assert cached.engines_fixwing is cached.engines_fixwing
+    assert len(cached.engines_fixwing) > 0
+
+    mdl = cached.actypes_rotor[0]
+    assert cached.limits_rotor[mdl]['vmax'] == cached.acs_rotor[mdl]['envelop'].get('v_max', 20)
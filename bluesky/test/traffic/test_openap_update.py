@@ -0,0 +1,63 @@
+"""
+Tests the incremental update of the OpenAP speed limits and drag coefficients.
+"""
+import types
+import numpy as np
+import bluesky as bs
+from bluesky.core.trafficarrays import TrafficArrays
+from bluesky.traffic.performance.openap import perfoap, phase as ph
+
+
+def reference(perf):
+    """ Speed limits and drag coefficients of all aircraft, from their flight phase. """
+    vmin, vmax = perf._construct_v_limits()
+    cd0, k = np.zeros(len(perf.phase)), np.zeros(len(perf.phase))
+    for phase, cd0_ph, k_ph in ((ph.GD, perf.cd0_to + perf.delta_cd_gear, perf.k_to),
+                                (ph.IC, perf.cd0_to, perf.k_to),
+                                (ph.AP, perf.cd0_ld, perf.k_ld),
+                                (ph.CL, perf.cd0_clean, perf.k_clean),
+                                (ph.CR, perf.cd0_clean, perf.k_clean),
+                                (ph.DE, perf.cd0_clean, perf.k_clean),
+                                (ph.NA, perf.cd0_clean, perf.k_clean)):
+        sel = perf.phase == phase
+        cd0[sel], k[sel] = cd0_ph[sel], k_ph[sel]
+    return vmin, vmax, cd0, k
+
+
+def test_update_on_phase_change(monkeypatch):
+    """ Limits and coefficients that are only updated on a phase change are
+        the same as when they are computed for all aircraft in each update. """
+    traf = types.SimpleNamespace(type=[], tas=np.zeros(0), vs=np.zeros(0), alt=np.zeros(0),
+                                 ax=np.zeros(0), ntraf=0, _children=[])
+    monkeypatch.setattr(bs, 'traf', traf, raising=False)
+    monkeypatch.setattr(TrafficArrays, 'root', traf, raising=False)
+    # Bypass the singleton of the performance model
+    perf = object.__new__(perfoap.OpenAP)
+    perf.__init__()
+    update = getattr(perfoap.OpenAP.update, '__func__', perfoap.OpenAP.update)
+
+    rng = np.random.default_rng(0)
+    actypes = ['A320', 'B744', 'EC35', 'B738', 'C550']
+    for step in range(100):
+        if step % 5 == 0:
+            n = int(rng.integers(1, 4))
+            traf.type += n * [actypes[rng.integers(len(actypes))]]
+            traf.ntraf += n
+            for name in ('tas', 'vs', 'alt', 'ax'):
+                setattr(traf, name, np.append(getattr(traf, name), np.zeros(n)))
+            perf.create(n)
+        if step % 17 == 3 and traf.ntraf > 3:
+            perf.delete([1])
+            del traf.type[1]
+            traf.ntraf -= 1
+            for name in ('tas', 'vs', 'alt', 'ax'):
+                setattr(traf, name, np.delete(getattr(traf, name), 1))
+        traf.tas = np.clip(traf.tas + rng.normal(0.0, 20.0, traf.ntraf), 0.0, 260.0)
+        traf.vs = rng.choice([-10.0, 0.0, 10.0], traf.ntraf)
+        traf.alt = np.clip(traf.alt + rng.normal(0.0, 800.0, traf.ntraf), 0.0, 12000.0)
+        update(perf, dt=1.0)
+
+        # Rotorcraft have no drag coefficients (nan)
+        for value, ref in zip((perf.vmin, perf.vmax, perf.cd0, perf.k), reference(perf)):
+            assert np.array_equal(value, ref, equal_nan=True)
+    assert len(set(perf.phase.tolist())) > 3
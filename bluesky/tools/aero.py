@@ -6,7 +6,7 @@ import numpy as np
 from bluesky import settings
 
 
-settings.set_variable_defaults(casmach_threshold=2.0)
+settings.set_variable_defaults(casmach_threshold=2.0, atmos_table=False)
 # International standard atmpshere only up to 72000 ft / 22 km
 
 #
@@ -33,6 +33,8 @@ Rearth = 6371000.           # m  Average earth radius
 a0  = np.sqrt(gamma*R*T0)   # sea level speed of sound ISA
 casmach_thr = settings.casmach_threshold # Threshold below which speeds should
                             # be considered as Mach numbers in casormach* functions
+atmtable = None             # Tabulated atmosphere used by the vectorized functions
+                            # instead of the ISA equations (see AtmosTable)
 
 
 def casmachthr(threshold:float=None):
@@ -52,6 +54,24 @@ def casmachthr(threshold:float=None):
     return True, f'CASMACHTHR: Set CAS/Mach threshold to {threshold}'
 
 
+def atmostable(flag:bool=None):
+    """ ATMOSTABLE [ON/OFF]
+
+        Use a tabulated ISA atmosphere in the vectorized atmosphere and speed
+        conversion functions, instead of evaluating the ISA equations.
+
+        Arguments:
+        - flag: Use the tabulated atmosphere (True) or the ISA equations (False)
+    """
+    if flag is None:
+        if atmtable is None:
+            return True, 'ATMOSTABLE: The ISA equations are used'
+        return True, 'ATMOSTABLE: A tabulated ISA atmosphere is used'
+
+    globals()['atmtable'] = AtmosTable() if flag else None
+    return True, f'ATMOSTABLE: Tabulated atmosphere {"on" if flag else "off"}'
+
+
 #
 # Functions for aeronautics in this module
 #  - physical quantities always in SI units
@@ -65,6 +85,9 @@ def casmachthr(threshold:float=None):
 #   T = vtemperature(h)    # calculates temperature [K] (saves time rel to atmos)
 #   rho = vdensity(h)      # calls atmos but retruns only pressure [Pa]
 #
+#  With the atmos_table setting (or the ATMOSTABLE command), the vectorized
+#  functions interpolate in a precomputed table (see AtmosTable) instead.
+#
 #  Speed conversion at altitude h[m] in ISA:
 #
 # M   = vtas2mach(tas,h)  # true airspeed (tas) to mach number conversion
@@ -93,8 +116,25 @@ def vatmos(h):
         - rho: Density [kg / m3]
         - T: Temperature [K]
     """
+    if atmtable is not None:
+        return atmtable.atmos(h)
+    return isaatmos(h)
+
+
+def isaatmos(h):
+    """ Calculate atmospheric pressure, density, and temperature for a given
+        altitude with the ISA equations.
+
+        Arguments:
+        - h: Altitude [m]
+
+        Returns:
+        - p: Pressure [Pa]
+        - rho: Density [kg / m3]
+        - T: Temperature [K]
+    """
     # Temp
-    T = vtemp(h)
+    T = np.maximum(288.15 - 0.0065 * h, Tstrat)
 
     # Density
     rhotrop = 1.225 * (T / 288.15)**4.256848030018761
@@ -116,6 +156,8 @@ def vtemp(h):
         Returns:
         - T: Temperature [K]
     """
+    if atmtable is not None:
+        return atmtable.interp(h, 'T')[0]
     T = np.maximum(288.15 - 0.0065 * h, Tstrat)
     return T
 
@@ -130,6 +172,8 @@ def vpressure(h):
         Returns:
         - p: Pressure [Pa]
     """
+    if atmtable is not None:
+        return atmtable.interp(h, 'p')[0]
     p, _, _ = vatmos(h)
     return p
 
@@ -143,6 +187,8 @@ def vdensity(h):
         Returns:
         - rho: Density [kg / m3]
     """
+    if atmtable is not None:
+        return atmtable.interp(h, 'rho')[0]
     _, r, _ = vatmos(h)
     return r
 
@@ -156,6 +202,8 @@ def vvsound(h):
         Returns:
         - a: Speed of sound [m/s]
     """
+    if atmtable is not None:
+        return atmtable.interp(h, 'a')[0]
     T = vtemp(h)
     a = np.sqrt(gamma * R * T)
     return a
@@ -232,9 +280,18 @@ def vcas2tas(cas, h):
         Returns:
         - tas: True airspeed [m/s]
     """
+    if atmtable is not None:
+        p, T = atmtable.interp(h, 'p', 'T')
+        return _cas2tas(cas, p, 7.0 * R * T)
     p, rho, _ = vatmos(h)
+    return _cas2tas(cas, p, 7.0 * p / rho)
+
+
+def _cas2tas(cas, p, RT7):
+    """ Calibrated to true airspeed conversion for pressure p [Pa] and
+        7 R T = 7 p / rho [J / kg]. """
     qdyn = p0 * ((1.0 + rho0 * cas * cas / (7.0 * p0)) ** 3.5 - 1.0)
-    tas = np.sqrt(7.0 * p / rho * ((1.0 + qdyn / p) ** (2.0 / 7.0) - 1.0))
+    tas = np.sqrt(RT7 * ((1.0 + qdyn / p) ** (2.0 / 7.0) - 1.0))
 
     # cope with negative speed
     tas = np.where(cas < 0, -1 * tas, tas)
@@ -251,7 +308,15 @@ def vtas2cas(tas, h):
         Returns:
         cas: Calibrated airspeed [m/s]
     """
+    if atmtable is not None:
+        p, rho = atmtable.interp(h, 'p', 'rho')
+        return _tas2cas(tas, p, rho)
     p, rho, _ = vatmos(h)
+    return _tas2cas(tas, p, rho)
+
+
+def _tas2cas(tas, p, rho):
+    """ True to calibrated airspeed conversion for pressure p [Pa] and density rho [kg / m3]. """
     qdyn = p*((1.+rho*tas*tas/(7.*p))**3.5-1.)
     cas = np.sqrt(7.*p0/rho0*((qdyn/p0+1.)**(2./7.)-1.))
 
@@ -270,6 +335,9 @@ def vmach2cas(mach, h):
         Returns:
         - cas: Calibrated airspeed [m/s]
     """
+    if atmtable is not None:
+        p, rho, a = atmtable.interp(h, 'p', 'rho', 'a')
+        return _tas2cas(mach * a, p, rho)
     tas = vmach2tas(mach, h)
     cas = vtas2cas(tas, h)
     return cas
@@ -285,6 +353,9 @@ def vcas2mach(cas, h):
         Returns:
         - mach: Mach number [-]
     """
+    if atmtable is not None:
+        p, T, a = atmtable.interp(h, 'p', 'T', 'a')
+        return _cas2tas(cas, p, 7.0 * R * T) / a
     tas = vcas2tas(cas, h)
     M   = vtas2mach(tas, h)
     return M
@@ -303,6 +374,13 @@ def vcasormach(spd, h):
         - mach: Mach number [-]
     """
     ismach = np.logical_and(spd > 0.1, spd < casmach_thr)
+    if atmtable is not None:
+        # Interpolate all quantities at once
+        p, rho, T, a = atmtable.interp(h, 'p', 'rho', 'T', 'a')
+        tas = np.where(ismach, spd * a, _cas2tas(spd, p, 7.0 * R * T))
+        cas = np.where(ismach, _tas2cas(tas, p, rho), spd)
+        mach = np.where(ismach, spd, tas / a)
+        return tas, cas, mach
     tas = np.where(ismach, vmach2tas(spd, h), vcas2tas(spd, h))
     cas = np.where(ismach, vtas2cas(tas, h), spd)
     mach   = np.where(ismach, spd, vtas2mach(tas, h))
@@ -321,9 +399,62 @@ def vcasormach2tas(spd, h):
         - tas: True airspeed [m/s]
     """
     ismach = np.logical_and(spd > 0.1, spd < casmach_thr)
+    if atmtable is not None:
+        p, T, a = atmtable.interp(h, 'p', 'T', 'a')
+        return np.where(ismach, spd * a, _cas2tas(spd, p, 7.0 * R * T))
     return np.where(ismach, vmach2tas(spd, h), vcas2tas(spd, h))
 
 
+class AtmosTable:
+    """ ISA atmosphere tabulated as function of altitude, with linear interpolation
+        between the table entries. Replaces the exponentials and power laws of
+        the ISA equations by table lookups, which are shared between all
+        quantities needed in a conversion.
+
+        With the default step of 5 m, the interpolated pressure and density
+        are within 1e-7 (relative) of the ISA equations, and the converted
+        speeds within 1e-4 m/s. Outside the altitude range of the table the
+        ISA equations are used.
+
+        Arguments:
+        - hmin, hmax: Altitude range of the table [m]
+        - dh: Altitude step of the table [m]
+    """
+    columns = ('p', 'rho', 'T', 'a')
+
+    def __init__(self, hmin=-2000.0, hmax=30000.0, dh=5.0):
+        n = int(np.ceil((hmax - hmin) / dh))
+        self.hmin, self.hmax, self.invdh = hmin, hmin + n * dh, 1.0 / dh
+        values = self.isa(hmin + dh * np.arange(n + 1))
+        self.base = {name: v[:-1].copy() for name, v in values.items()}
+        self.slope = {name: np.diff(v) for name, v in values.items()}
+
+    def isa(self, h):
+        """ Quantities of each column from the ISA equations. """
+        p, rho, T = isaatmos(h)
+        return dict(p=p, rho=rho, T=T, a=np.sqrt(gamma * R * T))
+
+    def interp(self, h, *names):
+        """ Interpolate the named quantities (p, rho, T, a) at altitude h [m]. """
+        h = np.asarray(h, dtype=float)
+        if h.size and self.hmin <= h.min() and h.max() < self.hmax:
+            frac = (h - self.hmin) * self.invdh
+            i = np.floor(frac)
+            frac -= i
+            i = i.astype(np.intp)
+            return [self.base[name].take(i) + frac * self.slope[name].take(i) for name in names]
+        values = self.isa(h)
+        return [values[name] for name in names]
+
+    def atmos(self, h):
+        """ Pressure [Pa], density [kg / m3], and temperature [K] at altitude h [m]. """
+        return tuple(self.interp(h, 'p', 'rho', 'T'))
+
+
+if settings.atmos_table:
+    atmtable = AtmosTable()
+
+
 def crossoveralt(cas, mach):
     """ Calculate crossover altitude for given CAS and Mach number.
 
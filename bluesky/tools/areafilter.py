@@ -1,34 +1,17 @@
 """Area filter module"""
-from weakref import WeakValueDictionary
+from weakref import WeakValueDictionary, ref
 import numpy as np
 from matplotlib.path import Path
 try:
     from rtree.index import Index
 except (ImportError, OSError):
-    print('Warning: RTree could not be loaded. areafilter get_intersecting and get_knearest won\'t work')
-    class Index:
-        ''' Dummy index class for installations where rtree is missing
-            or doesn't work.
-        '''
-        @staticmethod
-        def intersection(*args, **kwargs):
-            return []
-
-        @staticmethod
-        def nearest(*args, **kwargs):
-            return []
-
-        @staticmethod
-        def insert(*args, **kwargs):
-            return
-
-        @staticmethod
-        def delete(*args, **kwargs):
-            return
+    # Fall back to the numpy spatial index when rtree is missing or doesn't work
+    from bluesky.tools.spatialindex import Index
 
 
 import bluesky as bs
 from bluesky.tools.geo import kwikdist
+from bluesky.tools.aero import nm
 
 # Dictionary of all basic shapes (The shape classes defined in this file) by name
 basic_shapes = dict()
@@ -71,10 +54,29 @@ def checkInside(areaname, lat, lon, alt):
     """ Check if points with coordinates lat, lon, alt are inside area with name 'areaname'.
         Returns an array of booleans. True ==  Inside"""
     if areaname not in basic_shapes:
-        return np.zeros(len(lat), dtype=np.bool)
+        return np.zeros(len(lat), dtype=bool)
     area = basic_shapes[areaname]
     return area.checkInside(lat, lon, alt)
 
+
+def checkInsideAll(lat, lon, alt, areanames=None, sparse=False):
+    """ Check for multiple areas at once which points with coordinates
+        lat, lon, alt are inside.
+
+        Arguments:
+        - lat, lon, alt: Coordinates of the points
+        - areanames: The names of the areas to check (optional, all areas by default)
+        - sparse: When True, return the (area index, point index) pairs
+          of all points inside an area, instead of a membership matrix
+
+        Returns:
+        - names: The names of the checked areas
+        - inside: A boolean membership matrix with a row per area and a
+          column per point, or (when sparse is True) a tuple of area
+          index and point index arrays.
+    """
+    return engine.check(lat, lon, alt, areanames, sparse)
+
 def deleteArea(areaname):
     """ Delete area with name 'areaname'. """
     if areaname in basic_shapes:
@@ -85,6 +87,26 @@ def reset():
     """ Clear all data. """
     basic_shapes.clear()
     Shape.reset()
+    tracker.reset()
+
+
+def update():
+    """ Update the membership of tracked areas. Called after each
+        traffic update. """
+    tracker.update(bs.traf.id, bs.traf.lat, bs.traf.lon, bs.traf.alt)
+
+
+def subscribe(areaname, callback):
+    """ Track the aircraft inside area 'areaname', and call
+        callback(areaname, entered, exited) when aircraft enter or leave it.
+        entered is an array of aircraft indices, and exited a list of
+        aircraft ids. """
+    tracker.subscribe(areaname, callback)
+
+
+def unsubscribe(areaname, callback):
+    """ Remove a subscription to the entry and exit events of area 'areaname'. """
+    tracker.unsubscribe(areaname, callback)
 
 
 def get_intersecting(lat0, lon0, lat1, lon1):
@@ -95,7 +117,7 @@ def get_intersecting(lat0, lon0, lat1, lon1):
           of the intersection area.
     '''
     items = Shape.areatree.intersection((lat0, lon0, lat1, lon1))
-    return [Shape.areas_by_id[i.id] for i in items]
+    return [Shape.areas_by_id[i] for i in items]
 
 
 def get_knearest(lat0, lon0, lat1, lon1, k=1):
@@ -107,7 +129,495 @@ def get_knearest(lat0, lon0, lat1, lon1, k=1):
         - k: The (maximum) number of results to return.
     '''
     items = Shape.areatree.nearest((lat0, lon0, lat1, lon1), k)
-    return [Shape.areas_by_id[i.id] for i in items]
+    return [Shape.areas_by_id[i] for i in items]
+
+
+def polyedges(coordinates):
+    ''' Return the edges of a (closed) polygon as arrays of start and end
+        points (lat0, lon0, lat1, lon1). '''
+    lat = np.asarray(coordinates[::2], dtype=float)
+    lon = np.asarray(coordinates[1::2], dtype=float)
+    return np.vstack((lat, lon, np.roll(lat, -1), np.roll(lon, -1)))
+
+
+def _pairchunks(first, count, chunksize):
+    ''' Iterate over chunks of point/polygon pairs. Yields the range of pairs
+        in the chunk, and the pair index and edge index of each point/edge
+        combination in the chunk. '''
+    start = 0
+    while start < len(count):
+        # Select a chunk of pairs with at most chunksize edges in total
+        ncum = np.cumsum(count[start:])
+        end = start + max(1, np.searchsorted(ncum, chunksize, side='right'))
+        npairs = count[start:end]
+        pair = np.repeat(np.arange(end - start), npairs)
+        iedge = np.arange(pair.size) - np.repeat(np.cumsum(npairs) - npairs, npairs) + \
+            np.repeat(first[start:end], npairs)
+        yield start, end, pair, iedge
+        start = end
+
+
+def inpolys(lat, lon, edges, first, count, chunksize=1 << 22):
+    ''' Even-odd rule point-in-polygon test of point/polygon pairs.
+
+        Arguments:
+        - lat, lon: Coordinates of the point of each pair
+        - edges: Edge arrays (lat0, lon0, lat1, lon1) of all polygons
+        - first, count: Index of the first edge, and the number of edges
+          of the polygon of each pair
+        - chunksize: Maximum number of point/edge combinations evaluated
+          at once, to limit memory use
+    '''
+    inside = np.zeros(len(lat), dtype=bool)
+    for start, end, pair, iedge in _pairchunks(first, count, chunksize):
+        lat0, lon0, lat1, lon1 = edges[:, iedge]
+        plat = lat[start:end][pair]
+        plon = lon[start:end][pair]
+        # Count the edges crossed by a ray from each point in positive lat direction
+        straddle = (lon0 > plon) != (lon1 > plon)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            latx = lat0 + (plon - lon0) * (lat1 - lat0) / (lon1 - lon0)
+        crossings = np.bincount(pair, weights=straddle & (plat < latx),
+                                minlength=end - start)
+        inside[start:end] = crossings % 2 == 1
+    return inside
+
+
+def segcrossing(lat0, lon0, lat1, lon1, edges, first, count, chunksize=1 << 22):
+    ''' Test for segment/polygon pairs whether the segment crosses an edge
+        of the polygon.
+
+        Arguments:
+        - lat0, lon0, lat1, lon1: Start and end point of the segment of each pair
+        - edges, first, count, chunksize: As for inpolys
+    '''
+    def orient(alat, alon, blat, blon, clat, clon):
+        return (blat - alat) * (clon - alon) - (blon - alon) * (clat - alat)
+
+    crosses = np.zeros(len(lat0), dtype=bool)
+    for start, end, pair, iedge in _pairchunks(first, count, chunksize):
+        elat0, elon0, elat1, elon1 = edges[:, iedge]
+        slat0, slon0 = lat0[start:end][pair], lon0[start:end][pair]
+        slat1, slon1 = lat1[start:end][pair], lon1[start:end][pair]
+        # The segment and the edge cross when the end points of each are on
+        # opposite sides of the other, and their bounding boxes overlap
+        cross = (orient(slat0, slon0, slat1, slon1, elat0, elon0) *
+                 orient(slat0, slon0, slat1, slon1, elat1, elon1) <= 0.0) & \
+            (orient(elat0, elon0, elat1, elon1, slat0, slon0) *
+             orient(elat0, elon0, elat1, elon1, slat1, slon1) <= 0.0) & \
+            (np.minimum(slat0, slat1) <= np.maximum(elat0, elat1)) & \
+            (np.minimum(elat0, elat1) <= np.maximum(slat0, slat1)) & \
+            (np.minimum(slon0, slon1) <= np.maximum(elon0, elon1)) & \
+            (np.minimum(elon0, elon1) <= np.maximum(slon0, slon1))
+        crosses[start:end] = np.bincount(pair, weights=cross, minlength=end - start) > 0
+    return crosses
+
+
+def edgedist(lat, lon, edges, first, count, chunksize=1 << 22):
+    ''' Distance [nm] from points to the nearest edge of their polygon,
+        for point/polygon pairs, using a local flat-earth approximation.
+        Arguments are the same as for inpolys. '''
+    dist = np.zeros(len(lat))
+    for start, end, pair, iedge in _pairchunks(first, count, chunksize):
+        lat0, lon0, lat1, lon1 = edges[:, iedge]
+        plat = lat[start:end][pair]
+        coslat = np.cos(np.radians(plat))
+        plon = lon[start:end][pair]
+        # Edge coordinates relative to the point
+        x0, y0 = (lon0 - plon) * 60.0 * coslat, (lat0 - plat) * 60.0
+        dx, dy = (lon1 - lon0) * 60.0 * coslat, (lat1 - lat0) * 60.0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.clip(np.nan_to_num(-(x0 * dx + y0 * dy) / (dx * dx + dy * dy)), 0.0, 1.0)
+        d = np.hypot(x0 + t * dx, y0 + t * dy)
+        npairs = count[start:end]
+        dist[start:end] = np.minimum.reduceat(d, np.cumsum(npairs) - npairs)
+    return dist
+
+
+class AreaEngine:
+    ''' Evaluates points against many areas at once. The engine keeps
+        arrays with the bounding boxes, altitude bands, and shape data
+        (circle centres and radii, polygon edges) of all defined areas,
+        which are rebuilt when the set of areas changes.
+    '''
+    BOX, CIRCLE, POLY, OTHER = range(4)
+
+    def __init__(self):
+        self.shapes = ()
+        self.names = []
+        self.index = dict()
+        self.kind = np.zeros(0, dtype=int)
+        self.bbox = np.zeros((4, 0))
+        self.vrange = np.zeros((2, 0))
+        self.circles = np.zeros((3, 0))
+        self.edges = np.zeros((4, 0))
+        self.first = np.zeros(0, dtype=int)
+        self.count = np.zeros(0, dtype=int)
+
+    def update(self):
+        ''' Rebuild the shape arrays when areas were added or removed. '''
+        shapes = tuple(basic_shapes.values())
+        if len(shapes) == len(self.shapes) and \
+                all(a is b() for a, b in zip(shapes, self.shapes)):
+            return
+        # Keep weak references, so that deleted shapes are cleaned up
+        self.shapes = tuple(ref(shape) for shape in shapes)
+        self.names = list(basic_shapes.keys())
+        self.index = {name: i for i, name in enumerate(self.names)}
+        n = len(shapes)
+        self.kind = np.full(n, self.OTHER, dtype=int)
+        self.bbox = np.vstack((np.full(n, -np.inf), np.full(n, -np.inf),
+                               np.full(n, np.inf), np.full(n, np.inf)))
+        self.vrange = np.array([[s.bottom for s in shapes], [s.top for s in shapes]],
+                               dtype=float).reshape(2, n)
+        self.circles = np.zeros((3, n))
+        self.first = np.zeros(n, dtype=int)
+        self.count = np.zeros(n, dtype=int)
+        edges = []
+        nedges = 0
+        for i, shape in enumerate(shapes):
+            method = type(shape).checkInside
+            if method is Box.checkInside:
+                self.kind[i] = self.BOX
+                self.bbox[:, i] = shape.lat0, shape.lon0, shape.lat1, shape.lon1
+            elif method is Circle.checkInside:
+                self.kind[i] = self.CIRCLE
+                self.circles[:, i] = shape.clat, shape.clon, shape.r
+                # Bounding box with a margin for the approximate distance
+                dlat = 1.01 * shape.r * nm / 111195.0
+                dlon = dlat / max(0.01, np.cos(np.radians(min(89.0, abs(shape.clat) + dlat))))
+                self.bbox[:, i] = shape.clat - dlat, shape.clon - dlon, \
+                    shape.clat + dlat, shape.clon + dlon
+            elif method is Poly.checkInside:
+                self.kind[i] = self.POLY
+                self.bbox[:, i] = shape.bbox
+                edges.append(shape.edges)
+                self.first[i] = nedges
+                self.count[i] = shape.edges.shape[1]
+                nedges += self.count[i]
+            elif isinstance(shape, Line):
+                # Points are never inside a line: make the bounding box empty
+                self.bbox[:, i] = np.inf, np.inf, -np.inf, -np.inf
+        self.edges = np.hstack(edges) if edges else np.zeros((4, 0))
+
+    def check(self, lat, lon, alt, areanames=None, sparse=False):
+        ''' Evaluate points against areas. See checkInsideAll. '''
+        self.update()
+        lat = np.atleast_1d(np.asarray(lat, dtype=float))
+        lon = np.atleast_1d(np.asarray(lon, dtype=float))
+        alt = np.atleast_1d(np.asarray(alt, dtype=float))
+        if areanames is None:
+            names = self.names
+            sel = np.arange(len(names))
+        else:
+            names = list(areanames)
+            sel = np.array([self.index.get(name, -1) for name in names], dtype=int)
+            # Unknown areas are kept as rows without members
+            rows = np.flatnonzero(sel >= 0)
+            sel = sel[rows]
+        lat0, lon0, lat1, lon1 = self.bbox[:, sel, np.newaxis]
+        bottom, top = self.vrange[:, sel, np.newaxis]
+
+        # Prefilter on bounding box and altitude band
+        iarea, ipoint = np.nonzero((lat0 <= lat) & (lat <= lat1) &
+                                   (lon0 <= lon) & (lon <= lon1) &
+                                   (bottom <= alt) & (alt <= top))
+        hit = self.checkpairs(sel[iarea], lat[ipoint], lon[ipoint], alt[ipoint])
+
+        iarea, ipoint = iarea[hit], ipoint[hit]
+        if areanames is not None:
+            iarea = rows[iarea]
+        if sparse:
+            return names, (iarea, ipoint)
+        inside = np.zeros((len(names), len(lat)), dtype=bool)
+        inside[iarea, ipoint] = True
+        return names, inside
+
+    def checkpairs(self, ishape, lat, lon, alt, margins=False):
+        ''' Evaluate area/point pairs.
+
+            Arguments:
+            - ishape: The engine index of the area of each pair
+            - lat, lon, alt: The point coordinates of each pair
+            - margins: When True, also return for each pair a lower bound
+              of the horizontal distance [nm] and the vertical distance
+              to the area boundary, within which the point can move
+              without changing from inside to outside or vice versa.
+        '''
+        lat0, lon0, lat1, lon1 = self.bbox[:, ishape]
+        bottom, top = self.vrange[:, ishape]
+        inbbox = (lat0 <= lat) & (lat <= lat1) & (lon0 <= lon) & (lon <= lon1)
+        cand = inbbox & (bottom <= alt) & (alt <= top)
+        kind = self.kind[ishape]
+        hit = cand & (kind == self.BOX)
+
+        # Circles: distance to the circle centre
+        circle = kind == self.CIRCLE
+        if np.any(circle):
+            clat, clon, r = self.circles[:, ishape[circle]]
+            cdist = kwikdist(clat, clon, lat[circle], lon[circle])
+            hit[circle] = cand[circle] & (cdist <= r)
+
+        # Polygons: crossing number test on the candidate pairs
+        mask = cand & (kind == self.POLY)
+        if np.any(mask):
+            hit[mask] = inpolys(lat[mask], lon[mask], self.edges,
+                                self.first[ishape[mask]], self.count[ishape[mask]])
+
+        # Other shapes: evaluate with their own implementation
+        other = kind == self.OTHER
+        if np.any(other):
+            for i in np.unique(ishape[other]):
+                pair = np.flatnonzero(ishape == i)
+                hit[pair] = np.asarray(self.shapes[i]().checkInside(
+                    lat[pair], lon[pair], alt[pair]), dtype=bool)
+        if not margins:
+            return hit
+
+        vmargin = np.minimum(np.abs(alt - bottom), np.abs(alt - top))
+        # Outside the bounding box, the distance to the bounding box is a
+        # lower bound of the distance to the area
+        coslat = np.cos(np.radians(lat))
+        dlat = np.maximum(np.maximum(lat0 - lat, lat - lat1), 0.0) * 60.0
+        dlon = np.maximum(np.maximum(lon0 - lon, lon - lon1), 0.0) * 60.0 * coslat
+        hmargin = np.hypot(dlat, dlon)
+        mask = inbbox & (kind == self.BOX)
+        hmargin[mask] = np.minimum(
+            np.minimum(lat[mask] - lat0[mask], lat1[mask] - lat[mask]) * 60.0,
+            np.minimum(lon[mask] - lon0[mask], lon1[mask] - lon[mask]) * 60.0 * coslat[mask])
+        if np.any(circle):
+            hmargin[circle] = np.abs(cdist - r)
+        mask = inbbox & (kind == self.POLY)
+        if np.any(mask):
+            hmargin[mask] = edgedist(lat[mask], lon[mask], self.edges,
+                                     self.first[ishape[mask]], self.count[ishape[mask]])
+        hmargin[other] = 0.0
+        # Safety factor for the flat-earth distance approximations
+        return hit, 0.9 * hmargin, vmargin
+
+
+class AreaTracker:
+    ''' Tracks which aircraft are inside a set of areas across simulation
+        steps, and notifies subscribers of aircraft entering and leaving
+        these areas.
+
+        Instead of testing all aircraft against all tracked areas in each
+        step, the tracker keeps for each area/aircraft pair a margin: the
+        distance the aircraft can move before it can possibly cross the area
+        boundary. The tracker accumulates the horizontal and vertical
+        distance travelled by each aircraft, and only retests the pairs of
+        which the travelled distance exceeds the limit set by the margin.
+    '''
+    def __init__(self):
+        self.names = []
+        self.subscribers = []
+        self.shapes = []
+        self.reset()
+
+    def subscribe(self, areaname, callback):
+        ''' Start tracking area areaname, and call
+            callback(areaname, entered, exited) when aircraft enter or
+            leave it. entered is an array of aircraft indices, exited is
+            a list of aircraft ids (exited aircraft may have been deleted).
+            The new subscriber is notified of the aircraft that are
+            currently inside. '''
+        if areaname not in self.names:
+            self._addarea(areaname)
+        inside = np.flatnonzero(self.inside(areaname))
+        if len(inside):
+            callback(areaname, inside, [])
+        self.subscribers[self.names.index(areaname)].append(callback)
+
+    def _addarea(self, areaname):
+        ''' Start tracking area areaname. The membership of the tracked
+            aircraft, at their positions of the last update, is determined
+            here, so that no other areas need to be updated. '''
+        ntraf = len(self.ids)
+        member = np.zeros(ntraf, dtype=bool)
+        hlimit = np.full(ntraf, -np.inf)
+        vlimit = np.full(ntraf, -np.inf)
+        shape = basic_shapes.get(areaname)
+        if ntraf and shape is not None:
+            engine.update()
+            ishape = np.full(ntraf, engine.index[areaname])
+            member, hmargin, vmargin = engine.checkpairs(
+                ishape, self.pos[0], self.pos[1], self.pos[2], margins=True)
+            hlimit = self.htravel + hmargin
+            vlimit = self.vtravel + vmargin
+        self.names.append(areaname)
+        self.subscribers.append([])
+        self.shapes.append(None if shape is None else ref(shape))
+        self.member = np.hstack((self.member, member.reshape(-1, 1)))
+        self.hlimit = np.hstack((self.hlimit, hlimit.reshape(-1, 1)))
+        self.vlimit = np.hstack((self.vlimit, vlimit.reshape(-1, 1)))
+        self.hmin = np.minimum(self.hmin, hlimit)
+        self.vmin = np.minimum(self.vmin, vlimit)
+
+    def unsubscribe(self, areaname, callback):
+        ''' Remove a subscription. Areas without subscribers are no longer tracked. '''
+        if areaname not in self.names:
+            return
+        i = self.names.index(areaname)
+        if callback in self.subscribers[i]:
+            self.subscribers[i].remove(callback)
+        if not self.subscribers[i]:
+            for lst in (self.names, self.subscribers, self.shapes):
+                del lst[i]
+            self.member = np.delete(self.member, i, axis=1)
+            self.hlimit = np.delete(self.hlimit, i, axis=1)
+            self.vlimit = np.delete(self.vlimit, i, axis=1)
+
+    def inside(self, areaname):
+        ''' Return the membership of area areaname for all aircraft, as of
+            the last update. '''
+        if areaname not in self.names:
+            return np.zeros(len(self.ids), dtype=bool)
+        return self.member[:, self.names.index(areaname)]
+
+    def count(self, areaname):
+        ''' Return the number of aircraft inside area areaname. '''
+        return np.count_nonzero(self.inside(areaname))
+
+    def reset(self):
+        ''' Clear the tracked traffic. Subscriptions are kept. '''
+        nareas = len(self.names)
+        self.shapes = nareas * [None]
+        self.ids = []
+        self.pos = np.zeros((3, 0))
+        # Accumulated horizontal [nm] and vertical distance of each aircraft
+        self.htravel = np.zeros(0)
+        self.vtravel = np.zeros(0)
+        # Area membership (a row per aircraft, and a column per area), the
+        # travelled distance up to which the membership of each pair holds,
+        # and the minimum of these limits for each aircraft
+        self.member = np.zeros((0, nareas), dtype=bool)
+        self.hlimit = np.zeros((0, nareas))
+        self.vlimit = np.zeros((0, nareas))
+        self.hmin = np.zeros(0)
+        self.vmin = np.zeros(0)
+
+    def margins(self, areaname):
+        ''' Return the remaining horizontal [nm] and vertical margins of
+            all aircraft to the boundary of area areaname. '''
+        i = self.names.index(areaname)
+        return self.hlimit[:, i] - self.htravel, self.vlimit[:, i] - self.vtravel
+
+    def update(self, ids, lat, lon, alt):
+        ''' Update the area membership of all aircraft, and notify the
+            subscribers of the tracked areas of entering and leaving aircraft. '''
+        if not self.names:
+            return
+        engine.update()
+        exited = [[] for _ in self.names]
+        pos = np.array([lat, lon, alt], dtype=float).reshape(3, -1)
+
+        # Align the tracked state with the current traffic
+        if ids != self.ids:
+            prev = {acid: i for i, acid in enumerate(self.ids)}
+            iprev = np.fromiter((prev.get(acid, -1) for acid in ids), int, len(ids))
+            keep = np.flatnonzero(iprev >= 0)
+            deleted = np.ones(len(self.ids), dtype=bool)
+            deleted[iprev[keep]] = False
+            # Deleted aircraft that were inside an area have left it
+            delids = np.array(self.ids, dtype=object)[deleted]
+            for idx, i in zip(*np.nonzero(self.member[deleted])):
+                exited[i].append(delids[idx])
+            # New aircraft get a negative limit, so that they are tested
+            shape = (len(ids), len(self.names))
+            member = np.zeros(shape, dtype=bool)
+            hlimit = np.full(shape, -np.inf)
+            vlimit = np.full(shape, -np.inf)
+            member[keep] = self.member[iprev[keep]]
+            hlimit[keep] = self.hlimit[iprev[keep]]
+            vlimit[keep] = self.vlimit[iprev[keep]]
+            self.member, self.hlimit, self.vlimit = member, hlimit, vlimit
+            for name in ('htravel', 'vtravel', 'hmin', 'vmin'):
+                arr = np.zeros(len(ids)) if name.endswith('travel') else np.full(len(ids), -np.inf)
+                arr[keep] = getattr(self, name)[iprev[keep]]
+                setattr(self, name, arr)
+            prevpos = np.array(pos)
+            prevpos[:, keep] = self.pos[:, iprev[keep]]
+            self.ids = list(ids)
+        else:
+            prevpos = self.pos
+
+        # Accumulate the distance travelled since the last update
+        if len(self.ids):
+            self.htravel += kwikdist(prevpos[0], prevpos[1], pos[0], pos[1])
+            self.vtravel += np.abs(pos[2] - prevpos[2])
+        self.pos = pos
+
+        # Areas that were (re)defined or deleted are retested completely
+        ishape = np.zeros(len(self.names), dtype=int)
+        for i, name in enumerate(self.names):
+            shape = basic_shapes.get(name)
+            if shape is None or self.shapes[i] is None or self.shapes[i]() is not shape:
+                self.shapes[i] = None if shape is None else ref(shape)
+                self.hlimit[:, i] = -np.inf
+                self.hmin[:] = -np.inf
+            ishape[i] = engine.index.get(name, -1)
+
+        # Only aircraft that used up their smallest margin need to be checked
+        cols = np.flatnonzero((self.htravel >= self.hmin) | (self.vtravel >= self.vmin))
+        hlimit, vlimit = self.hlimit[cols], self.vlimit[cols]
+        icol, iarea = np.nonzero((hlimit <= self.htravel[cols, np.newaxis]) |
+                                 (vlimit <= self.vtravel[cols, np.newaxis]))
+        iac = cols[icol]
+        if len(iarea):
+            known = ishape[iarea] >= 0
+            hit = np.zeros(len(iarea), dtype=bool)
+            hmargin = np.full(len(iarea), np.inf)
+            vmargin = np.full(len(iarea), np.inf)
+            hit[known], hmargin[known], vmargin[known] = engine.checkpairs(
+                ishape[iarea[known]], pos[0, iac[known]], pos[1, iac[known]],
+                pos[2, iac[known]], margins=True)
+            changed = hit != self.member[iac, iarea]
+            self.member[iac, iarea] = hit
+            hlimit[icol, iarea] = self.htravel[iac] + hmargin
+            vlimit[icol, iarea] = self.vtravel[iac] + vmargin
+            self.hlimit[cols], self.vlimit[cols] = hlimit, vlimit
+            self.hmin[cols] = hlimit.min(axis=1)
+            self.vmin[cols] = vlimit.min(axis=1)
+            iarea, iac, hit = iarea[changed], iac[changed], hit[changed]
+        else:
+            hit = np.zeros(0, dtype=bool)
+
+        # Notify the subscribers of the areas with entering or leaving aircraft
+        order = np.argsort(iarea, kind='stable')
+        iarea, iac, hit = iarea[order], iac[order], hit[order]
+        bounds = np.searchsorted(iarea, np.arange(len(self.names) + 1))
+        for i in set(iarea).union(i for i, lst in enumerate(exited) if lst):
+            sel = slice(bounds[i], bounds[i + 1])
+            entered = iac[sel][hit[sel]]
+            exited[i].extend(self.ids[j] for j in iac[sel][~hit[sel]])
+            for callback in list(self.subscribers[i]):
+                callback(self.names[i], entered, exited[i])
+
+
+class AreaChanges:
+    ''' Area event subscriber that collects the aircraft that entered and
+        left areas, for consumers that process area changes periodically.
+        Aircraft that enter and leave again before the changes are
+        collected are not reported. '''
+    def __init__(self):
+        self.changes = dict()
+
+    def __call__(self, areaname, entered, exited):
+        arrived, left = self.changes.setdefault(areaname, (set(), set()))
+        for acid in (tracker.ids[i] for i in entered):
+            if acid in left:
+                left.remove(acid)
+            else:
+                arrived.add(acid)
+        for acid in exited:
+            if acid in arrived:
+                arrived.remove(acid)
+            else:
+                left.add(acid)
+
+    def pop(self, areaname):
+        ''' Return and clear the sets of arrived and left aircraft ids of area areaname. '''
+        return self.changes.pop(areaname, (set(), set()))
 
 
 class Shape:
@@ -121,7 +631,7 @@ class Shape:
     areas_by_id = WeakValueDictionary()
     areas_by_name = WeakValueDictionary()
 
-    # RTree of all areas for efficient geospatial searching
+    # RTree (or numpy spatial index) of all areas for efficient geospatial searching
     areatree = Index()
 
     @classmethod
@@ -233,8 +743,23 @@ class Poly(Shape):
     def __init__(self, name, coordinates, top=1e9, bottom=-1e9):
         super().__init__(name, coordinates, top, bottom)
         self.border = Path(np.reshape(coordinates, (len(coordinates) // 2, 2)))
+        self.edges = polyedges(coordinates)
 
     def checkInside(self, lat, lon, alt):
-        points = np.vstack((lat,lon)).T
-        inside = np.all((self.border.contains_points(points), self.bottom <= alt, alt <= self.top), axis=0)
+        lat = np.atleast_1d(np.asarray(lat, dtype=float))
+        lon = np.atleast_1d(np.asarray(lon, dtype=float))
+        inside = (self.bottom <= alt) & (alt <= self.top) & \
+            (self.bbox[0] <= lat) & (lat <= self.bbox[2]) & \
+            (self.bbox[1] <= lon) & (lon <= self.bbox[3])
+        idx = np.flatnonzero(inside)
+        nedges = self.edges.shape[1]
+        inside[idx] = inpolys(lat[idx], lon[idx], self.edges,
+                              np.zeros(len(idx), dtype=int), np.full(len(idx), nedges))
         return inside
+
+
+# Area engine to evaluate points against all areas at once
+engine = AreaEngine()
+
+# Tracker of aircraft entering and leaving areas
+tracker = AreaTracker()
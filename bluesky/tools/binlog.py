@@ -0,0 +1,218 @@
+''' Columnar binary log file format.
+
+    Binary logs store each logged variable as a typed column, instead of
+    formatting all values as text. Rows are written in blocks, and each
+    block stores its columns contiguously, so that a reader can map the
+    columns directly into numpy arrays. Text values are interned: each
+    unique string is stored once, and columns with text store string ids.
+
+    File layout:
+    - 8-byte magic, followed by a length-prefixed json header with the
+      logger name, header text, and column names and types
+    - Blocks, each with a block header (nrows, number of new strings, size),
+      followed by the newly interned strings, and the column data (each
+      column padded to a multiple of 8 bytes)
+
+    A binary log can be converted to the text format of the CSV logger with:
+        python -m bluesky.tools.binlog logfile [csvfile]
+'''
+import json
+import struct
+import sys
+import numpy as np
+
+
+MAGIC = b'BSBINLG1'
+BLOCKHDR = struct.Struct('<4sQIQ')
+LENGTH = struct.Struct('<I')
+STRLEN = struct.Struct('<H')
+
+# dtype used to store the ids of interned strings
+STRID = np.dtype('<u4')
+
+
+def _pad(nbytes):
+    return -nbytes % 8
+
+
+def coltype(value):
+    ''' Determine the storage dtype of a logged value. Returns None for text. '''
+    arr = np.asarray(value)
+    if arr.dtype.kind in 'USO':
+        return None
+    if arr.dtype.kind == 'b':
+        return np.dtype('u1')
+    if arr.dtype.kind in 'iu':
+        return np.dtype('<i8')
+    return np.dtype('<f8')
+
+
+class BinWriter:
+    ''' Writer of binary log files. '''
+    def __init__(self, fname, name='', header=None, block_rows=1 << 16):
+        self.fname = fname
+        self.file = open(fname, 'wb')
+        self.name = name
+        self.header = header or []
+        self.block_rows = block_rows
+        self.colnames = []
+        self.dtypes = []
+        self.buffer = []
+        self.nrows = 0
+        self.strings = dict()
+        self.newstrings = []
+
+    def write(self, columns, names):
+        ''' Append rows to the log. Columns is a list of equal-length
+            arrays, with corresponding column names. '''
+        if not self.colnames:
+            # Column types are fixed by the first write
+            self.colnames = list(names)
+            self.dtypes = [coltype(col) for col in columns]
+            hdr = json.dumps(dict(name=self.name, header=self.header,
+                                  columns=[(n, 'str' if t is None else t.str)
+                                           for n, t in zip(self.colnames, self.dtypes)]))
+            hdr = hdr.encode('utf8')
+            self.file.write(MAGIC + LENGTH.pack(len(hdr)) + hdr + bytes(_pad(len(hdr) + 4)))
+        self.buffer.append([self.intern(col) if dtype is None else
+                            np.asarray(col, dtype=dtype)
+                            for col, dtype in zip(columns, self.dtypes)])
+        self.nrows += len(self.buffer[-1][0])
+        if self.nrows >= self.block_rows:
+            self.flush()
+
+    def intern(self, col):
+        ''' Convert a text column to an array of string ids. '''
+        ids = np.empty(len(col), dtype=STRID)
+        for i, txt in enumerate(col):
+            txt = str(txt)
+            sid = self.strings.get(txt)
+            if sid is None:
+                sid = self.strings[txt] = len(self.strings)
+                self.newstrings.append(txt)
+            ids[i] = sid
+        return ids
+
+    def flush(self):
+        ''' Write the buffered rows to file as a block. '''
+        if not self.nrows:
+            return
+        strdata = b''.join(STRLEN.pack(len(s)) + s for s in
+                           (txt.encode('utf8') for txt in self.newstrings))
+        strdata += bytes(_pad(len(strdata)))
+        coldata = []
+        for icol in range(len(self.colnames)):
+            data = np.concatenate([rows[icol] for rows in self.buffer]).tobytes()
+            coldata.append(data + bytes(_pad(len(data))))
+        size = len(strdata) + sum(len(data) for data in coldata)
+        self.file.write(BLOCKHDR.pack(b'BLCK', self.nrows, len(self.newstrings), size))
+        self.file.write(strdata)
+        for data in coldata:
+            self.file.write(data)
+        self.file.flush()
+        self.buffer = []
+        self.nrows = 0
+        self.newstrings = []
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+class BinLogReader:
+    ''' Reader of binary log files. The file is memory-mapped, and column
+        data is read without copying when the log consists of a single block. '''
+    def __init__(self, fname):
+        self.fname = fname
+        self.data = np.memmap(fname, dtype=np.uint8, mode='r')
+        if bytes(self.data[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f'{fname} is not a BlueSky binary log')
+        pos = len(MAGIC)
+        hdrlen, = LENGTH.unpack_from(self.data, pos)
+        pos += LENGTH.size
+        info = json.loads(bytes(self.data[pos:pos + hdrlen]).decode('utf8'))
+        pos += hdrlen + _pad(hdrlen + 4)
+        self.name = info['name']
+        self.header = info['header']
+        self.colnames = [col[0] for col in info['columns']]
+        self.dtypes = [None if col[1] == 'str' else np.dtype(col[1]) for col in info['columns']]
+        self.strings = []
+
+        # Build a list of the column offsets of each block
+        self.blocks = []
+        while pos + BLOCKHDR.size <= len(self.data):
+            tag, nrows, nstrings, size = BLOCKHDR.unpack_from(self.data, pos)
+            pos += BLOCKHDR.size
+            # Skip a block that was only partially written
+            if tag != b'BLCK' or pos + size > len(self.data):
+                break
+            start = pos
+            for _ in range(nstrings):
+                slen, = STRLEN.unpack_from(self.data, pos)
+                pos += STRLEN.size
+                self.strings.append(bytes(self.data[pos:pos + slen]).decode('utf8'))
+                pos += slen
+            pos += _pad(pos - start)
+            offsets = []
+            for dtype in self.dtypes:
+                offsets.append(pos)
+                pos += nrows * (dtype or STRID).itemsize
+                pos += _pad(pos - start)
+            self.blocks.append((nrows, offsets))
+        self.nrows = sum(block[0] for block in self.blocks)
+
+    def column(self, name, decode=True):
+        ''' Return a column as numpy array. Text columns are returned as
+            arrays of strings, or as string ids when decode is False. '''
+        icol = self.colnames.index(name)
+        dtype = self.dtypes[icol] or STRID
+        parts = [np.frombuffer(self.data, dtype=dtype, count=nrows, offset=offsets[icol])
+                 for nrows, offsets in self.blocks]
+        col = parts[0] if len(parts) == 1 else np.concatenate(parts) if parts \
+            else np.empty(0, dtype=dtype)
+        if self.dtypes[icol] is None and decode:
+            return np.array(self.strings, dtype=object)[col] if len(col) else \
+                np.empty(0, dtype=object)
+        if dtype == np.dtype('u1'):
+            return col.view(bool)
+        return col
+
+    def to_dict(self):
+        ''' Return all columns as a dict of numpy arrays. '''
+        return {name: self.column(name) for name in self.colnames}
+
+    def to_pandas(self):
+        ''' Return the log as a pandas DataFrame. '''
+        import pandas as pd
+        return pd.DataFrame(self.to_dict())
+
+    def to_csv(self, fname, precision='%.8f'):
+        ''' Convert the log to the text format of the CSV logger. '''
+        with open(fname, 'w') as fout:
+            for line in self.header:
+                fout.write(f'# {line}\n')
+            fout.write('# ' + ', '.join(self.colnames) + '\n')
+            fmt = ','.join('%s' if dtype is None else '%d' if dtype.kind in 'iu'
+                           else precision for dtype in self.dtypes)
+            # Write block-wise to limit memory use for large logs
+            for nrows, offsets in self.blocks:
+                cols = []
+                for icol, dtype in enumerate(self.dtypes):
+                    col = np.frombuffer(self.data, dtype=dtype or STRID,
+                                        count=nrows, offset=offsets[icol])
+                    cols.append(np.array(self.strings, dtype=object)[col]
+                                if dtype is None else col)
+                for row in zip(*cols):
+                    fout.write(fmt % row + '\n')
+
+
+def main():
+    ''' Convert a binary log to a text log. '''
+    fname = sys.argv[1]
+    csvname = sys.argv[2] if len(sys.argv) > 2 else fname.rsplit('.', 1)[0] + '.log'
+    BinLogReader(fname).to_csv(csvname)
+    print(f'Converted {fname} to {csvname}')
+
+
+if __name__ == '__main__':
+    main()
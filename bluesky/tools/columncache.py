@@ -0,0 +1,192 @@
+''' Columnar cache files that can be memory-mapped.
+
+    Where cachefile pickles python objects, a column cache stores tables
+    (dicts of columns) as separate .npy files in a cache directory, with a
+    json manifest that holds the cache version and the type of each column:
+    - 'array': numpy array of numbers, memory-mapped read-only on load, so
+      that processes on the same host share the loaded data
+    - 'list': list of numbers, stored as array and converted back to a list
+    - 'strings': list of text, stored as a single utf-8 string table with
+      the offsets of each string, and loaded as a StringColumn, which
+      only decodes the strings that are accessed
+
+    A cache is written to a temporary directory first, and then moved into
+    place, so that processes that build the same cache concurrently don't
+    read each other's partially written files.
+'''
+from collections.abc import Sequence
+import json
+import os
+from pathlib import Path
+import shutil
+import tempfile
+import numpy as np
+
+from bluesky import settings
+from bluesky.tools.cachefile import CacheError
+
+## Default settings
+settings.set_variable_defaults(cache_path='data/cache')
+
+# Format version of the cache layout itself
+FORMAT = 1
+
+# Separator of the strings in a string table
+SEP = '\0'
+
+
+def cachedir(name):
+    return Path(settings.cache_path) / name
+
+
+class StringColumn(Sequence):
+    ''' List of strings stored in a (memory-mapped) string table.
+
+        Strings are decoded when they are accessed. Searching the column
+        decodes the whole table once, and keeps the decoded strings for
+        later searches. Strings appended to the column are kept in a
+        separate python list.
+
+        Arguments:
+        - data: utf-8 encoded strings, each followed by a separator
+        - offsets: Offset in data of each string, followed by len(data)
+    '''
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+        self.extra = []
+        # Decoded strings of the whole column, decoded on first search
+        self._strings = None
+
+    def __len__(self):
+        return len(self.offsets) - 1 + len(self.extra)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        n = len(self.offsets) - 1
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('StringColumn index out of range')
+        if i >= n:
+            return self.extra[i - n]
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1] - 1]).decode('utf8')
+
+    def __iter__(self):
+        return iter(self.strings())
+
+    def __contains__(self, value):
+        return value in self.strings()
+
+    def __eq__(self, other):
+        return isinstance(other, (list, StringColumn)) and self.tolist() == list(other)
+
+    def __repr__(self):
+        return f'StringColumn({self.tolist()!r})'
+
+    def strings(self):
+        ''' Return the (cached) list of decoded strings. Don't modify it. '''
+        if self._strings is None:
+            self._strings = bytes(self.data[:-1]).decode('utf8').split(SEP) \
+                if len(self.offsets) > 1 else []
+            self._strings.extend(self.extra)
+        return self._strings
+
+    def tolist(self):
+        ''' Return all strings as a new list. '''
+        return list(self.strings())
+
+    def index(self, value, *args):
+        return self.strings().index(value, *args)
+
+    def count(self, value):
+        return self.strings().count(value)
+
+    def append(self, value):
+        self.extra.append(value)
+        # Keep the decoded strings in sync, instead of decoding them again
+        if self._strings is not None:
+            self._strings.append(value)
+
+    def copy(self):
+        ''' Return a copy that shares the string table, but has its own appended strings. '''
+        column = StringColumn(self.data, self.offsets)
+        column.extra = list(self.extra)
+        return column
+
+
+def load(name, version, tables=None):
+    ''' Load tables of column cache name. Raises a CacheError when the
+        cache does not exist, or has a different version.
+
+        Arguments:
+        - name: Name of the cache
+        - version: Expected version of the cache
+        - tables: Names of the tables to load (all tables when None)
+    '''
+    path = cachedir(name)
+    try:
+        with open(path / 'manifest.json') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        raise CacheError(f'Cachefile not found: {path}')
+    if manifest.get('version') != version or manifest.get('format') != FORMAT:
+        raise CacheError(f'Cache file out of date: {path}')
+    if tables is not None and not set(tables) <= manifest['tables'].keys():
+        raise CacheError(f'Cache file incomplete: {path}')
+    print('Reading cache:', path)
+
+    loaded = dict()
+    for tname, columns in manifest['tables'].items():
+        if tables is not None and tname not in tables:
+            continue
+        table = loaded[tname] = dict()
+        for cname, kind in columns.items():
+            data = np.load(path / f'{tname}.{cname}.npy', mmap_mode='r')
+            if kind == 'array':
+                table[cname] = data
+            elif kind == 'list':
+                table[cname] = data.tolist()
+            else:
+                offsets = np.load(path / f'{tname}.{cname}.offsets.npy', mmap_mode='r')
+                table[cname] = StringColumn(data, offsets)
+    return loaded
+
+
+def save(name, version, tables):
+    ''' Save tables (a dict of tables, each a dict of columns) to column cache name. '''
+    path = cachedir(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmppath = Path(tempfile.mkdtemp(prefix=f'{name}.', dir=path.parent))
+    print('Writing cache:', path)
+    manifest = dict(format=FORMAT, version=version, tables=dict())
+    for tname, table in tables.items():
+        columns = manifest['tables'][tname] = dict()
+        for cname, col in table.items():
+            if isinstance(col, np.ndarray):
+                kind, data = 'array', col
+            elif all(isinstance(v, str) for v in col):
+                kind, data = 'strings', np.frombuffer(''.join(s + SEP for s in col).encode('utf8'),
+                                                      dtype=np.uint8)
+                lengths = [len(s.encode('utf8')) + 1 for s in col]
+                np.save(tmppath / f'{tname}.{cname}.offsets.npy',
+                        np.concatenate(([0], np.cumsum(lengths, dtype=np.int64))))
+            else:
+                kind, data = 'list', np.array(col)
+            if data.dtype.kind not in 'biuf':
+                raise TypeError(f'Column {tname}.{cname} cannot be stored in a column cache')
+            np.save(tmppath / f'{tname}.{cname}.npy', data)
+            columns[cname] = kind
+    # The manifest is written last: a cache without manifest is invalid
+    with open(tmppath / 'manifest.json', 'w') as f:
+        json.dump(manifest, f)
+
+    # Replace the existing cache, if any
+    if path.exists():
+        shutil.rmtree(path, ignore_errors=True)
+    try:
+        os.rename(tmppath, path)
+    except OSError:
+        # Another process has written the cache in the meantime
+        shutil.rmtree(tmppath, ignore_errors=True)
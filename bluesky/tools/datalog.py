@@ -2,17 +2,27 @@
 
 # ToDo: Add description in comments
 
+import os
+import glob
+import gzip
+import lzma
 import numbers
 import itertools
 from datetime import datetime
+from queue import Queue, Full
+from threading import Thread
 import numpy as np
 from bluesky import settings, stack
 from bluesky.core import varexplorer as ve
 import bluesky as bs
-from bluesky.stack import command
+from bluesky.stack import command, commandgroup
+from bluesky.tools.binlog import BinWriter
 
 # Register settings defaults
-settings.set_variable_defaults(log_path='output')
+settings.set_variable_defaults(log_path='output', log_async=True,
+                               log_queue_size=1000, log_queue_policy='block',
+                               log_compression='', log_rotate_size=0.0,
+                               log_rotate_interval=0.0)
 
 logprecision = '%.8f'
 
@@ -22,8 +32,17 @@ periodicloggers = dict()
 # Dict to contain all loggers (also the periodic loggers)
 allloggers = dict()
 
+# File name extensions of the supported log file compression types
+compressext = {'': '', 'gzip': '.gz', 'lzma': '.xz'}
 
-@command(name='CRELOG')
+# Names of the log files that were opened since the last reset
+openedfiles = []
+
+# The background log writer, started when the first log entry is submitted
+writer = None
+
+
+@commandgroup(name='CRELOG')
 def crelogstack(name: 'txt', dt: float = None, header: 'string' = ''):
     """ Create a new data logger.
 
@@ -40,9 +59,38 @@ def crelogstack(name: 'txt', dt: float = None, header: 'string' = ''):
     return True, f'Created {"periodic" if dt else ""} logger {name}'
 
 
-def crelog(name, dt=None, header=''):
-    """ Create a new logger. """
-    allloggers[name] = allloggers.get(name, CSVLogger(name, dt or 0.0, header))
+@crelogstack.subcommand(name='BIN')
+def crebinlogstack(name: 'txt', dt: float = None, header: 'string' = ''):
+    """ Create a new data logger that writes columnar binary log files.
+
+        Arguments:
+        - name: The name of the logger
+        - dt: The logging time interval. When a value is given for dt
+              this becomes a periodic logger.
+        - header: A header text to put at the top of each log file
+    """
+    if name in allloggers:
+        return False, f'Logger {name} already exists'
+
+    crelog(name, dt, header, logtype='bin')
+    return True, f'Created {"periodic" if dt else ""} binary logger {name}'
+
+
+# Available logger types
+logtypes = dict()
+
+
+def crelog(name, dt=None, header='', logtype='csv'):
+    """ Create a new logger.
+
+        Arguments:
+        - name: The name of the logger
+        - dt: The logging time interval (periodic loggers only)
+        - header: A header text to put at the top of each log file
+        - logtype: The type of logger: 'csv' (text) or 'bin' (columnar binary)
+    """
+    if name not in allloggers:
+        allloggers[name] = logtypes[logtype](name, dt or 0.0, header)
     if dt:
         periodicloggers[name] = allloggers[name]
 
@@ -62,10 +110,96 @@ def reset():
 
     CSVLogger.simt = 0.0
 
+    # Make sure all queued log entries are written before closing the files
+    flush()
+    if writer and writer.ndropped:
+        print(f'Datalog: {writer.ndropped} log entries were dropped '
+              'because the log queue was full')
+        writer.ndropped = 0
+
     # Close all logs and remove reference to its file object
     for log in allloggers.values():
         log.reset()
 
+    # Only clear the list of log files when no more files can be rotated
+    # by queued writes of the previous run
+    openedfiles.clear()
+
+
+def logfiles():
+    """ Return the file names of all logs that were started since the last reset. """
+    return list(openedfiles)
+
+
+class LogWriter(Thread):
+    """ Background thread that formats and writes log entries, so that
+        file output doesn't add to the simulation step time. """
+    def __init__(self, maxsize=0):
+        super().__init__(name='LogWriter', daemon=True)
+        self.queue = Queue(maxsize)
+        self.ndropped = 0
+
+    def submit(self, func, *args, block=True):
+        """ Queue a write call. When block is False and the queue is full,
+            the call is dropped. """
+        if block:
+            self.queue.put((func, args))
+            return
+        try:
+            self.queue.put_nowait((func, args))
+        except Full:
+            self.ndropped += 1
+
+    def run(self):
+        while True:
+            func, args = self.queue.get()
+            try:
+                func(*args)
+            except Exception as e:
+                print(f'Datalog: error writing log: {e}')
+            finally:
+                self.queue.task_done()
+
+    def flush(self):
+        """ Wait until all queued write calls are processed. """
+        self.queue.join()
+
+
+def submit(func, *args, block=True):
+    """ Perform a write call, in the background writer when log_async is set.
+
+        Arguments:
+        - func: The write function
+        - args: The (snapshotted) arguments of the write function
+        - block: When False, a call may be dropped if the queue is full
+          and log_queue_policy is 'drop'
+    """
+    global writer
+    if not settings.log_async:
+        func(*args)
+        return
+    if writer is None:
+        writer = LogWriter(settings.log_queue_size)
+        writer.start()
+    writer.submit(func, *args,
+                  block=block or settings.log_queue_policy != 'drop')
+
+
+def flush():
+    """ Wait until all queued log entries are written. """
+    if writer is not None:
+        writer.flush()
+
+
+def snapshot(value):
+    """ Copy a logged value, so that the simulation can continue to modify
+        it while the log entry waits in the queue. """
+    if isinstance(value, np.ndarray):
+        return value.copy()
+    if isinstance(value, list):
+        return list(value)
+    return value
+
 
 def makeLogfileName(logname, prefix: str = ''):
     timestamp = datetime.now().strftime('%Y%m%d_%H-%M-%S')
@@ -76,6 +210,90 @@ def makeLogfileName(logname, prefix: str = ''):
     return settings.log_path + '/' + fname
 
 
+def openlogfile(fname, mode='rb'):
+    """ Open a log file, decompressing it when its name ends with .gz or .xz. """
+    if fname.endswith('.gz'):
+        return gzip.open(fname, mode)
+    if fname.endswith('.xz'):
+        return lzma.open(fname, mode)
+    return open(fname, mode)
+
+
+def logsegments(fnames):
+    """ Return the sorted file names of all segments of a rotated log.
+
+        Arguments:
+        - fnames: A file name, a glob pattern (e.g., 'output/MYLOG_myscen_*'),
+          or a list of file names
+    """
+    if isinstance(fnames, str):
+        fnames = sorted(glob.glob(fnames)) or [fnames]
+    return sorted(fnames)
+
+
+def readlog(fnames):
+    """ Iterate over the lines of a text log, which may be rotated over
+        multiple (compressed) segments. The header lines are only returned
+        for the first segment.
+
+        Arguments:
+        - fnames: A file name, a glob pattern, or a list of file names
+    """
+    for i, fname in enumerate(logsegments(fnames)):
+        with openlogfile(fname) as fin:
+            for line in fin:
+                line = line.decode('ascii').rstrip('\n')
+                if i and line.startswith('#'):
+                    continue
+                yield line
+
+
+class LogFile:
+    """ Output file of a text logger, with optional compression. When the
+        logger passes a function to create new file names, the logger output
+        is rotated to a new file when the current file exceeds
+        log_rotate_size or log_rotate_interval. Each file starts with the
+        log header. """
+    def __init__(self, fname, header, newname=None):
+        self.header = header
+        self.newname = newname
+        self.fname = fname
+        self.file = None
+        self.nbytes = 0
+        self.tstart = None
+        self.open(fname)
+
+    def open(self, fname):
+        self.fname = fname
+        self.file = openlogfile(fname, 'wb')
+        self.file.write(self.header)
+        self.nbytes = len(self.header)
+        self.tstart = None
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode('ascii')
+        self.file.write(data)
+        self.nbytes += len(data)
+
+    def rotate(self, simt):
+        """ Continue in a new file when the current file is full. """
+        if self.tstart is None:
+            self.tstart = simt
+            return
+        if self.newname is None:
+            return
+        maxsize = settings.log_rotate_size * 1e6
+        if maxsize and self.nbytes >= maxsize or settings.log_rotate_interval \
+                and simt - self.tstart >= settings.log_rotate_interval:
+            self.file.close()
+            self.open(self.newname())
+            self.tstart = simt
+
+    def close(self):
+        self.file.close()
+
+
 def col2txt(col, nrows):
     if isinstance(col, (list, np.ndarray)):
         if isinstance(col[0], numbers.Integral):
@@ -103,24 +321,32 @@ class CSVLogger:
         self.name = name
         self.file = None
         self.fname = None
+        self.prefix = ''
         self.dataparents = []
         self.header = header.split('\n')
         self.tlog = 0.0
         self.selvars = []
 
+        # Change-triggered logging: only log rows in which a variable changed
+        # more than its deadband with respect to the last logged row
+        self.changemode = False
+        self.deadbands = dict()
+        self.lastlog = None
+
         # In case this is a periodic logger: log timestep
         self.dt = dt
         self.default_dt = dt
 
         # Register a command for this logger in the stack
         stackcmd = {name: [
-            name + ' ON/OFF,[dt] or ADD [FROM parent] var1,...,varn',
+            name + ' ON/OFF,[dt] or ADD [FROM parent] var1,...,varn ' +
+            'or CHANGE ON/OFF or DEADBAND var,value',
             '[txt,float/word,...]', self.stackio, name + " data logging on"]
         }
         stack.append_commands(stackcmd)
 
     def write(self, line):
-        self.file.write(bytearray(line, 'ascii'))
+        submit(self.file.write, bytearray(line, 'ascii'))
 
     def setheader(self, header):
         self.header = header.split('\n')
@@ -147,21 +373,21 @@ class CSVLogger:
                     return False, f'Variable {v} not found'
 
         self.selvars = selvars
+        # The logged columns have changed: compare to a fresh reference
+        self.lastlog = None
         return True
 
     def open(self, fname):
         if self.file:
+            flush()
             self.file.close()
-        self.file = open(fname, 'wb')
-        # Write the header
-        for line in self.header:
-            self.file.write(bytearray('# ' + line + '\n', 'ascii'))
-        # Write the column contents
+        # The header, followed by the column contents
         columns = ['simt']
         for v in self.selvars:
             columns.append(v.varname)
-        self.file.write(
-            bytearray('# ' + str.join(', ', columns) + '\n', 'ascii'))
+        header = ''.join('# ' + line + '\n' for line in self.header) + \
+            '# ' + str.join(', ', columns) + '\n'
+        self.file = LogFile(fname, bytearray(header, 'ascii'), self.logfilename)
 
     def isopen(self):
         return self.file is not None
@@ -171,38 +397,122 @@ class CSVLogger:
             # Set the next log timestep
             self.tlog += self.dt
 
-            # Make the variable reference list
+            # Make a snapshot of the logged variables
             varlist = [bs.sim.simt]
-            varlist += [v.get() for v in self.selvars]
-            varlist += additional_vars
-
-            # Get the number of rows from the first array/list
-            nrows = 1
-            for v in varlist:
-                if isinstance(v, (list, np.ndarray)):
-                    nrows = len(v)
-                    break
-            if nrows == 0:
-                return
-            # Convert (numeric) arrays to text, leave text arrays untouched
-            txtdata = [
-                txtcol for col in varlist for txtcol in col2txt(col, nrows)]
-
-            # log the data to file
-            np.savetxt(self.file, np.vstack(txtdata).T,
-                       delimiter=',', newline='\n', fmt='%s')
+            varlist += [snapshot(v.get()) for v in self.selvars]
+            varlist += [snapshot(v) for v in additional_vars]
+            if self.changemode:
+                varlist = self.changefilter(varlist)
+                if varlist is None:
+                    return
+
+            # Formatting and writing is done by the log writer
+            submit(self.writerows, self.file, varlist, block=False)
+
+    def changefilter(self, varlist):
+        """ Select the rows of a snapshot in which at least one variable
+            changed more than its deadband since that row was last logged.
+            Rows are matched to the last logged rows by aircraft id when the
+            logged arrays are per-aircraft, and by position otherwise.
+            Returns None when no row changed. """
+        nrows = 1
+        for v in varlist:
+            if isinstance(v, (list, np.ndarray)):
+                nrows = len(v)
+                break
+        names = ['simt'] + [v.varname for v in self.selvars] + \
+            [f'var{i}' for i in range(len(varlist) - len(self.selvars) - 1)]
+
+        # Collect the numeric and text columns to compare
+        numcols, dbands, txtcols = [], [], []
+        for v, name in zip(varlist[1:], names[1:]):
+            col = np.asarray(v) if isinstance(v, (list, np.ndarray)) \
+                else np.full(nrows, v, dtype=object if isinstance(v, str) else float)
+            col = col.reshape(nrows, -1)
+            if col.dtype.kind in 'biuf':
+                numcols.append(col.astype(float))
+                dbands.extend(col.shape[1] * [self.deadbands.get(name.upper(), 0.0)])
+            else:
+                txtcols.append(col.astype(object))
+        values = np.hstack(numcols) if numcols else np.empty((nrows, 0))
+        texts = np.hstack(txtcols) if txtcols else np.empty((nrows, 0), dtype=object)
+
+        keys = bs.traf.id if len(bs.traf.id) == nrows else range(nrows)
+        changed = np.ones(nrows, dtype=bool)
+        # Only compare to the last logged rows when they have the same columns
+        if self.lastlog is not None and \
+                self.lastlog[1].shape[1] == values.shape[1] and \
+                self.lastlog[2].shape[1] == texts.shape[1]:
+            lastrow, lastvalues, lasttexts = self.lastlog
+            idx = np.fromiter((lastrow.get(key, -1) for key in keys), int, nrows)
+            known = np.flatnonzero(idx >= 0)
+            diff = np.abs(values[known] - lastvalues[idx[known]]) > dbands
+            changed[known] = np.any(diff, axis=1) | \
+                np.any(texts[known] != lasttexts[idx[known]], axis=1)
+            # Unchanged rows keep their last logged values as reference, so
+            # that slow drifts are logged once they exceed the deadband
+            same = known[~changed[known]]
+            values[same] = lastvalues[idx[same]]
+            texts[same] = lasttexts[idx[same]]
+        self.lastlog = (dict(zip(keys, range(nrows))), values, texts)
+
+        if not changed.any():
+            return None
+        if changed.all():
+            return varlist
+        sel = np.flatnonzero(changed)
+        return [[v[i] for i in sel] if isinstance(v, list) else
+                v[sel] if isinstance(v, np.ndarray) and len(v) == nrows else v
+                for v in varlist]
+
+    @staticmethod
+    def writerows(file, varlist):
+        """ Format a snapshot of the logged variables, and write it to file. """
+        # Get the number of rows from the first array/list
+        nrows = 1
+        for v in varlist:
+            if isinstance(v, (list, np.ndarray)):
+                nrows = len(v)
+                break
+        if nrows == 0:
+            return
+        file.rotate(varlist[0])
+        # Convert (numeric) arrays to text, leave text arrays untouched
+        txtdata = [
+            txtcol for col in varlist for txtcol in col2txt(col, nrows)]
+
+        # log the data to file
+        np.savetxt(file, np.vstack(txtdata).T,
+                   delimiter=',', newline='\n', fmt='%s')
+
+    def logfilename(self):
+        """ Create the name of a new log file of this logger. """
+        fname = makeLogfileName(self.name, self.prefix)
+        # A file rotated within the same second gets a sequence number
+        base, n = fname[:-4], 0
+        ext = '.log' + compressext[settings.log_compression]
+        fname = base + ext
+        while os.path.exists(fname):
+            n += 1
+            fname = f'{base}_{n:03d}{ext}'
+        openedfiles.append(fname)
+        return fname
 
     def start(self, prefix: str = ''):
         """ Start this logger. """
         self.tlog = bs.sim.simt
-        self.fname = makeLogfileName(self.name, prefix)
+        self.prefix = prefix
+        self.lastlog = None
+        self.fname = self.logfilename()
         self.open(self.fname)
 
     def reset(self):
         self.dt = self.default_dt
         self.tlog = 0.0
         self.fname = None
+        self.lastlog = None
         if self.file:
+            flush()
             self.file.close()
             self.file = None
 
@@ -220,7 +530,11 @@ class CSVLogger:
             text += 'with variables: ' + self.listallvarnames() + '\n'
             text += self.name + ' is ' + ('ON' if self.isopen() else 'OFF') + \
                 '\nUsage: ' + self.name + \
-                ' ON/OFF,[dt] or ADD [FROM parent] var1,...,varn'
+                ' ON/OFF,[dt] or ADD [FROM parent] var1,...,varn' + \
+                ' or CHANGE ON/OFF or DEADBAND var,value'
+            if self.changemode:
+                text += '\nLogging changes only, with deadbands: ' + \
+                    ', '.join(f'{k}={v}' for k, v in self.deadbands.items())
             return True, text
             # TODO: add list of logging vars
         elif args[0] == 'ON':
@@ -237,4 +551,88 @@ class CSVLogger:
         elif args[0] == 'ADD':
             return self.addvars(list(args[1:]))
 
+        elif args[0] == 'CHANGE':
+            if len(args) < 2 or args[1] not in ('ON', 'OFF'):
+                return False, 'Usage: ' + self.name + ' CHANGE ON/OFF'
+            self.changemode = (args[1] == 'ON')
+            self.lastlog = None
+
+        elif args[0] == 'DEADBAND':
+            if len(args) < 3 or not isinstance(args[2], float):
+                return False, 'Usage: ' + self.name + ' DEADBAND var,value'
+            self.deadbands[str(args[1]).upper()] = abs(args[2])
+            self.changemode = True
+            self.lastlog = None
+
         return True
+
+
+class BinLogger(CSVLogger):
+    """ Logger that writes typed columns to a binary log file, instead of
+        formatting values as text. See bluesky.tools.binlog for the file
+        format, reader, and conversion to text logs. """
+    def open(self, fname):
+        if self.file:
+            flush()
+            self.file.close()
+        self.file = BinWriter(fname, self.name, self.header)
+
+    def start(self, prefix: str = ''):
+        """ Start this logger. """
+        self.tlog = bs.sim.simt
+        self.lastlog = None
+        self.fname = makeLogfileName(self.name, prefix)[:-4] + '.blog'
+        self.open(self.fname)
+        openedfiles.append(self.fname)
+
+    def log(self, *additional_vars):
+        if self.file and bs.sim.simt >= self.tlog:
+            # Set the next log timestep
+            self.tlog += self.dt
+
+            # Make a snapshot of the logged variables
+            varlist = [bs.sim.simt]
+            varlist += [snapshot(v.get()) for v in self.selvars]
+            varlist += [snapshot(v) for v in additional_vars]
+            names = ['simt'] + [v.varname for v in self.selvars] + \
+                [f'var{i}' for i in range(len(additional_vars))]
+            if self.changemode:
+                varlist = self.changefilter(varlist)
+                if varlist is None:
+                    return
+
+            # Conversion to columns and writing is done by the log writer
+            submit(self.writerows, self.file, varlist, names, block=False)
+
+    @staticmethod
+    def writerows(file, varlist, names):
+        """ Convert a snapshot of the logged variables to columns, and
+            write it to file. """
+        # Get the number of rows from the first array/list
+        nrows = 1
+        for v in varlist:
+            if isinstance(v, (list, np.ndarray)):
+                nrows = len(v)
+                break
+        if nrows == 0:
+            return
+
+        # Broadcast scalars, and split 2D arrays into separate columns
+        columns, colnames = [], []
+        for col, name in zip(varlist, names):
+            if isinstance(col, (list, np.ndarray)):
+                col = np.asarray(col) if isinstance(col, np.ndarray) or \
+                    not isinstance(col[0], str) else col
+                if isinstance(col, np.ndarray) and col.ndim > 1:
+                    columns.extend(col.T)
+                    colnames.extend(f'{name}[{i}]' for i in range(col.shape[1]))
+                    continue
+            else:
+                col = nrows * [col] if isinstance(col, str) else np.full(nrows, col)
+            columns.append(col)
+            colnames.append(name)
+
+        file.write(columns, colnames)
+
+
+logtypes.update(csv=CSVLogger, bin=BinLogger)
@@ -1,10 +1,12 @@
 """ This module defines a set of standard geographic functions and constants for
     easy use in BlueSky. """
+from functools import lru_cache
 from pathlib import Path
 import numpy as np
 from math import *
 
 from bluesky import settings
+from bluesky.tools import geokernels
 
 
 # Constants
@@ -39,25 +41,7 @@ def rwgs84_matrix(latd):
     """ Calculate the earths radius with WGS'84 geoid definition
         In:  lat [deg] (Vector of latitudes)
         Out: R   [m]   (Vector of radii) """
-
-    lat    = np.radians(latd)
-    a      = 6378137.0       # [m] Major semi-axis WGS-84
-    b      = 6356752.314245  # [m] Minor semi-axis WGS-84
-    coslat = np.cos(lat)
-    sinlat = np.sin(lat)
-    an     = a * a * coslat
-    bn     = b * b * sinlat
-    ad     = a * coslat
-    bd     = b * sinlat
-
-    anan   = np.multiply(an, an)
-    bnbn   = np.multiply(bn, bn)
-    adad   = np.multiply(ad, ad)
-    bdbd   = np.multiply(bd, bd)
-    # Calculate radius in meters
-    r      = np.sqrt(np.divide(anan + bnbn, adad + bdbd))
-
-    return r
+    return geokernels.rwgs84(latd)
 
 
 def qdrdist(latd1, lond1, latd2, lond2):
@@ -123,53 +107,11 @@ def qdrdist_matrix(lat1, lon1, lat2, lon2):
             latd1,lond1 en latd2, lond2 [deg] :positions 1 & 2 (vectors)
         Out:
             qdr [deg] = heading from 1 to 2 (matrix)
-            d [nm]    = distance from 1 to 2 in nm (matrix) """
-    prodla =  lat1.T * lat2
-    condition = prodla < 0
-
-    r = np.zeros(prodla.shape)
-    r = np.where(condition, r, rwgs84_matrix(lat1.T + lat2))
-
-    a = 6378137.0
-
-    r = np.where(np.invert(condition), r, (np.divide(np.multiply
-      (0.5, ((np.multiply(abs(lat1), (rwgs84_matrix(lat1)+a))).T +
-         np.multiply(abs(lat2), (rwgs84_matrix(lat2)+a)))),
-            (abs(lat1)).T+(abs(lat2)+(lat1 == 0.)*0.000001))))  # different hemisphere
-
-    diff_lat = lat2-lat1.T
-    diff_lon = lon2-lon1.T
-
-    sin1 = (np.radians(diff_lat))
-    sin2 = (np.radians(diff_lon))
-
-    sinlat1 = np.sin(np.radians(lat1))
-    sinlat2 = np.sin(np.radians(lat2))
-    coslat1 = np.cos(np.radians(lat1))
-    coslat2 = np.cos(np.radians(lat2))
-
-    sin21 = np.mat(np.sin(sin2))
-    cos21 = np.mat(np.cos(sin2))
-    y = np.multiply(sin21, coslat2)
-
-    x1 = np.multiply(coslat1.T, sinlat2)
-
-    x2 = np.multiply(sinlat1.T, coslat2)
-    x3 = np.multiply(x2, cos21)
-    x = x1-x3
-
-    qdr = np.degrees(np.arctan2(y, x))
-
-    sin10 = np.mat(np.abs(np.sin(sin1/2.)))
-    sin20 = np.mat(np.abs(np.sin(sin2/2.)))
-    sin1sin1 = np.multiply(sin10, sin10)
-    sin2sin2 = np.multiply(sin20, sin20)
-    sqrt = sin1sin1 + np.multiply((coslat1.T * coslat2), sin2sin2)
-    dist_c = np.multiply(2., np.arctan2(np.sqrt(sqrt), np.sqrt(1-sqrt)))
-    dist = np.multiply(r/nm, dist_c)
-    #    dist = np.multiply(2.*r, np.arcsin(sqrt))
-
-    return qdr, dist
+            d [nm]    = distance from 1 to 2 in nm (matrix)
+        For 1 x n matrices (or 2D arrays) of positions, the results are the
+        values between all pairs of positions, for 1D arrays the values between
+        each position 1 and position 2. Results are arrays, not np.matrix. """
+    return geokernels.qdrdist(np.asarray(lat1).T, np.asarray(lon1).T, lat2, lon2)
 
 
 def latlondist(latd1, lond1, latd2, lond2):
@@ -223,39 +165,9 @@ def latlondist_matrix(lat1, lon1, lat2, lon2):
         Input:
               two lat/lon position vectors in degrees
         Out:
-              distance vector in meters !!!! """
-    prodla =  lat1.T*lat2
-    condition = prodla < 0
-
-    r = np.zeros(len(prodla))
-    r = np.where(condition, r, rwgs84_matrix(lat1.T+lat2))
-
-    a = 6378137.0
-    r = np.where(np.invert(condition), r, (np.divide(np.multiply(0.5,
-        ((np.multiply(abs(lat1), (rwgs84_matrix(lat1)+a))).T +
-            np.multiply(abs(lat2), (rwgs84_matrix(lat2)+a)))),
-            (abs(lat1)).T+(abs(lat2)))))  # different hemisphere
-
-    diff_lat = lat2-lat1.T
-    diff_lon = lon2-lon1.T
-
-    sin1 = (np.radians(diff_lat))
-    sin2 = (np.radians(diff_lon))
-
-    coslat1 = np.cos(np.radians(lat1))
-    coslat2 = np.cos(np.radians(lat2))
-
-    sin10 = np.mat(np.sin(sin1/2))
-    sin20 = np.mat(np.sin(sin2/2))
-    sin1sin1 =  np.multiply(sin10, sin10)
-    sin2sin2 =  np.multiply(sin20, sin20)
-    root =  sin1sin1+np.multiply((coslat1.T*coslat2), sin2sin2)
-
-    #    dist = np.multiply(2.*r, np.arcsin(sqrt))
-    dist_c =  np.multiply(2, np.arctan2(np.sqrt(root), np.sqrt(1.-root)))
-    dist = np.multiply(r/nm, dist_c)
-
-    return dist
+              distance vector in meters !!!!
+        See qdrdist_matrix for the shape of the result. """
+    return geokernels.latlondist(np.asarray(lat1).T, np.asarray(lon1).T, lat2, lon2)
 
 
 def wgsg(latd):
@@ -322,19 +234,9 @@ def kwikdist_matrix(lata, lona, latb, lonb):
         lat/lon, lat/lon vectors [deg]
     Out:
         dist vector [nm]
+    See qdrdist_matrix for the shape of the result.
     """
-
-    re      = 6371000.  # readius earth [m]
-    dlat    = np.radians(latb - lata.T)
-    dlon    = np.radians(((lonb - lona.T)+180)%360-180)
-    cavelat = np.cos(np.radians(lata + latb.T) * 0.5)
-
-    dangle  = np.sqrt(np.multiply(dlat, dlat) +
-                      np.multiply(np.multiply(dlon, dlon),
-                                  np.multiply(cavelat, cavelat)))
-    dist    = re * dangle / nm
-
-    return dist
+    return geokernels.kwikdist(np.asarray(lata).T, np.asarray(lona).T, latb, lonb)
 
 
 def kwikqdrdist(lata, lona, latb, lonb):
@@ -356,21 +258,9 @@ def kwikqdrdist(lata, lona, latb, lonb):
 
 def kwikqdrdist_matrix(lata, lona, latb, lonb):
     """Gives quick and dirty qdr[deg] and dist [nm] matrices
-       from lat/lon vectors. (note: does not work well close to poles)"""
-
-    re      = 6371000.  # radius earth [m]
-    dlat    = np.radians(latb - lata.T)
-    dlon    = np.radians(((lonb - lona.T)+ 180) % 360 - 180)
-    cavelat = np.cos(np.radians(latb + lata.T) * 0.5)
-
-    dangle  = np.sqrt(np.multiply(dlat, dlat) +
-                      np.multiply(np.multiply(dlon, dlon),
-                                  np.multiply(cavelat, cavelat)))
-    dist    = re * dangle / nm
-
-    qdr     = np.degrees(np.arctan2(np.multiply(dlon, cavelat), dlat)) % 360.
-
-    return qdr, dist
+       from lat/lon vectors. (note: does not work well close to poles)
+       See qdrdist_matrix for the shape of the result."""
+    return geokernels.kwikqdrdist(np.asarray(lata).T, np.asarray(lona).T, latb, lonb)
 
 def kwikpos(latd1, lond1, qdr, dist):
     """ Fast, but quick and dirty, position calculation from vectors of reference position,
@@ -392,6 +282,91 @@ def kwikpos(latd1, lond1, qdr, dist):
 
     return latd2,lond2
 
+
+def geodetic2ecef(latd, lond, alt):
+    """ Convert geodetic positions to earth-centered, earth-fixed (ECEF)
+        coordinates, using WGS'84
+        In:
+             latd,lond [deg], alt [m]  position(s) (scalars or arrays)
+        Out:
+             x,y,z [m]  ECEF coordinates (x to lat=0,lon=0; z to north pole) """
+    a  = 6378137.0                       # [m] Major semi-axis WGS-84
+    f  = 1.0 / 298.257223563             # Flattening WGS-84
+    e2 = f * (2.0 - f)                   # Eccentricity squared
+
+    lat    = np.radians(latd)
+    lon    = np.radians(lond)
+    sinlat = np.sin(lat)
+    coslat = np.cos(lat)
+
+    # Prime vertical radius of curvature
+    n = a / np.sqrt(1.0 - e2 * sinlat * sinlat)
+
+    x = (n + alt) * coslat * np.cos(lon)
+    y = (n + alt) * coslat * np.sin(lon)
+    z = (n * (1.0 - e2) + alt) * sinlat
+    return x, y, z
+
+
+def ecef2enu_matrix(latd0, lond0):
+    """ Rotation matrix from ECEF to local east, north, up (ENU) axes at
+        geodetic latitude latd0 and longitude lond0 [deg]. """
+    lat0, lon0 = np.radians(latd0), np.radians(lond0)
+    sinlat, coslat = np.sin(lat0), np.cos(lat0)
+    sinlon, coslon = np.sin(lon0), np.cos(lon0)
+    return np.array([[-sinlon,          coslon,          0.0],
+                     [-sinlat * coslon, -sinlat * sinlon, coslat],
+                     [coslat * coslon,  coslat * sinlon,  sinlat]])
+
+
+class ENUTransform:
+    """ Conversion of geodetic positions to east, north, up (ENU) coordinates
+        about a fixed origin, with the ECEF position of the origin and the
+        rotation to ENU axes calculated once.
+
+        Arguments:
+        - latd0, lond0 [deg], alt0 [m]: Origin of the ENU frame
+    """
+    def __init__(self, latd0, lond0, alt0=0.0):
+        self.origin = (latd0, lond0, alt0)
+        self.ecef0 = geodetic2ecef(latd0, lond0, alt0)
+        self.matrix = ecef2enu_matrix(latd0, lond0)
+
+    def fromecef(self, x, y, z):
+        """ Convert ECEF coordinates x,y,z [m] (scalars or arrays) to
+            east,north,up [m] relative to the origin. """
+        dx = x - self.ecef0[0]
+        dy = y - self.ecef0[1]
+        dz = z - self.ecef0[2]
+        r = self.matrix
+        east  = r[0, 0] * dx + r[0, 1] * dy
+        north = r[1, 0] * dx + r[1, 1] * dy + r[1, 2] * dz
+        up    = r[2, 0] * dx + r[2, 1] * dy + r[2, 2] * dz
+        return east, north, up
+
+    def fromgeodetic(self, latd, lond, alt):
+        """ Convert geodetic positions latd,lond [deg], alt [m] (scalars or
+            arrays) to east,north,up [m] relative to the origin. """
+        return self.fromecef(*geodetic2ecef(latd, lond, alt))
+
+
+@lru_cache(maxsize=32)
+def enutransform(latd0, lond0, alt0=0.0):
+    """ ENU transform about an origin, cached per origin. """
+    return ENUTransform(latd0, lond0, alt0)
+
+
+def geodetic2enu(latd, lond, alt, latd0, lond0, alt0=0.0):
+    """ Convert geodetic positions to local east, north, up (ENU) coordinates,
+        using WGS'84
+        In:
+             latd,lond [deg], alt [m]     position(s) (scalars or arrays)
+             latd0,lond0 [deg], alt0 [m]  origin of the ENU frame
+        Out:
+             east,north,up [m] """
+    return enutransform(float(latd0), float(lond0), float(alt0)).fromgeodetic(latd, lond, alt)
+
+
 def magdec(latd, lond):
     """
     Gives magnetic declination (also called magnetic variation) at given
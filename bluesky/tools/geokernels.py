@@ -0,0 +1,335 @@
+""" Vectorized geodesy kernels, with a numba and a numpy implementation.
+
+    The kernels calculate bearings and distances between arrays of
+    positions. All kernels broadcast their inputs like numpy ufuncs, and
+    the _matrix variants calculate the values between all pairs of
+    positions of two vectors. Results are numpy arrays (never np.matrix),
+    written to the arrays given with out=, or to new arrays of the given
+    dtype (float64 by default, or float32 for a faster, less accurate mode).
+
+    When numba is installed, the kernels are compiled from the scalar
+    functions in this module, which loop over the elements without
+    temporary arrays. Otherwise, or with the geo_kernels setting set to
+    'numpy', they are evaluated with numpy.
+"""
+from math import atan2, cos, degrees, radians, sin, sqrt
+import numpy as np
+
+from bluesky import settings
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+# Implementation of the kernels: 'numba', 'numpy', or 'auto' (numba when installed)
+settings.set_variable_defaults(geo_kernels='auto')
+
+# Constants
+nm = 1852.             # m       1 nautical mile
+a_wgs84 = 6378137.0        # [m] Major semi-axis WGS-84
+b_wgs84 = 6356752.314245   # [m] Minor semi-axis WGS-84
+re = 6371000.          # [m] Average earth radius of the kwik* functions
+
+backend = 'numba' if numba is not None and settings.geo_kernels != 'numpy' else 'numpy'
+
+
+# ------------------------------------------------------------------------------
+# Kernel functions
+# ------------------------------------------------------------------------------
+def rwgs84(latd, out=None, dtype=None):
+    """ Calculate the earths radius with WGS'84 geoid definition
+
+        Arguments:
+        - latd: Latitude [deg]
+        - out: Optional output array
+        - dtype: Type of the result when out is not given (default float64)
+
+        Returns:
+        - r: Earth radius [m]
+    """
+    (latd,), (r,) = _prepare((latd,), out, 1, dtype)
+    _kernels[backend]['rwgs84'](latd, r)
+    return r
+
+
+def qdrdist(latd1, lond1, latd2, lond2, out=None, dtype=None):
+    """ Calculate bearing and distance, using WGS'84
+
+        Arguments:
+        - latd1, lond1, latd2, lond2: Positions 1 and 2 [deg]
+        - out: Optional tuple of output arrays (qdr, dist)
+        - dtype: Type of the results when out is not given (default float64)
+
+        Returns:
+        - qdr: Bearing from 1 to 2 [deg], between -180 and 180
+        - dist: Distance from 1 to 2 [nm]
+    """
+    args, (qdr, dist) = _prepare((latd1, lond1, latd2, lond2), out, 2, dtype)
+    _kernels[backend]['qdrdist'](*args, qdr, dist)
+    return qdr, dist
+
+
+def latlondist(latd1, lond1, latd2, lond2, out=None, dtype=None):
+    """ Calculate distance with the haversine formula and average WGS'84 radius
+
+        Arguments:
+        - latd1, lond1, latd2, lond2: Positions 1 and 2 [deg]
+        - out: Optional output array
+        - dtype: Type of the result when out is not given (default float64)
+
+        Returns:
+        - dist: Distance from 1 to 2 [m]
+    """
+    args, (dist,) = _prepare((latd1, lond1, latd2, lond2), out, 1, dtype)
+    _kernels[backend]['latlondist'](*args, dist)
+    return dist
+
+
+def kwikdist(lata, lona, latb, lonb, out=None, dtype=None):
+    """ Quick and dirty distance, with a flat earth approximation
+
+        Arguments:
+        - lata, lona, latb, lonb: Positions a and b [deg]
+        - out: Optional output array
+        - dtype: Type of the result when out is not given (default float64)
+
+        Returns:
+        - dist: Distance from a to b [nm]
+    """
+    args, (dist,) = _prepare((lata, lona, latb, lonb), out, 1, dtype)
+    _kernels[backend]['kwikdist'](*args, dist)
+    return dist
+
+
+def kwikqdrdist(lata, lona, latb, lonb, out=None, dtype=None):
+    """ Quick and dirty bearing and distance, with a flat earth approximation
+        (note: does not work well close to poles)
+
+        Arguments:
+        - lata, lona, latb, lonb: Positions a and b [deg]
+        - out: Optional tuple of output arrays (qdr, dist)
+        - dtype: Type of the results when out is not given (default float64)
+
+        Returns:
+        - qdr: Bearing from a to b [deg], between 0 and 360
+        - dist: Distance from a to b [nm]
+    """
+    args, (qdr, dist) = _prepare((lata, lona, latb, lonb), out, 2, dtype)
+    _kernels[backend]['kwikqdrdist'](*args, qdr, dist)
+    return qdr, dist
+
+
+def qdrdist_matrix(lat1, lon1, lat2, lon2, out=None, dtype=None):
+    """ Bearing [deg] and distance [nm] from each position of vectors lat1, lon1
+        to each position of vectors lat2, lon2, as (len(lat1), len(lat2)) arrays.
+        See qdrdist. """
+    return qdrdist(*_pairs(lat1, lon1, lat2, lon2), out=out, dtype=dtype)
+
+
+def latlondist_matrix(lat1, lon1, lat2, lon2, out=None, dtype=None):
+    """ Distance [m] from each position of vectors lat1, lon1 to each position
+        of vectors lat2, lon2, as (len(lat1), len(lat2)) array. See latlondist. """
+    return latlondist(*_pairs(lat1, lon1, lat2, lon2), out=out, dtype=dtype)
+
+
+def kwikdist_matrix(lata, lona, latb, lonb, out=None, dtype=None):
+    """ Quick and dirty distance [nm] from each position of vectors lata, lona
+        to each position of vectors latb, lonb, as (len(lata), len(latb)) array.
+        See kwikdist. """
+    return kwikdist(*_pairs(lata, lona, latb, lonb), out=out, dtype=dtype)
+
+
+def kwikqdrdist_matrix(lata, lona, latb, lonb, out=None, dtype=None):
+    """ Quick and dirty bearing [deg] and distance [nm] from each position of
+        vectors lata, lona to each position of vectors latb, lonb, as
+        (len(lata), len(latb)) arrays. See kwikqdrdist. """
+    return kwikqdrdist(*_pairs(lata, lona, latb, lonb), out=out, dtype=dtype)
+
+
+def _pairs(lat1, lon1, lat2, lon2):
+    """ Shape two vectors of positions for broadcasting to all pairs. """
+    return (np.ravel(lat1)[:, np.newaxis], np.ravel(lon1)[:, np.newaxis],
+            np.ravel(lat2)[np.newaxis, :], np.ravel(lon2)[np.newaxis, :])
+
+
+def _prepare(args, out, nout, dtype):
+    """ Convert the arguments of a kernel to arrays of the result type, and
+        create the output arrays when they are not given. """
+    if out is not None:
+        out = tuple(out) if nout > 1 else (out,)
+        dtype = out[0].dtype
+    dtype = np.dtype(dtype or np.float64)
+    args = [np.asarray(arg, dtype=dtype) for arg in args]
+    if out is None:
+        shape = np.broadcast_shapes(*(arg.shape for arg in args))
+        out = tuple(np.empty(shape, dtype=dtype) for _ in range(nout))
+    return args, out
+
+
+# ------------------------------------------------------------------------------
+# Numpy implementation
+# ------------------------------------------------------------------------------
+def _np_rwgs84(latd, r):
+    lat    = np.radians(latd)
+    coslat = np.cos(lat)
+    sinlat = np.sin(lat)
+    an     = a_wgs84 * a_wgs84 * coslat
+    bn     = b_wgs84 * b_wgs84 * sinlat
+    ad     = a_wgs84 * coslat
+    bd     = b_wgs84 * sinlat
+    np.sqrt((an * an + bn * bn) / (ad * ad + bd * bd), out=r)
+
+
+def _np_meanradius(latd1, latd2):
+    """ Average WGS'84 radius between two latitudes. """
+    r = np.empty(np.broadcast_shapes(latd1.shape, latd2.shape), dtype=latd1.dtype)
+    # Same hemisphere: radius at the average latitude
+    _np_rwgs84(0.5 * (latd1 + latd2), r)
+
+    # Different hemisphere: simple average would not work
+    r1 = np.empty_like(latd1)
+    r2 = np.empty_like(latd2)
+    _np_rwgs84(latd1, r1)
+    _np_rwgs84(latd2, r2)
+    abslat1, abslat2 = np.abs(latd1), np.abs(latd2)
+    res2 = 0.5 * (abslat1 * (r1 + a_wgs84) + abslat2 * (r2 + a_wgs84)) / \
+        np.maximum(0.000001, abslat1 + abslat2)
+    return np.where(latd1 * latd2 >= 0., r, res2)
+
+
+def _np_haversine(lat1, lat2, dlon):
+    """ Central angle [rad] between two positions (in radians). """
+    sin1 = np.sin(0.5 * (lat2 - lat1))
+    sin2 = np.sin(0.5 * dlon)
+    root = sin1 * sin1 + np.cos(lat1) * np.cos(lat2) * sin2 * sin2
+    return 2. * np.arctan2(np.sqrt(root), np.sqrt(1. - root))
+
+
+def _np_qdrdist(latd1, lond1, latd2, lond2, qdr, dist):
+    r    = _np_meanradius(latd1, latd2)
+    lat1 = np.radians(latd1)
+    lat2 = np.radians(latd2)
+    dlon = np.radians(lond2 - lond1)
+
+    coslat1 = np.cos(lat1)
+    coslat2 = np.cos(lat2)
+    np.degrees(np.arctan2(np.sin(dlon) * coslat2,
+                          coslat1 * np.sin(lat2) - np.sin(lat1) * coslat2 * np.cos(dlon)), out=qdr)
+    np.multiply(r / nm, _np_haversine(lat1, lat2, dlon), out=dist)
+
+
+def _np_latlondist(latd1, lond1, latd2, lond2, dist):
+    r = _np_meanradius(latd1, latd2)
+    np.multiply(r, _np_haversine(np.radians(latd1), np.radians(latd2),
+                                 np.radians(lond2 - lond1)), out=dist)
+
+
+def _np_kwikdlatlon(lata, lona, latb, lonb):
+    """ North and east angles [rad] from a to b, with a flat earth approximation. """
+    dlat    = np.radians(latb - lata)
+    dlon    = np.radians(((lonb - lona) + 180.) % 360. - 180.)
+    dlon   *= np.cos(np.radians(lata + latb) * 0.5)
+    return dlat, dlon
+
+
+def _np_kwikdist(lata, lona, latb, lonb, dist):
+    dlat, dlon = _np_kwikdlatlon(lata, lona, latb, lonb)
+    np.sqrt(dlat * dlat + dlon * dlon, out=dist)
+    dist *= re / nm
+
+
+def _np_kwikqdrdist(lata, lona, latb, lonb, qdr, dist):
+    dlat, dlon = _np_kwikdlatlon(lata, lona, latb, lonb)
+    np.sqrt(dlat * dlat + dlon * dlon, out=dist)
+    dist *= re / nm
+    np.degrees(np.arctan2(dlon, dlat), out=qdr)
+    np.mod(qdr, 360., out=qdr)
+
+
+# ------------------------------------------------------------------------------
+# Scalar implementation, compiled to ufuncs with numba
+# ------------------------------------------------------------------------------
+jit = numba.njit(cache=True) if numba is not None else (lambda fun: fun)
+
+
+@jit
+def _rwgs84(latd):
+    lat    = radians(latd)
+    coslat = cos(lat)
+    sinlat = sin(lat)
+    an     = a_wgs84 * a_wgs84 * coslat
+    bn     = b_wgs84 * b_wgs84 * sinlat
+    ad     = a_wgs84 * coslat
+    bd     = b_wgs84 * sinlat
+    return sqrt((an * an + bn * bn) / (ad * ad + bd * bd))
+
+
+@jit
+def _meanradius(latd1, latd2):
+    if latd1 * latd2 >= 0.:
+        return _rwgs84(0.5 * (latd1 + latd2))
+    return 0.5 * (abs(latd1) * (_rwgs84(latd1) + a_wgs84) +
+                  abs(latd2) * (_rwgs84(latd2) + a_wgs84)) / \
+        max(0.000001, abs(latd1) + abs(latd2))
+
+
+@jit
+def _haversine(lat1, lat2, dlon):
+    sin1 = sin(0.5 * (lat2 - lat1))
+    sin2 = sin(0.5 * dlon)
+    root = sin1 * sin1 + cos(lat1) * cos(lat2) * sin2 * sin2
+    return 2. * atan2(sqrt(root), sqrt(1. - root))
+
+
+@jit
+def _qdrdist(latd1, lond1, latd2, lond2):
+    lat1    = radians(latd1)
+    lat2    = radians(latd2)
+    dlon    = radians(lond2 - lond1)
+    coslat2 = cos(lat2)
+    qdr = degrees(atan2(sin(dlon) * coslat2,
+                        cos(lat1) * sin(lat2) - sin(lat1) * coslat2 * cos(dlon)))
+    return qdr, _meanradius(latd1, latd2) / nm * _haversine(lat1, lat2, dlon)
+
+
+@jit
+def _latlondist(latd1, lond1, latd2, lond2):
+    return _meanradius(latd1, latd2) * \
+        _haversine(radians(latd1), radians(latd2), radians(lond2 - lond1))
+
+
+@jit
+def _kwikqdrdist(lata, lona, latb, lonb):
+    dlat = radians(latb - lata)
+    dlon = radians(((lonb - lona) + 180.) % 360. - 180.) * cos(radians(lata + latb) * 0.5)
+    return degrees(atan2(dlon, dlat)) % 360., sqrt(dlat * dlat + dlon * dlon) * (re / nm)
+
+
+@jit
+def _kwikdist(lata, lona, latb, lonb):
+    return _kwikqdrdist(lata, lona, latb, lonb)[1]
+
+
+_kernels = dict(numpy=dict(rwgs84=_np_rwgs84, qdrdist=_np_qdrdist, latlondist=_np_latlondist,
+                           kwikdist=_np_kwikdist, kwikqdrdist=_np_kwikqdrdist))
+
+if numba is not None:
+    SIG1 = ['f8(f8)', 'f4(f4)']
+    SIG4 = ['f8(f8,f8,f8,f8)', 'f4(f4,f4,f4,f4)']
+    SIG4x2 = ['void(f8,f8,f8,f8,f8[:],f8[:])', 'void(f4,f4,f4,f4,f4[:],f4[:])']
+
+    @numba.guvectorize(SIG4x2, '(),(),(),()->(),()', cache=True)
+    def _nb_qdrdist(latd1, lond1, latd2, lond2, qdr, dist):
+        qdr[0], dist[0] = _qdrdist(latd1, lond1, latd2, lond2)
+
+    @numba.guvectorize(SIG4x2, '(),(),(),()->(),()', cache=True)
+    def _nb_kwikqdrdist(lata, lona, latb, lonb, qdr, dist):
+        qdr[0], dist[0] = _kwikqdrdist(lata, lona, latb, lonb)
+
+    _kernels['numba'] = dict(rwgs84=numba.vectorize(SIG1, cache=True)(_rwgs84.py_func),
+                             qdrdist=_nb_qdrdist,
+                             latlondist=numba.vectorize(SIG4, cache=True)(_latlondist.py_func),
+                             kwikdist=numba.vectorize(SIG4, cache=True)(_kwikdist.py_func),
+                             kwikqdrdist=_nb_kwikqdrdist)
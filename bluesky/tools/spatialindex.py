@@ -0,0 +1,171 @@
+''' Spatial index of rectangles, implemented with numpy.
+
+    This index is used by BlueSky when the rtree package is not available.
+    It implements the parts of the rtree.index.Index interface that BlueSky
+    uses: insert, delete, intersection, nearest, and count.
+
+    Rectangles are stored in a static, STR-packed (sort-tile-recursive)
+    tree with a single level of nodes: the rectangles are sorted into
+    vertical slices, and within each slice into nodes of at most
+    nodesize rectangles, so that nodes cover compact regions. Queries
+    first test the node bounding boxes, and then the rectangles in the
+    matching nodes. Rectangles inserted after the last packing are kept in
+    an unpacked tail that is searched directly, until the tail is large
+    enough to repack the tree.
+'''
+import numpy as np
+
+
+class Index:
+    ''' Spatial index of (minx, miny, maxx, maxy) rectangles by integer id. '''
+    def __init__(self, nodesize=16):
+        self.nodesize = nodesize
+        # Rectangles and ids of all items (packed items first, then the tail)
+        self.boxes = np.zeros((0, 4))
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.alive = np.zeros(0, dtype=bool)
+        self.npacked = 0
+        # Node bounding boxes, and the start of each node in the packed items
+        self.nodes = np.zeros((0, 4))
+        self.nodestart = np.zeros(1, dtype=int)
+        # Pending inserts, and the slot of each item by id
+        self.pending = []
+        self.slots = dict()
+
+    def __len__(self):
+        return np.count_nonzero(self.alive) + len(self.pending)
+
+    @staticmethod
+    def _box(coordinates):
+        ''' Convert a point or rectangle to a (minx, miny, maxx, maxy) rectangle. '''
+        coordinates = [float(c) for c in coordinates]
+        if len(coordinates) == 2:
+            coordinates *= 2
+        return coordinates
+
+    def insert(self, id, coordinates, obj=None):
+        ''' Insert a rectangle (or point) with identifier id. '''
+        self.pending.append((id, self._box(coordinates)))
+
+    def delete(self, id, coordinates):
+        ''' Delete the rectangle with identifier id. '''
+        self._flush()
+        for slot in self.slots.get(id, []):
+            if self.alive[slot] and np.allclose(self.boxes[slot], self._box(coordinates)):
+                self.alive[slot] = False
+                self.slots[id].remove(slot)
+                break
+
+    def _flush(self):
+        ''' Move pending inserts to the item arrays, and repack the tree
+            when the unpacked tail has grown large. '''
+        if self.pending:
+            ids, boxes = zip(*self.pending)
+            self.pending = []
+            start = len(self.ids)
+            self.ids = np.append(self.ids, np.array(ids, dtype=np.int64))
+            self.boxes = np.vstack((self.boxes, np.array(boxes)))
+            self.alive = np.append(self.alive, np.ones(len(ids), dtype=bool))
+            for slot, id in enumerate(ids, start):
+                self.slots.setdefault(id, []).append(slot)
+        ntail = len(self.ids) - self.npacked
+        ndead = len(self.ids) - np.count_nonzero(self.alive)
+        if ntail > max(64, int(np.sqrt(len(self.ids)))) or ndead > len(self.ids) // 2:
+            self._pack()
+
+    def _pack(self):
+        ''' Build the STR-packed node level from all live items. '''
+        boxes, ids = self.boxes[self.alive], self.ids[self.alive]
+        n = len(ids)
+        nnodes = -(-n // self.nodesize)
+        nslices = int(np.ceil(np.sqrt(nnodes)))
+        # Sort by x centre into slices, and each slice by y centre
+        order = np.argsort(boxes[:, 0] + boxes[:, 2], kind='stable')
+        slicesize = max(1, nslices) * self.nodesize
+        islice = np.arange(n) // slicesize
+        ycentre = (boxes[order, 1] + boxes[order, 3])
+        order = order[np.lexsort((ycentre, islice))]
+        self.boxes, self.ids = boxes[order], ids[order]
+        self.alive = np.ones(n, dtype=bool)
+        self.npacked = n
+        self.slots = dict()
+        for slot, id in enumerate(self.ids.tolist()):
+            self.slots.setdefault(id, []).append(slot)
+
+        # Nodes of nodesize items within each slice
+        nodestart = np.concatenate([np.arange(start, min(start + slicesize, n), self.nodesize)
+                                    for start in range(0, n, slicesize)] or [[]]).astype(int)
+        self.nodestart = np.append(nodestart, n)
+        if len(nodestart):
+            self.nodes = np.column_stack((np.minimum.reduceat(self.boxes[:, 0], nodestart),
+                                          np.minimum.reduceat(self.boxes[:, 1], nodestart),
+                                          np.maximum.reduceat(self.boxes[:, 2], nodestart),
+                                          np.maximum.reduceat(self.boxes[:, 3], nodestart)))
+        else:
+            self.nodes = np.zeros((0, 4))
+
+    @staticmethod
+    def _dist(boxes, box):
+        ''' Squared distance between rectangles and a rectangle (zero when they intersect). '''
+        dx = np.maximum(0.0, np.maximum(boxes[:, 0] - box[2], box[0] - boxes[:, 2]))
+        dy = np.maximum(0.0, np.maximum(boxes[:, 1] - box[3], box[1] - boxes[:, 3]))
+        return dx * dx + dy * dy
+
+    def _slots(self, inodes):
+        ''' Slots of the items in nodes inodes, and of the unpacked tail. '''
+        start = self.nodestart[inodes]
+        count = self.nodestart[inodes + 1] - start
+        # Consecutive slot ranges of all selected nodes, without a python loop
+        offset = np.repeat(start - np.cumsum(count) + count, count)
+        slots = offset + np.arange(len(offset))
+        return np.concatenate((slots, np.arange(self.npacked, len(self.ids))))
+
+    def _candidates(self, box):
+        ''' Slots of the items in nodes overlapping box, and of the unpacked tail. '''
+        self._flush()
+        nodes = self.nodes
+        return self._slots(np.flatnonzero((nodes[:, 0] <= box[2]) & (box[0] <= nodes[:, 2]) &
+                                          (nodes[:, 1] <= box[3]) & (box[1] <= nodes[:, 3])))
+
+    def intersection(self, coordinates, objects=False):
+        ''' Return the ids of all rectangles that intersect the given rectangle (or point). '''
+        box = self._box(coordinates)
+        slots = self._candidates(box)
+        boxes = self.boxes[slots]
+        mask = self.alive[slots] & (boxes[:, 0] <= box[2]) & (box[0] <= boxes[:, 2]) & \
+            (boxes[:, 1] <= box[3]) & (box[1] <= boxes[:, 3])
+        return self.ids[slots[mask]].tolist()
+
+    def count(self, coordinates):
+        ''' Return the number of rectangles that intersect the given rectangle (or point). '''
+        return len(self.intersection(coordinates))
+
+    def nearest(self, coordinates, num_results=1, objects=False):
+        ''' Return the ids of the num_results rectangles nearest to the given
+            rectangle (or point). As in rtree, all rectangles at the same
+            distance as the last result are returned as well. '''
+        self._flush()
+        box = self._box(coordinates)
+        if not len(self) or num_results < 1:
+            return []
+        # Take the nearest nodes that together hold at least num_results items:
+        # the distance of the num_results-th nearest item among them bounds
+        # the distance of all results, so only nodes within this bound are searched
+        nodedist = self._dist(self.nodes, box)
+        inodes = np.argsort(nodedist, kind='stable')
+        nfirst = np.searchsorted(np.cumsum(self.nodestart[inodes + 1] - self.nodestart[inodes]),
+                                 num_results) + 1
+        slots = self._slots(inodes[:nfirst])
+        slots = slots[self.alive[slots]]
+        dist = self._dist(self.boxes[slots], box)
+        if len(dist) >= num_results:
+            bound = np.partition(dist, num_results - 1)[num_results - 1]
+            slots = self._slots(np.flatnonzero(nodedist <= bound))
+        else:
+            slots = np.flatnonzero(self.alive)
+        slots = slots[self.alive[slots]]
+        dist = self._dist(self.boxes[slots], box)
+        order = np.argsort(dist, kind='stable')
+        kth = dist[order[min(num_results, len(order)) - 1]]
+        order = order[dist[order] <= kth]
+        return self.ids[slots[order]].tolist()
@@ -1,7 +1,7 @@
 ''' State-based conflict detection. '''
 import numpy as np
 from bluesky import stack
-from bluesky.tools import geo
+from bluesky.tools import geokernels
 from bluesky.tools.aero import nm
 from bluesky.traffic.asas import ConflictDetection
 
@@ -15,13 +15,11 @@ class StateBased(ConflictDetection):
         # Horizontal conflict ------------------------------------------------------
 
         # qdrlst is for [i,j] qdr from i to j, from perception of ADSB and own coordinates
-        qdr, dist = geo.kwikqdrdist_matrix(np.asmatrix(ownship.lat), np.asmatrix(ownship.lon),
-                                    np.asmatrix(intruder.lat), np.asmatrix(intruder.lon))
+        qdr, dist = geokernels.kwikqdrdist_matrix(ownship.lat, ownship.lon,
+                                                  intruder.lat, intruder.lon)
 
-        # Convert back to array to allow element-wise array multiplications later on
         # Convert to meters and add large value to own/own pairs
-        qdr = np.asarray(qdr)
-        dist = np.asarray(dist) * nm + 1e9 * I
+        dist = dist * nm + 1e9 * I
 
         # Calculate horizontal closest point of approach (CPA)
         qdrrad = np.radians(qdr)
@@ -52,7 +50,7 @@ class StateBased(ConflictDetection):
 
         # Check for horizontal conflict
         # RPZ can differ per aircraft, get the largest value per aircraft pair
-        rpz = np.asarray(np.maximum(np.asmatrix(rpz), np.asmatrix(rpz).transpose()))
+        rpz = np.maximum.outer(rpz, rpz)
         R2 = rpz * rpz
         swhorconf = dcpa2 < R2  # conflict or not
 
@@ -75,7 +73,7 @@ class StateBased(ConflictDetection):
 
         # Check for passing through each others zone
         # hPZ can differ per aircraft, get the largest value per aircraft pair
-        hpz = np.asarray(np.maximum(np.asmatrix(hpz), np.asmatrix(hpz).transpose()))
+        hpz = np.maximum.outer(hpz, hpz)
         tcrosshi = (dalt + hpz) / -dvs
         tcrosslo = (dalt - hpz) / -dvs
         tinver = np.minimum(tcrosshi, tcrosslo)
@@ -86,7 +84,7 @@ class StateBased(ConflictDetection):
         toutconf = np.minimum(toutver, touthor)
 
         swconfl = np.array(swhorconf * (tinconf <= toutconf) * (toutconf > 0.0) *
-                           np.asarray(tinconf < np.asmatrix(dtlookahead).T) * (1.0 - I), dtype=np.bool)
+                           (tinconf < np.reshape(dtlookahead, (-1, 1))) * (1.0 - I), dtype=np.bool)
 
         # --------------------------------------------------------------------------
         # Update conflict lists
@@ -8,9 +8,16 @@
    https://www.eurocontrol.int/sites/default/files/field_tabs/content/documents/sesar/user-manual-bada-3-12.pdf
 '''
 from pathlib import Path
+import pickle
 import re
+import numpy as np
+from bluesky.tools import cachefile
 from .fwparser import FixedWidthParser, ParseError
 
+# Cache version: increment this to the current date if the parsed data
+# format changes. The cache is also rebuilt for a different BADA release.
+bada_cache_version = 'v20261019'
+
 # File formats of BADA data files. Uses fortran-like notation
 # Adapted from the BADA manual format lines. (page 61-81 in the BADA manual)
 # Skip characters are indicated with nnX
@@ -65,6 +72,9 @@ accoeffs     = dict()
 release_date = 'Unknown'
 bada_version = 'Unknown'
 
+# Table of the coefficients of all coefficient sets, for vectorized lookup
+coefftable   = None
+
 
 def getCoefficients(actype):
     ''' Get a set of BADA coefficients for the given aircraft type.
@@ -124,34 +134,66 @@ def init(bada_path=''):
         print('SYNONYM.NEW not found in BADA path, could not load BADA.')
         return False
 
-    try:
-        data = syn_parser.parse(synonymfile)
-    except ParseError as e:
-        print(f'Error reading synonym file {e.fname} on line {e.lineno}')
-        return False
-
-    for line in data:
+    # The parsed BADA files are stored in a cache file, per BADA release
+    version = f'{bada_cache_version}-{bada_version}-{release_date}-{Path(bada_path).resolve()}'
+    with cachefile.openfile('bada.p', version) as cache:
+        try:
+            syndata = cache.load()
+            acdata = cache.load()
+        except (pickle.PickleError, cachefile.CacheError) as e:
+            print(e.args[0])
+            syndata, acdata = parse_files(bada_path)
+            if syndata is None:
+                return False
+            cache.dump(syndata)
+            cache.dump(acdata)
+
+    for line in syndata:
         syn = Synonym(line)
         synonyms[syn.accode] = syn
     print('%d aircraft entries loaded' % len(synonyms))
 
     # Load aircraft coefficient data
-    for fname in Path(bada_path).glob('*.OPF'):
+    for opfdata, apfdata in acdata:
         ac = ACData()
+        ac.setOPFData(opfdata)
+        if apfdata is not None:
+            ac.setAPFData(apfdata)
+        accoeffs[ac.actype] = ac
+    print('%d unique aircraft coefficient sets loaded' % len(accoeffs))
+
+    global coefftable
+    coefftable = CoeffTable(synonyms, accoeffs)
+    nskipped = len(accoeffs) - len(coefftable.actypes)
+    if nskipped:
+        print(f'{nskipped} coefficient sets without APF file are not used')
+    return (len(synonyms) > 0 and len(coefftable.typeindex) > 0)
+
+
+def parse_files(bada_path):
+    ''' Parse the BADA synonym file, and the OPF and APF files in bada_path.
+
+        Returns the parsed synonym lines (None when the synonym file can't
+        be read), and a list with the parsed OPF and APF data of each
+        coefficient set (the APF data is None when there is no APF file).
+    '''
+    try:
+        syndata = syn_parser.parse(Path(bada_path) / 'SYNONYM.NEW')
+    except ParseError as e:
+        print(f'Error reading synonym file {e.fname} on line {e.lineno}')
+        return None, []
+
+    acdata = []
+    for fname in Path(bada_path).glob('*.OPF'):
         try:
-            ac.setOPFData(opf_parser.parse(fname))
+            opfdata = opf_parser.parse(fname)
             apf = fname.with_suffix('.APF')
-            if apf.is_file():
-                ac.setAPFData(apf_parser.parse(apf))
-
+            apfdata = apf_parser.parse(apf) if apf.is_file() else None
         except ParseError as e:
             print(f'Error reading {e.fname} on line {e.lineno}')
-            ac = None
-
-        if ac:
-            accoeffs[ac.actype] = ac
-    print('%d unique aircraft coefficient sets loaded' % len(accoeffs))
-    return (len(synonyms) > 0 and len(accoeffs) > 0)
+            continue
+        acdata.append((opfdata, apfdata))
+    return syndata, acdata
 
 
 class Synonym:
@@ -227,3 +269,87 @@ class ACData:
         self.Mcl  = [m / 100.0 for m in self.Mcl]
         self.Mcr  = [m / 100.0 for m in self.Mcr]
         self.Mdes = [m / 100.0 for m in self.Mdes]
+
+
+class CoeffTable:
+    ''' Table of the BADA coefficients with a row per coefficient set, and a
+        column per coefficient. Aircraft types are looked up once to a row
+        index, with which the coefficients of any number of aircraft are
+        obtained with a single gather.
+
+        Arguments:
+        - synonyms: Dict of Synonym objects per aircraft type
+        - accoeffs: Dict of ACData objects per coefficient set
+    '''
+    # Scalar coefficients of ACData
+    scalars = ('m_ref', 'm_min', 'm_max', 'm_paymax', 'mass_grad',
+               'VMO', 'MMO', 'h_MO', 'h_max', 'temp_grad',
+               'S', 'Clbo', 'k', 'CM16',
+               'Vstall_cr', 'CD0_cr', 'CD2_cr', 'Vstall_ic', 'CD0_ic', 'CD2_ic',
+               'Vstall_to', 'CD0_to', 'CD2_to', 'Vstall_ap', 'CD0_ap', 'CD2_ap',
+               'Vstall_ld', 'CD0_ld', 'CD2_ld', 'CD0_gear',
+               'CTdes_low', 'CTdes_high', 'Hp_des', 'CTdes_app', 'CTdes_land',
+               'Vdes_ref', 'Mdes_ref',
+               'Cf1', 'Cf2', 'Cf3', 'Cf4', 'Cf_cruise',
+               'TOL', 'LDL', 'wingspan', 'length',
+               'vmto', 'vmic', 'vmcr', 'vmap', 'vmld')
+    # Coefficients that ACData stores as list, with their length. Element i
+    # of list name is stored in column name_i
+    lists = dict(CTC=5, CAScl1=3, CAScl2=3, Mcl=3, CAScr1=3, CAScr2=3, Mcr=3,
+                 Mdes=3, CASdes2=3, CASdes1=3)
+    # Engine types, as columns with 1 for aircraft with this engine type, and 0 otherwise
+    engtypes = dict(jet='Jet', turbo='Turboprop', piston='Piston')
+    # Aircraft type of the coefficients used for unknown aircraft types
+    defaulttype = 'B744'
+
+    def __init__(self, synonyms, accoeffs):
+        # Sets without APF file have no reference speeds: aircraft of
+        # these types get the default coefficient set instead
+        accoeffs = {actype: ac for actype, ac in accoeffs.items() if hasattr(ac, 'CAScl1')}
+        self.actypes = list(accoeffs.keys())
+        names = list(self.scalars) + [f'{name}_{i}' for name, n in self.lists.items()
+                                      for i in range(n)] + list(self.engtypes)
+        self.columns = {name: icol for icol, name in enumerate(names)}
+
+        self.data = np.full((len(accoeffs), len(names)), np.nan)
+        for row, ac in zip(self.data, accoeffs.values()):
+            row[:len(self.scalars)] = [getattr(ac, name) for name in self.scalars]
+            for name, n in self.lists.items():
+                icol = self.columns[f'{name}_0']
+                row[icol:icol + n] = getattr(ac, name)
+            for name, engtype in self.engtypes.items():
+                row[self.columns[name]] = (ac.engtype == engtype)
+
+        # Row index for each aircraft type in the synonym list
+        irow = {actype: i for i, actype in enumerate(self.actypes)}
+        self.typeindex = {accode: irow[syn.file] for accode, syn in synonyms.items()
+                          if syn.file in irow}
+
+        # The default type, or the first available type when there is no
+        # coefficient set of the default type
+        if self.defaulttype not in self.typeindex and self.typeindex:
+            self.defaulttype = next(iter(self.typeindex))
+
+    def index(self, actypes):
+        ''' Row index of each aircraft type in actypes, or -1 for aircraft
+            types without (complete) coefficient set. '''
+        return np.array([self.typeindex.get(actype, -1) for actype in actypes], dtype=int)
+
+    def rows(self, rows):
+        ''' Coefficients of coefficient sets rows (CoeffRows). '''
+        return CoeffRows(self, self.data[rows])
+
+
+class CoeffRows:
+    ''' Coefficients of a number of rows of a CoeffTable. Each coefficient
+        is an attribute with an array of the coefficient of each row.
+        The ACData constants are also available as attribute. '''
+    def __init__(self, table, data):
+        self.columns = table.columns
+        self.data = data
+
+    def __getattr__(self, name):
+        icol = self.columns.get(name)
+        if icol is None:
+            return getattr(ACData, name)
+        return self.data[:, icol]
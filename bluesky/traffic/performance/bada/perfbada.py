@@ -44,6 +44,9 @@ class BADA(PerfBase):
 
         # Register the per-aircraft parameter arrays
         with self.settrafarrays():
+            # row of the coefficient set of each aircraft in coeff_bada.coefftable
+            self.coeffidx   = np.array([], dtype=int)
+
             # engine
             self.jet        = np.array([])
             self.turbo      = np.array([])
@@ -176,24 +179,27 @@ class BADA(PerfBase):
 
         # general
         # designate aircraft to its aircraft type
-        for i, actype in enumerate(actypes):
-            syn, coeff = coeff_bada.getCoefficients(actype)
-            if syn:
-                continue
-            syn, coeff = coeff_bada.getCoefficients('B744')
-            bs.traf.type[-n + i] = syn.accode
+        coeffidx = coeff_bada.coefftable.index(actypes)
+        defaulttype = coeff_bada.coefftable.defaulttype
+        for i in np.flatnonzero(coeffidx < 0):
+            coeffidx[i] = coeff_bada.coefftable.typeindex[defaulttype]
+            bs.traf.type[-n + i] = defaulttype
 
             if not settings.verbose:
                 if not self.warned:
-                    print("Aircraft is using default B747-400 performance.")
+                    print(f"Aircraft is using default {defaulttype} performance.")
                     self.warned = True
             else:
-                print("Flight " + bs.traf.id[-n:] + " has an unknown aircraft type, " + actype + ", BlueSky then uses default B747-400 performance.")
+                print("Flight " + bs.traf.id[-n + i] + " has an unknown aircraft type, " + actypes[i] + f", BlueSky then uses default {defaulttype} performance.")
+
+        # Coefficients of all new aircraft, as arrays
+        self.coeffidx[-n:]  = coeffidx
+        coeff = coeff_bada.coefftable.rows(coeffidx)
 
         # designate aicraft to its aircraft type
-        self.jet[-n:]       = 1 if coeff.engtype == 'Jet' else 0
-        self.turbo[-n:]     = 1 if coeff.engtype == 'Turboprop' else 0
-        self.piston[-n:]    = 1 if coeff.engtype == 'Piston' else 0
+        self.jet[-n:]       = coeff.jet
+        self.turbo[-n:]     = coeff.turbo
+        self.piston[-n:]    = coeff.piston
 
         # Initial aircraft mass is currently reference mass.
         # BADA 3.12 also supports masses between 1.2*mmin and mmax
@@ -235,14 +241,14 @@ class BADA(PerfBase):
 
         # reference speeds
         # reference CAS speeds
-        self.cascl[-n:]     = coeff.CAScl1[0] * kts
-        self.cascr[-n:]     = coeff.CAScr1[0] * kts
-        self.casdes[-n:]    = coeff.CASdes1[0] * kts
+        self.cascl[-n:]     = coeff.CAScl1_0 * kts
+        self.cascr[-n:]     = coeff.CAScr1_0 * kts
+        self.casdes[-n:]    = coeff.CASdes1_0 * kts
 
         # reference mach numbers
-        self.macl[-n:]      = coeff.Mcl[0]
-        self.macr[-n:]      = coeff.Mcr[0]
-        self.mades[-n:]     = coeff.Mdes[0]
+        self.macl[-n:]      = coeff.Mcl_0
+        self.macr[-n:]      = coeff.Mcr_0
+        self.mades[-n:]     = coeff.Mdes_0
 
         # reference speed during descent
         self.vdes[-n:]      = coeff.Vdes_ref * kts
@@ -280,13 +286,13 @@ class BADA(PerfBase):
         # performance
 
         # max climb thrust coefficients
-        self.ctcth1[-n:]    = coeff.CTC[0]  # jet/piston [N], turboprop [ktN]
-        self.ctcth2[-n:]    = coeff.CTC[1]  # [ft]
-        self.ctcth3[-n:]    = coeff.CTC[2]  # jet [1/ft^2], turboprop [N], piston [ktN]
+        self.ctcth1[-n:]    = coeff.CTC_0  # jet/piston [N], turboprop [ktN]
+        self.ctcth2[-n:]    = coeff.CTC_1  # [ft]
+        self.ctcth3[-n:]    = coeff.CTC_2  # jet [1/ft^2], turboprop [N], piston [ktN]
 
         # 1st and 2nd thrust temp coefficient
-        self.ctct1[-n:]     = coeff.CTC[3]  # [k]
-        self.ctct2[-n:]     = coeff.CTC[4]  # [1/k]
+        self.ctct1[-n:]     = coeff.CTC_3  # [k]
+        self.ctct2[-n:]     = coeff.CTC_4  # [1/k]
         self.dtemp[-n:]     = 0.0  # [k], difference from current to ISA temperature. At the moment: 0, as ISA environment
 
         # Descent Fuel Flow Coefficients
@@ -308,9 +314,9 @@ class BADA(PerfBase):
         # Thrust specific fuel consumption coefficients
         # prevent from division per zero in fuelflow calculation
         self.cf1[-n:]       = coeff.Cf1
-        self.cf2[-n:]       = 1.0 if coeff.Cf2 < 1e-9 else coeff.Cf2
+        self.cf2[-n:]       = np.where(coeff.Cf2 < 1e-9, 1.0, coeff.Cf2)
         self.cf3[-n:]       = coeff.Cf3
-        self.cf4[-n:]       = 1.0 if coeff.Cf4 < 1e-9 else coeff.Cf4
+        self.cf4[-n:]       = np.where(coeff.Cf4 < 1e-9, 1.0, coeff.Cf4)
         self.cf_cruise[-n:] = coeff.Cf_cruise
 
         self.thrust[-n:] = 0.0
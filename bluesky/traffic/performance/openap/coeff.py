@@ -1,13 +1,19 @@
 """ OpenAP performance library. """
+from collections.abc import Mapping
 import json
 from pathlib import Path
-import pandas as pd
+import pickle
 import bluesky as bs
 from bluesky import settings
+from bluesky.tools import cachefile
 
 
 settings.set_variable_defaults(perf_path_openap="data/performance/OpenAP")
 
+# Cache version: increment this to the current date if the source data is updated
+# or other reasons why the cache needs to be updated
+openap_version = 'v20261019'
+
 LIFT_FIXWING = 1  # fixwing aircraft
 LIFT_ROTOR = 2  # rotor aircraft
 
@@ -16,156 +22,257 @@ ENG_TYPE_TP = 2  # turboprop, fixwing
 ENG_TYPE_TS = 3  # turboshlft, rotor
 
 
+# Coefficients are loaded only once per process, and shared between
+# performance model instances
+_coefficient = None
+
+
+def get_coefficient():
+    ''' Return the (shared) OpenAP coefficient database. '''
+    global _coefficient
+    if _coefficient is None:
+        _coefficient = Coefficient()
+    return _coefficient
+
+
+class TypeTable(Mapping):
+    ''' Dict of coefficient sets per aircraft type, stored pickled. Each set
+        is unpickled the first time its type is used.
+
+        Arguments:
+        - data: Dict with the pickled coefficient set of each type
+        - aliases: Dict with the type in data for other type names (synonyms)
+        - convert: Optional function convert(mdl, coeffset) that is applied
+          to each set after unpickling
+    '''
+    def __init__(self, data, aliases=None, convert=None):
+        self.data = data
+        # Synonyms can refer to other synonyms that come before them
+        self.aliases = dict()
+        for mdl, syno in (aliases or {}).items():
+            syno = self.aliases.get(syno, syno)
+            if mdl not in data and syno in data:
+                self.aliases[mdl] = syno
+        self.convert = convert
+        self.loaded = dict()
+
+    def __getitem__(self, mdl):
+        mdl = self.aliases.get(mdl, mdl)
+        coeffset = self.loaded.get(mdl)
+        if coeffset is None:
+            coeffset = pickle.loads(self.data[mdl])
+            if self.convert is not None:
+                coeffset = self.convert(mdl, coeffset)
+            self.loaded[mdl] = coeffset
+        return coeffset
+
+    def __contains__(self, mdl):
+        return mdl in self.data or mdl in self.aliases
+
+    def __iter__(self):
+        yield from self.data
+        yield from self.aliases
+
+    def __len__(self):
+        return len(self.data) + len(self.aliases)
+
+
 class Coefficient:
+    ''' OpenAP coefficients of all aircraft types.
+
+        The parsed coefficients are stored in a cache file. On creation only
+        the names of the aircraft types are read from the cache; the
+        coefficients of each type are loaded on first use of that type.
+    '''
     def __init__(self):
-        # Load synonyms.dat text file into dictionary
-        self.synodict = {}
-        with open(Path(settings.perf_path_openap) / 'synonym.dat', "r") as f_syno:
-            for line in f_syno.readlines():
-                if line.count("#") > 0:
-                    dataline, comment = line.split("#")
-                else:
-                    dataline = line.strip("\n")
-                acmod, synomod = dataline.split("=")
-                acmod = acmod.strip().upper()
-                synomod = synomod.strip().upper()
-
-                if acmod == synomod:
-                    continue
-                self.synodict[acmod] = synomod
-
-        self.acs_fixwing = self._load_all_fixwing_flavor()
-        self.engines_fixwing = pd.read_csv(Path(settings.perf_path_openap) / "fixwing/engines.csv", encoding="utf-8")
-        self.limits_fixwing = self._load_all_fixwing_envelop()
-
-        self.acs_rotor = self._load_all_rotor_flavor()
-        self.limits_rotor = self._load_all_rotor_envelop()
+        path = Path(settings.perf_path_openap)
+        with cachefile.openfile('openap.p', f'{openap_version}-{path.resolve()}') as cache:
+            try:
+                tables = cache.load()
+            except (pickle.PickleError, cachefile.CacheError) as e:
+                print(e.args[0])
+                tables = load_coefficients(path)
+                cache.dump(tables)
+
+        self.synodict = tables['synonyms']
+        self.dragpolar_fixwing = tables['dragpolar']
+
+        self.acs_fixwing = TypeTable(tables['fixwing'])
+        self.limits_fixwing = TypeTable(tables['fixwing_limits'], aliases=self.synodict)
+
+        self.acs_rotor = TypeTable(tables['rotor'])
+        self.limits_rotor = TypeTable(tables['rotor'], convert=rotor_envelop)
 
         self.actypes_fixwing = list(self.acs_fixwing.keys())
         self.actypes_rotor = list(self.acs_rotor.keys())
+        self._engines_fixwing = None
+
+    @property
+    def engines_fixwing(self):
+        ''' Table of all fixwing engines (pandas DataFrame), read on first use. '''
+        if self._engines_fixwing is None:
+            import pandas as pd
+            self._engines_fixwing = pd.read_csv(Path(settings.perf_path_openap) / "fixwing/engines.csv",
+                                                encoding="utf-8")
+        return self._engines_fixwing
+
 
-        df = pd.read_csv(Path(settings.perf_path_openap) / "fixwing/dragpolar.csv", index_col="mdl")
-        self.dragpolar_fixwing = df.to_dict(orient="index")
-        self.dragpolar_fixwing["NA"] = df.mean().to_dict()
-
-    def _load_all_fixwing_flavor(self):
-        import warnings
-
-        warnings.simplefilter("ignore")
-
-        # read fixwing aircraft and engine files
-        allengines = pd.read_csv(Path(settings.perf_path_openap) / "fixwing/engines.csv", encoding="utf-8")
-        allengines["name"] = allengines["name"].str.upper()
-        acs = json.load(open(Path(settings.perf_path_openap) / "fixwing/aircraft.json", "r"))
-        acs.pop("__comment")
-        acs_ = {}
-
-        for mdl, ac in acs.items():
-            acengines = ac["engines"]
-            acs_[mdl.upper()] = ac.copy()
-            acs_[mdl.upper()]["lifttype"] = LIFT_FIXWING
-            acs_[mdl.upper()]["engines"] = {}
-
-            for e in acengines:
-                e = e.strip().upper()
-                selengine = allengines[allengines["name"].str.startswith(e)]
-                if selengine.shape[0] >= 1:
-                    engine = json.loads(selengine.iloc[-1, :].to_json())
-                    acs_[mdl.upper()]["engines"][engine["name"]] = engine
-
-        return acs_
-
-    def _load_all_rotor_flavor(self):
-        # read rotor aircraft
-        acs = json.load(open(Path(settings.perf_path_openap) / "rotor/aircraft.json", "r"))
-        acs.pop("__comment")
-        acs_ = {}
-        for mdl, ac in acs.items():
-            acs_[mdl.upper()] = ac.copy()
-            acs_[mdl.upper()]["lifttype"] = LIFT_ROTOR
-        return acs_
-
-    def _load_all_fixwing_envelop(self):
-        """load aircraft envelop from the model database,
-        All unit in SI"""
-        limits_fixwing = {}
-        for mdl, ac in self.acs_fixwing.items():
-            fenv = Path(settings.perf_path_openap) / "fixwing/wrap" / (mdl.lower() + ".txt")
-
-            if fenv.is_file():
-                df = pd.read_fwf(fenv).set_index("variable")
-                limits_fixwing[mdl] = {}
-                limits_fixwing[mdl]["vminto"] = df.loc["to_v_lof"]["min"]
-                limits_fixwing[mdl]["vmaxto"] = df.loc["to_v_lof"]["max"]
-                limits_fixwing[mdl]["vminic"] = df.loc["ic_va_avg"]["min"]
-                limits_fixwing[mdl]["vmaxic"] = df.loc["ic_va_avg"]["max"]
-                limits_fixwing[mdl]["vminer"] = min(
-                    df.loc["ic_va_avg"]["min"],
-                    df.loc["cl_v_cas_const"]["min"],
-                    df.loc["cr_v_cas_mean"]["min"],
-                    df.loc["de_v_cas_const"]["min"],
-                    df.loc["fa_va_avg"]["min"],
-                )
-                limits_fixwing[mdl]["vmaxer"] = max(
-                    df.loc["ic_va_avg"]["max"],
-                    df.loc["cl_v_cas_const"]["max"],
-                    df.loc["cr_v_cas_mean"]["max"],
-                    df.loc["de_v_cas_const"]["max"],
-                    df.loc["fa_va_avg"]["max"],
-                )
-                limits_fixwing[mdl]["vminap"] = df.loc["fa_va_avg"]["min"]
-                limits_fixwing[mdl]["vmaxap"] = df.loc["fa_va_avg"]["max"]
-                limits_fixwing[mdl]["vminld"] = df.loc["ld_v_app"]["min"]
-                limits_fixwing[mdl]["vmaxld"] = df.loc["ld_v_app"]["max"]
-
-                limits_fixwing[mdl]["vmo"] = limits_fixwing[mdl]["vmaxer"]
-                limits_fixwing[mdl]["mmo"] = df.loc["cr_v_mach_max"]["opt"]
-
-                limits_fixwing[mdl]["hmax"] = df.loc["cr_h_max"]["opt"] * 1000
-                limits_fixwing[mdl]["crosscl"] = df.loc["cl_h_mach_const"]["opt"]
-                limits_fixwing[mdl]["crossde"] = df.loc["de_h_cas_const"]["opt"]
-
-                limits_fixwing[mdl]["axmax"] = df.loc["to_acc_tof"]["max"]
-
-                limits_fixwing[mdl]["vsmax"] = max(
-                    df.loc["ic_vs_avg"]["max"],
-                    df.loc["cl_vs_avg_pre_cas"]["max"],
-                    df.loc["cl_vs_avg_cas_const"]["max"],
-                    df.loc["cl_vs_avg_mach_const"]["max"],
-                )
-
-                limits_fixwing[mdl]["vsmin"] = min(
-                    df.loc["ic_vs_avg"]["min"],
-                    df.loc["de_vs_avg_after_cas"]["min"],
-                    df.loc["de_vs_avg_cas_const"]["min"],
-                    df.loc["de_vs_avg_mach_const"]["min"],
-                )
-
-        # create envolop based on synonym
-        for mdl in self.synodict.keys():
-            if mdl not in limits_fixwing:
-                limits_fixwing[mdl] = limits_fixwing[self.synodict[mdl]]
-
-        return limits_fixwing
-
-    def _load_all_rotor_envelop(self):
-        """load rotor aircraft envelop, all unit in SI"""
-        limits_rotor = {}
-        for mdl, ac in self.acs_rotor.items():
-            limits_rotor[mdl] = {}
-
-            limits_rotor[mdl]["vmin"] = ac["envelop"].get("v_min", -20)
-            limits_rotor[mdl]["vmax"] = ac["envelop"].get("v_max", 20)
-            limits_rotor[mdl]["vsmin"] = ac["envelop"].get("vs_min", -5)
-            limits_rotor[mdl]["vsmax"] = ac["envelop"].get("vs_max", 5)
-            limits_rotor[mdl]["hmax"] = ac["envelop"].get("h_max", 2500)
-
-            params = ["v_min", "v_max", "vs_min", "vs_max", "h_max"]
-            if set(params) <= set(ac["envelop"].keys()):
-                pass
+def load_coefficients(path):
+    ''' Parse the OpenAP source files in path.
+
+        Returns a dict with the synonyms, the drag polars, and for the
+        fixwing aircraft, fixwing envelopes and rotor aircraft, a dict
+        with the pickled coefficients of each type.
+    '''
+    import pandas as pd
+
+    # Load synonyms.dat text file into dictionary
+    synodict = {}
+    with open(path / 'synonym.dat', "r") as f_syno:
+        for line in f_syno.readlines():
+            if line.count("#") > 0:
+                dataline, comment = line.split("#")
             else:
-                warn = f"Warning: Some performance parameters for {mdl} are not found, default values used."
-                print(warn)
-                bs.scr.echo(warn)
+                dataline = line.strip("\n")
+            acmod, synomod = dataline.split("=")
+            acmod = acmod.strip().upper()
+            synomod = synomod.strip().upper()
+
+            if acmod == synomod:
+                continue
+            synodict[acmod] = synomod
+
+    acs_fixwing = load_fixwing_flavor(path)
+    limits_fixwing = {mdl: load_fixwing_envelop(path, mdl) for mdl in acs_fixwing}
+    acs_rotor = load_rotor_flavor(path)
+
+    df = pd.read_csv(path / "fixwing/dragpolar.csv", index_col="mdl")
+    dragpolar = df.to_dict(orient="index")
+    dragpolar["NA"] = df.mean().to_dict()
+
+    def pickled(coeffsets):
+        return {mdl: pickle.dumps(c, pickle.HIGHEST_PROTOCOL) for mdl, c in coeffsets.items()
+                if c is not None}
+
+    return dict(synonyms=synodict, dragpolar=dragpolar, fixwing=pickled(acs_fixwing),
+                fixwing_limits=pickled(limits_fixwing), rotor=pickled(acs_rotor))
+
+
+def load_fixwing_flavor(path):
+    ''' Read fixwing aircraft and engine files. '''
+    import pandas as pd
+
+    allengines = pd.read_csv(path / "fixwing/engines.csv", encoding="utf-8")
+    allengines["name"] = allengines["name"].str.upper()
+    # Convert all engines at once, to the same values as a json round trip per engine
+    engines = json.loads(allengines.to_json(orient="records"))
+    with open(path / "fixwing/aircraft.json", "r") as f:
+        acs = json.load(f)
+    acs.pop("__comment")
+    acs_ = {}
+
+    for mdl, ac in acs.items():
+        acengines = ac["engines"]
+        acs_[mdl.upper()] = ac.copy()
+        acs_[mdl.upper()]["lifttype"] = LIFT_FIXWING
+        acs_[mdl.upper()]["engines"] = {}
+
+        for e in acengines:
+            e = e.strip().upper()
+            # The last engine of which the name starts with e
+            selengine = [engine for engine in engines if engine["name"].startswith(e)]
+            if selengine:
+                engine = selengine[-1]
+                acs_[mdl.upper()]["engines"][engine["name"]] = engine
+
+    return acs_
+
+
+def load_rotor_flavor(path):
+    ''' Read rotor aircraft. '''
+    with open(path / "rotor/aircraft.json", "r") as f:
+        acs = json.load(f)
+    acs.pop("__comment")
+    acs_ = {}
+    for mdl, ac in acs.items():
+        acs_[mdl.upper()] = ac.copy()
+        acs_[mdl.upper()]["lifttype"] = LIFT_ROTOR
+    return acs_
+
+
+def load_fixwing_envelop(path, mdl):
+    """load aircraft envelop from the model database,
+    All unit in SI. Returns None when there is no envelop for mdl."""
+    import pandas as pd
+
+    fenv = path / "fixwing/wrap" / (mdl.lower() + ".txt")
+    if not fenv.is_file():
+        return None
+
+    df = pd.read_fwf(fenv).set_index("variable")
+    limits = {}
+    limits["vminto"] = df.loc["to_v_lof"]["min"]
+    limits["vmaxto"] = df.loc["to_v_lof"]["max"]
+    limits["vminic"] = df.loc["ic_va_avg"]["min"]
+    limits["vmaxic"] = df.loc["ic_va_avg"]["max"]
+    limits["vminer"] = min(
+        df.loc["ic_va_avg"]["min"],
+        df.loc["cl_v_cas_const"]["min"],
+        df.loc["cr_v_cas_mean"]["min"],
+        df.loc["de_v_cas_const"]["min"],
+        df.loc["fa_va_avg"]["min"],
+    )
+    limits["vmaxer"] = max(
+        df.loc["ic_va_avg"]["max"],
+        df.loc["cl_v_cas_const"]["max"],
+        df.loc["cr_v_cas_mean"]["max"],
+        df.loc["de_v_cas_const"]["max"],
+        df.loc["fa_va_avg"]["max"],
+    )
+    limits["vminap"] = df.loc["fa_va_avg"]["min"]
+    limits["vmaxap"] = df.loc["fa_va_avg"]["max"]
+    limits["vminld"] = df.loc["ld_v_app"]["min"]
+    limits["vmaxld"] = df.loc["ld_v_app"]["max"]
+
+    limits["vmo"] = limits["vmaxer"]
+    limits["mmo"] = df.loc["cr_v_mach_max"]["opt"]
+
+    limits["hmax"] = df.loc["cr_h_max"]["opt"] * 1000
+    limits["crosscl"] = df.loc["cl_h_mach_const"]["opt"]
+    limits["crossde"] = df.loc["de_h_cas_const"]["opt"]
+
+    limits["axmax"] = df.loc["to_acc_tof"]["max"]
+
+    limits["vsmax"] = max(
+        df.loc["ic_vs_avg"]["max"],
+        df.loc["cl_vs_avg_pre_cas"]["max"],
+        df.loc["cl_vs_avg_cas_const"]["max"],
+        df.loc["cl_vs_avg_mach_const"]["max"],
+    )
+
+    limits["vsmin"] = min(
+        df.loc["ic_vs_avg"]["min"],
+        df.loc["de_vs_avg_after_cas"]["min"],
+        df.loc["de_vs_avg_cas_const"]["min"],
+        df.loc["de_vs_avg_mach_const"]["min"],
+    )
+    return limits
+
+
+def rotor_envelop(mdl, ac):
+    """rotor aircraft envelop, all unit in SI"""
+    limits = {}
+    limits["vmin"] = ac["envelop"].get("v_min", -20)
+    limits["vmax"] = ac["envelop"].get("v_max", 20)
+    limits["vsmin"] = ac["envelop"].get("vs_min", -5)
+    limits["vsmax"] = ac["envelop"].get("vs_max", 5)
+    limits["hmax"] = ac["envelop"].get("h_max", 2500)
+
+    params = ["v_min", "v_max", "vs_min", "vs_max", "h_max"]
+    if not set(params) <= set(ac["envelop"].keys()):
+        warn = f"Warning: Some performance parameters for {mdl} are not found, default values used."
+        print(warn)
+        if bs.scr is not None:
+            bs.scr.echo(warn)
 
-        return limits_rotor
+    return limits
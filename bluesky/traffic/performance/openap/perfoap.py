@@ -22,7 +22,7 @@ class OpenAP(PerfBase):
         self.ac_warning = False  # aircraft mdl to default warning
         self.eng_warning = False  # aircraft engine to default warning
 
-        self.coeff = coeff.Coefficient()
+        self.coeff = coeff.get_coefficient()
 
         with self.settrafarrays():
             self.lifttype = np.array([])  # lift type, fixwing [1] or rotor [2]
@@ -173,40 +173,26 @@ class OpenAP(PerfBase):
         mask = np.zeros_like(self.actype, dtype=bool)
         mask[-n:] = True
         self.vmin[-n:], self.vmax[-n:] = self._construct_v_limits(mask)
+        self._update_drag_coefficients(np.flatnonzero(mask))
 
     def update(self, dt):
         """Periodic update function for performance calculations."""
         # update phase, infer from spd, roc, alt
-        lenph1 = len(self.phase)
+        prevphase = self.phase
         self.phase = ph.get(
             self.lifttype, bs.traf.tas, bs.traf.vs, bs.traf.alt, unit="SI"
         )
 
-        # update speed limits, based on phase change
-        self.vmin, self.vmax = self._construct_v_limits()
+        # update speed limits and drag coefficients, which only depend on the
+        # flight phase: only for aircraft of which the phase has changed
+        changed = self.phase != prevphase
+        if changed.any():
+            self.vmin[changed], self.vmax[changed] = self._construct_v_limits(changed)
+            self._update_drag_coefficients(np.flatnonzero(changed))
 
         idx_fixwing = np.where(self.lifttype == coeff.LIFT_FIXWING)[0]
 
         # ----- compute drag -----
-        # update drage coefficient based on flight phase
-        self.cd0[self.phase == ph.GD] = (
-            self.cd0_to[self.phase == ph.GD] + self.delta_cd_gear[self.phase == ph.GD]
-        )
-        self.cd0[self.phase == ph.IC] = self.cd0_to[self.phase == ph.IC]
-        self.cd0[self.phase == ph.AP] = self.cd0_ld[self.phase == ph.AP]
-        self.cd0[self.phase == ph.CL] = self.cd0_clean[self.phase == ph.CL]
-        self.cd0[self.phase == ph.CR] = self.cd0_clean[self.phase == ph.CR]
-        self.cd0[self.phase == ph.DE] = self.cd0_clean[self.phase == ph.DE]
-        self.cd0[self.phase == ph.NA] = self.cd0_clean[self.phase == ph.NA]
-
-        self.k[self.phase == ph.GD] = self.k_to[self.phase == ph.GD]
-        self.k[self.phase == ph.IC] = self.k_to[self.phase == ph.IC]
-        self.k[self.phase == ph.AP] = self.k_ld[self.phase == ph.AP]
-        self.k[self.phase == ph.CL] = self.k_clean[self.phase == ph.CL]
-        self.k[self.phase == ph.CR] = self.k_clean[self.phase == ph.CR]
-        self.k[self.phase == ph.DE] = self.k_clean[self.phase == ph.DE]
-        self.k[self.phase == ph.NA] = self.k_clean[self.phase == ph.NA]
-
         rho = aero.vdensity(bs.traf.alt[idx_fixwing])
         vtas = bs.traf.tas[idx_fixwing]
         rhovs = 0.5 * rho * vtas ** 2 * self.Sref[idx_fixwing]
@@ -394,6 +380,23 @@ class OpenAP(PerfBase):
             return vmin, vmax
         return vmin[mask], vmax[mask]
 
+    def _update_drag_coefficients(self, idx):
+        """Set drag coefficients based on flight phase
+
+        Args:
+            idx (1D-array): Indices of the aircraft to update
+        """
+        phase = self.phase[idx]
+
+        # takeoff configuration on ground and in initial climb (with landing
+        # gear on ground), landing configuration in approach, clean otherwise
+        to = (phase == ph.GD) | (phase == ph.IC)
+        ld = phase == ph.AP
+        cd0_to = np.where(phase == ph.GD, self.cd0_to[idx] + self.delta_cd_gear[idx], self.cd0_to[idx])
+
+        self.cd0[idx] = np.where(to, cd0_to, np.where(ld, self.cd0_ld[idx], self.cd0_clean[idx]))
+        self.k[idx] = np.where(to, self.k_to[idx], np.where(ld, self.k_ld[idx], self.k_clean[idx]))
+
     def calc_axmax(self):
         # accelerations depending on phase and wing type
         axmax_fixwing_ground = 2
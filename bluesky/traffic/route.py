@@ -415,6 +415,41 @@ class Route(Replaceable):
         if wpidx < 0:
             return False, "Waypoint " + name + " not added."
 
+    @stack.command(name='AWYROUTE', annotations='acid,txt,txt')
+    @staticmethod
+    def awyroute(acidx: 'acid', origwp: 'txt', destwp: 'txt'):
+        """ AWYROUTE acid, origwp, destwp
+
+            Add the shortest route along airways from origwp to destwp
+            to the route of the aircraft (FMS)."""
+        acid = bs.traf.id[acidx]
+        acrte = Route._routes.get(acid)
+
+        # Waypoints closest to the aircraft, and the destination waypoint closest to the origin
+        iorig = bs.navdb.getwpidx(origwp, bs.traf.lat[acidx], bs.traf.lon[acidx])
+        if iorig < 0:
+            return False, "Waypoint " + origwp + " not found"
+        idest = bs.navdb.getwpidx(destwp, bs.navdb.wplat[iorig], bs.navdb.wplon[iorig])
+        if idest < 0:
+            return False, "Waypoint " + destwp + " not found"
+        # Waypoints defined after the airway graph was built are not in the graph
+        for wpname, iwp in ((origwp, iorig), (destwp, idest)):
+            if iwp >= bs.navdb.awgraph.nwp:
+                return False, "Waypoint " + wpname + " is not on the airway network"
+
+        wps, dist = bs.navdb.awgraph.route(iorig, idest)
+        if len(wps) == 0:
+            return False, "No airway route from " + origwp + " to " + destwp
+
+        for iwp in wps:
+            acrte.addwpt_simple(acidx, bs.navdb.wpid[iwp], Route.wpnav,
+                                bs.navdb.wplat[iwp], bs.navdb.wplon[iwp])
+
+        # Calculate flight plan
+        acrte.calcfp()
+        return True, acid + " route via " + str(len(wps)) + " waypoints, " + \
+            str(int(round(dist))) + " nm along airways"
+
     def addwpt_simple(self, iac, name, wptype, lat, lon, alt=-999., spd=-999.):
         """Adds waypoint in the most simple way possible"""
         # For safety
@@ -694,7 +694,7 @@ class Traffic(Entity):
 
 
                     # How many others?
-                    nother = bs.navdb.wpid.count(wp)-len(iwps)
+                    nother = bs.navdb.wpidindex.count(wp)-len(iwps)
                     if nother>0:
                         verb = ["is ","are "][min(1,max(0,nother-1))]
                         lines = lines +"\nThere "+verb + str(nother) +\
@@ -732,7 +732,7 @@ class Traffic(Entity):
         ''' Show conections of a waypoint or airway. '''
         reflat, reflon = bs.scr.getviewctr()
 
-        if bs.navdb.awid.count(key) > 0:
+        if key in bs.navdb.awidindex:
             return self.poscommand(key)
 
         # Find connecting airway legs
@@ -2,8 +2,6 @@ import open3d as o3d
 import open3d.visualization.gui as gui
 import json
 import numpy as np
-import scipy.spatial.transform
-import pyproj
 import os
 import csv
 import glob
@@ -11,6 +9,7 @@ from datetime import datetime
 
 import bluesky as bs
 from bluesky.tools.misc import tim2txt
+from bluesky.tools.geo import ENUTransform
 
 
 class Sensor:
@@ -31,6 +30,7 @@ class Sensor:
         self.point_mat.point_size = 8.0
 
         self.reference_point = [52.070378, -0.628175, 0]  # reference point for ENU coordinate frame
+        self.enu = ENUTransform(*self.reference_point)
 
         self.subwindow_sensor_config = None
         self.subwindow_sensor_render = None
@@ -567,6 +567,9 @@ class Sensor:
             if deleted_ac:
                 print(f'{deleted_ac} removed from scn!')
 
+            # ENU positions of all aircraft in the reference frame, 3 x ntraf
+            aircraft_enu = np.vstack(self.enu.fromgeodetic(self.current_lat, self.current_lon, self.current_alt))
+
             current_nest_data = []  # empty for each frame
             for traf_i, ac_name in enumerate(self.current_ac_ids):
                 data_ = []
@@ -577,7 +580,7 @@ class Sensor:
                 for sensor_name in self.sensor_names:
                     # project targets into each sensor frame
                     sensor_transform = self.sensor_data[sensor_name]['world2sensor']
-                    point_in_sensor = self.point_in_sensor_frame(aircraft_point_i, sensor_transform,
+                    point_in_sensor = self.point_in_sensor_frame(aircraft_enu[:, traf_i], sensor_transform,
                                                                  self.sensor_data[sensor_name])
 
                     data_.append(point_in_sensor)
@@ -812,39 +815,13 @@ class Sensor:
 
         return circlePoints, lines
 
-    @staticmethod
-    def geodetic2enu(lat, lon, alt, lat_org, lon_org, alt_org):
-        """
-        convert the gps point to ENU point reference to a local point.
-        """
-        transformer = pyproj.Transformer.from_crs(
-            {"proj": 'latlong', "ellps": 'WGS84', "datum": 'WGS84'},
-            {"proj": 'geocent', "ellps": 'WGS84', "datum": 'WGS84'},
-        )
-        x, y, z = transformer.transform(lon, lat, alt, radians=False)
-        x_org, y_org, z_org = transformer.transform(lon_org, lat_org, alt_org, radians=False)
-        vec = np.array([[x - x_org, y - y_org, z - z_org]]).T
-
-        rot1 = scipy.spatial.transform.Rotation.from_euler('x', -(90 - lat_org),
-                                                           degrees=True).as_matrix()  # angle*-1 : left handed *-1
-        rot3 = scipy.spatial.transform.Rotation.from_euler('z', -(90 + lon_org),
-                                                           degrees=True).as_matrix()  # angle*-1 : left handed *-1
-
-        rotMatrix = rot1.dot(rot3)
-
-        enu = rotMatrix.dot(vec).T.ravel()
-        return enu.T
-
     def sensor_transform(self, sensor_i_data):
 
         centerLat = sensor_i_data['extrinsic']['latitude']  # decimal degrees
         centerLon = sensor_i_data['extrinsic']['longitude']  # decimal degrees
         centerAlt = sensor_i_data['extrinsic']['altitude']  #
 
-        sensor_point = [centerLat, centerLon, centerAlt]
-
-        sensor_pt = self.geodetic2enu(sensor_point[0], sensor_point[1], sensor_point[2],
-                                      self.reference_point[0], self.reference_point[1], self.reference_point[2])
+        sensor_pt = self.enu.fromgeodetic(centerLat, centerLon, centerAlt)
 
         sensor_pitch, sensor_yaw, sensor_roll = sensor_i_data['extrinsic']['pitch'], \
                                                 sensor_i_data['extrinsic']['yaw'], \
@@ -867,10 +844,8 @@ class Sensor:
 
         return world2sensor
 
-    def point_in_sensor_frame(self, lat_lon_alt, world2sensor, sensor_i_data):
-        sensor_pt = self.geodetic2enu(lat_lon_alt[0], lat_lon_alt[1], lat_lon_alt[2],
-                                      self.reference_point[0], self.reference_point[1], self.reference_point[2])
-        sensor_pt = np.array([[sensor_pt[0]], [sensor_pt[1]], [sensor_pt[2]], [1]])  # 4x1
+    def point_in_sensor_frame(self, enu_point, world2sensor, sensor_i_data):
+        sensor_pt = np.array([[enu_point[0]], [enu_point[1]], [enu_point[2]], [1]])  # 4x1
 
         pt_in_sensor = np.dot(world2sensor, sensor_pt)  # 3d; 4x1 [[x],[y],[z],[1]]
 
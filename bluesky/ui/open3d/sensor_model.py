@@ -1,9 +1,9 @@
 import json
 import numpy as np
-import pyproj
-import scipy.spatial.transform
 import time
 
+from bluesky.tools.geo import enutransform
+
 # camera model
 class CameraModel:
     def __init__(self):
@@ -184,23 +184,7 @@ def geodetic2enu(lat, lon, alt, lat_org, lon_org, alt_org):
     """
     convert the gps point to ENU point reference to a local point.
     """
-    transformer = pyproj.Transformer.from_crs(
-        {"proj": 'latlong', "ellps": 'WGS84', "datum": 'WGS84'},
-        {"proj": 'geocent', "ellps": 'WGS84', "datum": 'WGS84'},
-    )
-    x, y, z = transformer.transform(lon, lat, alt, radians=False)
-    x_org, y_org, z_org = transformer.transform(lon_org, lat_org, alt_org, radians=False)
-    vec = np.array([[x - x_org, y - y_org, z - z_org]]).T
-
-    rot1 = scipy.spatial.transform.Rotation.from_euler('x', -(90 - lat_org),
-                                                       degrees=True).as_matrix()  # angle*-1 : left handed *-1
-    rot3 = scipy.spatial.transform.Rotation.from_euler('z', -(90 + lon_org),
-                                                       degrees=True).as_matrix()  # angle*-1 : left handed *-1
-
-    rotMatrix = rot1.dot(rot3)
-
-    enu = rotMatrix.dot(vec).T.ravel()
-    return enu.T
+    return np.array(enutransform(lat_org, lon_org, alt_org).fromgeodetic(lat, lon, alt))
 
 
 def test_transform():
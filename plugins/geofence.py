@@ -1,17 +1,7 @@
 from matplotlib.path import Path
 import json
 import os
-
-try:
-    from rtree.index import Index
-except ImportError:
-    print('Geofence plugin needs rtree.')
-    class Index: ...
-try:
-    from shapely.geometry import Point
-    from shapely.ops import nearest_points
-except ImportError:
-    print('Geofence plugin needs shapely.')
+import numpy as np
 
 import bluesky as bs
 from bluesky import settings, stack
@@ -160,8 +150,8 @@ class Geofence(areafilter.Poly):
     # Also have a dictionary used for saving and loading geofences
     geo_save_dict = dict()
 
-    # Keep an Rtree of geofences
-    geo_tree = Index()
+    # Version counter of the set of geofences, used to rebuild the detection engine
+    version = 0
 
     # Keep track of the geofences themselves that aircraft are hitting or intruding in
     # "intrusions" contains aircraft that are currently intruding inside a geofence, and a list
@@ -190,9 +180,7 @@ class Geofence(areafilter.Poly):
         Geofence.geo_by_name[name] = self
         Geofence.geo_by_id[self.area_id] = self
         Geofence.geo_name2id[name] = self.area_id
-
-        # Insert the geofence in the geofence Rtree
-        Geofence.geo_tree.insert(self.area_id, self.bbox)
+        Geofence.version += 1
 
     def intersects(self, line):
         ''' Check whether given line intersects with this geofence poly. '''
@@ -206,20 +194,19 @@ class Geofence(areafilter.Poly):
         cls.geo_by_id.clear()
         cls.geo_name2id.clear()
         cls.geo_save_dict.clear()
-        cls.geo_tree = index.Index()
+        cls.version += 1
         cls.hits.clear()
         cls.intrusions.clear()
         cls.unique_intrusions.clear()
 
     @classmethod
     def delete(cls, name):
-        geo_to_delete = cls.geo_by_name[name]
         cls.geo_by_name.pop(name)
         cls.geo_save_dict.pop(name)
         geo_id = cls.geo_name2id[name]
-        cls.geo_tree.delete(geo_id, geo_to_delete.bbox)
         cls.geo_by_id.pop(geo_id)
         cls.geo_name2id.pop(name)
+        cls.version += 1
 
     def __del__(self):
         ...
@@ -227,56 +214,175 @@ class Geofence(areafilter.Poly):
     @classmethod
     def intersecting(cls, coordinates):
         '''Get the geofences that intersect coordinates (either bbox or point).'''
-        poly_ids = list(cls.geo_tree.intersection(coordinates))
+        if len(coordinates) == 2:
+            coordinates = list(coordinates) * 2
+        lat0, lon0, lat1, lon1 = ([c] for c in coordinates)
+        _, ifence = engine.candidates(lat0, lon0, lat1, lon1)
+        poly_ids = [engine.fences[i].area_id for i in ifence]
         return [cls.geo_by_id[id] for id in poly_ids], poly_ids
 
     @classmethod
     def detect_all(cls, traf, dtlookahead=None):
+        ''' Predict for all aircraft which geofences they will hit within
+            dtlookahead seconds. Returns index arrays of aircraft and geofences
+            (in engine.fences) of each predicted hit. '''
         if dtlookahead is None:
             dtlookahead = settings.geofence_dtlookahead
-        # Reset the hits dict
-        cls.hits.clear()
-        # Linearly extrapolate current state to prefict future position
+        # Linearly extrapolate current state to predict future position
         pred_lat, pred_lon = geo.kwikpos(traf.lat, traf.lon, traf.hdg, traf.gs / aero.nm * dtlookahead)
-        for idx, line in enumerate(zip(traf.lat, traf.lon, pred_lat, pred_lon)):
-            acid = traf.id[idx]
-            # First a course detection based on geofence bounding boxes
-            potential_hits= areafilter.get_intersecting(*line)
-            # Then a fine-grained intersection detection
-            hits = []
-            for geofence in potential_hits:
-                if geofence.intersects(line):
-                    hits.append(geofence)
-            cls.hits[acid] = hits
-        return
+        iac, ifence = engine.detect(traf.lat, traf.lon, pred_lat, pred_lon)
+
+        # Also keep the hits by aircraft id
+        cls.hits.clear()
+        cls.hits.update((acid, []) for acid in traf.id)
+        for i, j in zip(iac, ifence):
+            cls.hits[traf.id[i]].append(engine.fences[j])
+        return iac, ifence
 
     @classmethod
     def detect_inside(cls, traf):
-        for idx, point in enumerate(zip(traf.lat, traf.lon, traf.alt)):
-            acid = traf.id[idx]
-            # First, a course detection based on geofence bounding boxes
-            potential_intrusions, geo_ids = cls.intersecting([point[0], point[1]])
-            ac_alt = point[2]/aero.ft
-           
-            # Then a fine-grained intrusion detection
-            for i, geofence in enumerate(potential_intrusions):
-                if ac_alt < geofence.top and geofence.checkInside(*point):
-                    #intrusions.append(geofence)
-                    # Add geofence ID to unique intrusion dictionary
-                    if acid not in cls.unique_intrusions:
-                        cls.unique_intrusions[acid] = dict()
-                    # get geo_name
-                    geo_name = cls.geo_by_id[geo_ids[i]].name
-                    # Get closest point
-                    p1,p2 = nearest_points(geofence.polybound, Point(traf.lat[idx], traf.lon[idx]))
-                    # Do kwikdist
-                    intrusion = geo.kwikdist(p1.x, p1.y, p2.x, p2.y) * aero.nm
-                    # Check the previous intrusion severity
-                    if geo_ids[i] in cls.unique_intrusions[acid]:
-                        if cls.unique_intrusions[acid][geo_ids[i]][1] < intrusion:
-                            cls.unique_intrusions[acid][geo_ids[i]] = [geo_name, intrusion, p2.x, p2.y, bs.sim.simt]
-                    else:
-                        cls.unique_intrusions[acid][geo_ids[i]] = [geo_name, intrusion, p2.x, p2.y,  bs.sim.simt]
-                    
+        ''' Detect aircraft that are inside a geofence, and keep the most
+            severe intrusion of each aircraft/geofence combination.
+            Returns index arrays of aircraft and geofences (in engine.fences)
+            of each intrusion. '''
+        iac, ifence, intrusion = engine.inside(traf.lat, traf.lon, traf.alt / aero.ft)
+        for i, j, dist in zip(iac, ifence, intrusion * aero.nm):
+            acid = traf.id[i]
+            geofence = engine.fences[j]
+            intrusions = cls.unique_intrusions.setdefault(acid, dict())
+            # Check the previous intrusion severity
+            prev = intrusions.get(geofence.area_id)
+            if prev is None or prev[1] < dist:
+                intrusions[geofence.area_id] = [geofence.name, dist, traf.lat[i], traf.lon[i], bs.sim.simt]
+
         bs.traf.geo_intrusions = cls.unique_intrusions
-        return
\ No newline at end of file
+        return iac, ifence
+
+
+class GeofenceEngine:
+    ''' Batched geofence detection for all aircraft at once.
+
+        The engine keeps the edges of all active geofences in flat arrays,
+        and a uniform grid index of the geofence bounding boxes. Aircraft
+        positions and predicted segments are matched to candidate geofences
+        through the grid, after which all candidate pairs are tested at once.
+    '''
+    # Offset and span to combine grid cell coordinates into a single key
+    OFFSET = 1 << 30
+
+    def __init__(self):
+        self.version = -1
+        self.fences = []
+        self.cellsize = 1.0
+        self.bbox = np.zeros((4, 0))
+        self.vrange = np.zeros((2, 0))
+        self.edges = np.zeros((4, 0))
+        self.first = np.zeros(0, dtype=int)
+        self.count = np.zeros(0, dtype=int)
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.cellstart = np.zeros(1, dtype=int)
+        self.cellfences = np.zeros(0, dtype=int)
+
+    def cells(self, lat0, lon0, lat1, lon1):
+        ''' Return for each box the keys of the grid cells it covers, together
+            with the index of the box of each key. '''
+        iy0 = np.floor(np.asarray(lat0) / self.cellsize).astype(np.int64)
+        ix0 = np.floor(np.asarray(lon0) / self.cellsize).astype(np.int64)
+        ny = np.floor(np.asarray(lat1) / self.cellsize).astype(np.int64) - iy0 + 1
+        nx = np.floor(np.asarray(lon1) / self.cellsize).astype(np.int64) - ix0 + 1
+        ncells = nx * ny
+        ibox = np.repeat(np.arange(len(ncells)), ncells)
+        icell = np.arange(len(ibox)) - np.repeat(np.cumsum(ncells) - ncells, ncells)
+        iy = iy0[ibox] + icell // nx[ibox]
+        ix = ix0[ibox] + icell % nx[ibox]
+        return (iy + self.OFFSET) * (2 * self.OFFSET) + ix + self.OFFSET, ibox
+
+    def update(self):
+        ''' Rebuild the engine data when geofences were added or removed. '''
+        if self.version == Geofence.version:
+            return
+        self.version = Geofence.version
+        self.fences = [fence for fence in Geofence.geo_by_name.values() if fence.active]
+        n = len(self.fences)
+        self.bbox = np.array([fence.bbox for fence in self.fences], dtype=float).reshape(n, 4).T
+        self.vrange = np.array([[fence.bottom, fence.top] for fence in self.fences],
+                               dtype=float).reshape(n, 2).T
+        self.count = np.array([fence.edges.shape[1] for fence in self.fences], dtype=int)
+        self.first = np.cumsum(self.count) - self.count
+        self.edges = np.hstack([fence.edges for fence in self.fences]) if n else np.zeros((4, 0))
+
+        # Grid cell size based on the typical geofence size, limiting the
+        # number of cells covered by the largest geofences
+        extent = np.maximum(self.bbox[2] - self.bbox[0], self.bbox[3] - self.bbox[1])
+        self.cellsize = max(np.median(extent), np.max(extent) / 64.0, 1e-4) if n else 1.0
+
+        # Sorted cell keys, with for each key the geofences that cover it
+        keys, ifence = self.cells(*self.bbox)
+        order = np.argsort(keys, kind='stable')
+        keys, ifence = keys[order], ifence[order]
+        self.keys, start = np.unique(keys, return_index=True)
+        self.cellstart = np.append(start, len(keys))
+        self.cellfences = ifence
+
+    def candidates(self, lat0, lon0, lat1, lon1):
+        ''' Return index arrays of box/geofence pairs of which the bounding
+            boxes overlap. '''
+        self.update()
+        lat0, lat1 = np.minimum(lat0, lat1), np.maximum(lat0, lat1)
+        lon0, lon1 = np.minimum(lon0, lon1), np.maximum(lon0, lon1)
+        if not self.fences or not len(lat0):
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+        keys, ibox = self.cells(lat0, lon0, lat1, lon1)
+        # Look up the cells that contain geofences
+        icell = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        found = self.keys[icell] == keys
+        icell, ibox = icell[found], ibox[found]
+        nfences = self.cellstart[icell + 1] - self.cellstart[icell]
+        ibox = np.repeat(ibox, nfences)
+        ifence = self.cellfences[np.arange(len(ibox)) - np.repeat(np.cumsum(nfences) - nfences, nfences) +
+                                 np.repeat(self.cellstart[icell], nfences)]
+        # Remove duplicate pairs of boxes that cover multiple cells of a geofence
+        pairs = np.unique(ibox * len(self.fences) + ifence)
+        ibox, ifence = pairs // len(self.fences), pairs % len(self.fences)
+        # Exact bounding box overlap
+        flat0, flon0, flat1, flon1 = self.bbox[:, ifence]
+        mask = (lat0[ibox] <= flat1) & (flat0 <= lat1[ibox]) & \
+            (lon0[ibox] <= flon1) & (flon0 <= lon1[ibox])
+        return ibox[mask], ifence[mask]
+
+    def detect(self, lat0, lon0, lat1, lon1):
+        ''' Return index arrays of segment/geofence pairs of which the
+            segment (lat0, lon0) - (lat1, lon1) intersects the geofence. '''
+        lat0, lon0, lat1, lon1 = (np.atleast_1d(np.asarray(v, dtype=float))
+                                  for v in (lat0, lon0, lat1, lon1))
+        iseg, ifence = self.candidates(lat0, lon0, lat1, lon1)
+        first, count = self.first[ifence], self.count[ifence]
+        # The segment intersects the geofence when either end point is
+        # inside, or when the segment crosses one of its edges
+        hit = areafilter.inpolys(lat0[iseg], lon0[iseg], self.edges, first, count)
+        rest = np.flatnonzero(~hit)
+        hit[rest] = areafilter.inpolys(lat1[iseg[rest]], lon1[iseg[rest]],
+                                       self.edges, first[rest], count[rest])
+        rest = rest[~hit[rest]]
+        hit[rest] = areafilter.segcrossing(lat0[iseg[rest]], lon0[iseg[rest]],
+                                           lat1[iseg[rest]], lon1[iseg[rest]],
+                                           self.edges, first[rest], count[rest])
+        return iseg[hit], ifence[hit]
+
+    def inside(self, lat, lon, alt):
+        ''' Return index arrays of aircraft/geofence pairs of aircraft inside
+            a geofence, with the distance [nm] to the geofence border. '''
+        lat, lon, alt = (np.atleast_1d(np.asarray(v, dtype=float)) for v in (lat, lon, alt))
+        iac, ifence = self.candidates(lat, lon, lat, lon)
+        bottom, top = self.vrange[:, ifence]
+        mask = (bottom <= alt[iac]) & (alt[iac] < top)
+        iac, ifence = iac[mask], ifence[mask]
+        first, count = self.first[ifence], self.count[ifence]
+        hit = areafilter.inpolys(lat[iac], lon[iac], self.edges, first, count)
+        iac, ifence, first, count = iac[hit], ifence[hit], first[hit], count[hit]
+        dist = areafilter.edgedist(lat[iac], lon[iac], self.edges, first, count)
+        return iac, ifence, dist
+
+
+# The geofence detection engine
+engine = GeofenceEngine()
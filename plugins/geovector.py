@@ -97,10 +97,10 @@ def preupdate(): # To be safe preupdate is used iso update
     return
 
 def applygeovec():
-    # Apply each geovector
-    for areaname, vec in geovecs.items():
+    # Apply each geovector, evaluating all geovector areas at once
+    _, allinside = areafilter.checkInsideAll(traf.lat, traf.lon, traf.alt, geovecs.keys())
+    for (areaname, vec), swinside in zip(geovecs.items(), allinside):
         if areafilter.hasArea(areaname):
-            swinside  = areafilter.checkInside(areaname, traf.lat, traf.lon, traf.alt)
 
             insids = set(np.array(traf.id)[swinside])
             newids = insids - vec.previnside
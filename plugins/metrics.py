@@ -51,6 +51,8 @@ class Metrics(Entity):
         self.sectors = list()
         # List of sets of aircraft in each sector
         self.acinside = list()
+        # Aircraft that entered and left each sector since the last update
+        self.changes = areafilter.AreaChanges()
         # Static Density metric
         self.sectorsd = np.array([], dtype=np.int)
         # Summed pairwise convergence metric
@@ -100,14 +102,12 @@ class Metrics(Entity):
     
         sendeff = False
         for idx, (sector, previnside) in enumerate(zip(self.sectors, self.acinside)):
-            inside = areafilter.checkInside(sector, traf.lat, traf.lon, traf.alt)
+            inside = areafilter.tracker.inside(sector)
 
             sectoreff = []
-            # Detect aircraft leaving and entering the sector
-            previds = set(previnside.acid)
-            ids = set(np.array(traf.id)[inside])
-            arrived = list(ids - previds)
-            left = previds - ids
+            # Aircraft that entered and left the sector since the last update
+            arrived, left = self.changes.pop(sector)
+            arrived = list(arrived)
 
             # Split aircraft that left the sector in deleted and not deleted
             left_intraf = left.intersection(traf.id)
@@ -209,6 +209,7 @@ class Metrics(Entity):
                 # Add new area to the sector list, and add an initial inside count of traffic
                 self.sectors.append(name)
                 self.acinside.append(SectorData())
+                areafilter.subscribe(name, self.changes)
                 plotter.legend(self.sectors, 1)
                 return True, 'Added %s to sector list.' % name
 
@@ -220,6 +221,9 @@ class Metrics(Entity):
             if name in self.sectors:
                 idx = self.sectors.index(name)
                 self.sectors.pop(idx)
+                self.acinside.pop(idx)
+                areafilter.unsubscribe(name, self.changes)
+                self.changes.pop(name)
                 return True, 'Removed %s from sector list.' % name
             return False, "No sector registered with name '%s'." % name
 
@@ -1,13 +1,12 @@
 """ BlueSky sector occupancy count plugin. """
-import numpy as np
 # Import the global bluesky objects. Uncomment the ones you need
 from bluesky import traf, scr  #, stack, settings, navdb, traf, sim, scr, tools
 from bluesky.tools import areafilter, datalog
 
 # List of sectors known to this plugin.
 sectors    = list()
-# List of aircraft counted inside registered sectors in previous update step.
-previnside = list()
+# Aircraft that entered and left the registered sectors since the previous update step.
+changes    = areafilter.AreaChanges()
 
 # Data logger for sector occupancy count logfiles
 logger     = None
@@ -52,16 +51,14 @@ def init_plugin():
 
 def update():
     mylog = list()
-    for idx, name in enumerate(sectors):
-        # Perform inside count, and check entering and leaving aircraft
-        inside    = areafilter.checkInside(name, traf.lat, traf.lon, traf.alt)
-        ids       = set(np.array(traf.id)[inside])
-        previds   = previnside[idx]
-        arrived   = str.join(', ', ids - previds)
-        left      = str.join(', ', previds - ids)
-        n_tot     = len(ids)
-        n_arrived = len(arrived)
-        n_left    = len(left)
+    for name in sectors:
+        # Get inside count, and entering and leaving aircraft from the area tracker
+        ids, previds = changes.pop(name)
+        arrived   = str.join(', ', ids)
+        left      = str.join(', ', previds)
+        n_tot     = areafilter.tracker.count(name)
+        n_arrived = len(ids)
+        n_left    = len(previds)
 
         # Add log string to list
         mylog.append('%s, %d' % (name, n_tot))
@@ -73,7 +70,6 @@ def update():
             scr.echo('%s aircraft that have arrived: %s' % (name, arrived))
         if n_left + n_arrived > 0:
             scr.echo('%s occupancy count: %d' % (name, n_tot))
-            previnside[idx] = ids
 
     # Log data if enabled
     logger.log(str.join(', ', mylog))
@@ -89,10 +85,11 @@ def sectorcount(sw, name=''):
         if name in sectors:
             return True, 'Sector %s already registered.' % name
         elif areafilter.hasArea(name):
-            # Add new area to the sector list, and add an initial inside count of traffic
+            # Add new area to the sector list. The tracker determines the
+            # initial inside count, which is not reported as arrivals
             sectors.append(name)
-            inside = areafilter.checkInside(name, traf.lat, traf.lon, traf.alt)
-            previnside.append(set(np.array(traf.id)[inside]))
+            areafilter.subscribe(name, changes)
+            changes.pop(name)
             return True, 'Added %s to sector list.' % name
         else:
             return False, "No area found with name '%s', create it first with one of the shape commands" % name
@@ -100,9 +97,9 @@ def sectorcount(sw, name=''):
     else:
         # Remove area from sector list
         if name in sectors:
-            idx = sectors.index(name)
-            sectors.pop(idx)
-            previnside.pop(idx)
+            sectors.remove(name)
+            areafilter.unsubscribe(name, changes)
+            changes.pop(name)
             return True, 'Removed %s from sector list.' % name
         else:
             return False, "No sector registered with name '%s'." % name
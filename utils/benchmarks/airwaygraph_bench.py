@@ -0,0 +1,104 @@
+''' Benchmark of the airway graph: building it from navdata, loading it from
+    the column cache, and calculating shortest routes for a batch of
+    origin-destination pairs, compared to a python Dijkstra per route, for a
+    synthetic airway network of the size of the default navdata set.
+
+    Run from the BlueSky root folder:
+        python utils/benchmarks/airwaygraph_bench.py [nwaypoints] [nroutes]
+'''
+import heapq
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.insert(0, os.getcwd())
+from bluesky import settings
+from bluesky.tools import columncache
+from bluesky.navdatabase.airwaygraph import AirwayGraph
+from bluesky.navdatabase.nameindex import NameIndex
+
+
+def network(nwpt):
+    ''' Synthetic airway network: each waypoint is connected to its
+        neighbours on a jittered lat/lon grid. '''
+    rng = np.random.default_rng(0)
+    ncol = int(np.sqrt(nwpt))
+    nwpt = ncol * ncol
+    row, col = np.divmod(np.arange(nwpt), ncol)
+    wplat = -60.0 + 120.0 * row / ncol + rng.uniform(-0.1, 0.1, nwpt)
+    wplon = -180.0 + 360.0 * col / ncol + rng.uniform(-0.1, 0.1, nwpt)
+    names = [f'W{i % (nwpt // 3)}' for i in range(nwpt)]
+    # Legs to the east and north neighbours, leaving out a part of them
+    ifrom = np.concatenate((np.flatnonzero(col < ncol - 1), np.flatnonzero(row < ncol - 1)))
+    ito = np.concatenate((ifrom[:nwpt - ncol] + 1, ifrom[nwpt - ncol:] + ncol))
+    keep = rng.random(len(ifrom)) < 0.7
+    ifrom, ito = ifrom[keep], ito[keep]
+    awydata = dict(awid=[f'A{i % 1000}' for i in range(len(ifrom))],
+                   awfromwpid=[names[i] for i in ifrom], awtowpid=[names[i] for i in ito],
+                   awfromlat=wplat[ifrom], awfromlon=wplon[ifrom],
+                   awtolat=wplat[ito], awtolon=wplon[ito])
+    return wplat, wplon, NameIndex(names), awydata
+
+
+def pydijkstra(graph, orig, dest):
+    ''' Shortest route with a python Dijkstra search. '''
+    dist = {orig: 0.0}
+    prev = {}
+    queue = [(0.0, orig)]
+    while queue:
+        d, i = heapq.heappop(queue)
+        if i == dest:
+            break
+        if d > dist[i]:
+            continue
+        for j, leg in zip(*graph.neighbours(i)):
+            if d + leg < dist.get(j, np.inf):
+                dist[j] = d + leg
+                prev[j] = i
+                heapq.heappush(queue, (d + leg, j))
+    path = [dest]
+    while path[-1] in prev:
+        path.append(prev[path[-1]])
+    return path[::-1], dist.get(dest, np.inf)
+
+
+def main():
+    nwpt = int(sys.argv[1]) if len(sys.argv) > 1 else 250000
+    nroutes = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    wplat, wplon, wpidindex, awydata = network(nwpt)
+
+    t0 = time.perf_counter()
+    graph = AirwayGraph.fromnavdata(wplat, wplon, wpidindex, awydata)
+    tbuild = time.perf_counter() - t0
+    with tempfile.TemporaryDirectory() as tmpdir:
+        settings.cache_path = tmpdir
+        columncache.save('airwaygraph', 'bench', dict(graph=graph.tocolumns()))
+        t0 = time.perf_counter()
+        graph = AirwayGraph(**columncache.load('airwaygraph', 'bench')['graph'])
+        tload = time.perf_counter() - t0
+
+        # Routes from a limited number of origins, as for bulk traffic between airports
+        rng = np.random.default_rng(1)
+        origins = rng.integers(0, graph.nwp, max(1, nroutes // 10))
+        orig = rng.choice(origins, nroutes)
+        dest = rng.integers(0, graph.nwp, nroutes)
+        t0 = time.perf_counter()
+        _, dist = graph.routes(orig, dest)
+        tbatch = time.perf_counter() - t0
+
+        npy = min(nroutes, 20)
+        t0 = time.perf_counter()
+        pydist = [pydijkstra(graph, o, d)[1] for o, d in zip(orig[:npy], dest[:npy])]
+        tpy = (time.perf_counter() - t0) * nroutes / npy
+        assert np.allclose(pydist, dist[:npy])
+
+    print(f'{graph.nwp} waypoints, {graph.matrix.nnz // 2} legs: build {tbuild * 1e3:.1f} ms, '
+          f'load from cache {tload * 1e3:.1f} ms')
+    print(f'{nroutes} routes: batched {tbatch * 1e3:.1f} ms, '
+          f'python Dijkstra per route {tpy * 1e3:.1f} ms (estimated from {npy} routes)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+''' Benchmark of the areafilter point-in-area checks.
+
+    Compares checking all aircraft against many areas one area at a time
+    (areafilter.checkInside per area, with matplotlib for polygons) with
+    the vectorized area engine (areafilter.checkInsideAll), and with
+    incremental tracking of moving aircraft (areafilter.AreaTracker).
+
+    Run from the BlueSky root folder:
+        python utils/benchmarks/areafilter_bench.py [ntraf] [nareas]
+'''
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.getcwd())
+from bluesky.tools import areafilter
+
+
+NREPEAT = 10
+
+
+def sectors(nareas, rng):
+    ''' Create a mix of polygon, box and circle areas over Europe. '''
+    for i in range(nareas):
+        clat, clon = rng.uniform(40.0, 60.0), rng.uniform(-10.0, 20.0)
+        if i % 4 == 0:
+            yield areafilter.Box(f'BOX{i}', [clat - 0.5, clon - 0.7, clat + 0.5, clon + 0.7])
+        elif i % 4 == 1:
+            yield areafilter.Circle(f'CIRCLE{i}', [clat, clon, 40.0], top=7500.0)
+        else:
+            angles = np.sort(rng.uniform(0.0, 2.0 * np.pi, 12))
+            radius = rng.uniform(0.5, 1.5, 12)
+            coords = np.vstack((clat + radius * np.sin(angles),
+                                clon + 1.5 * radius * np.cos(angles))).T.flatten()
+            yield areafilter.Poly(f'POLY{i}', list(coords), top=12000.0, bottom=7500.0)
+
+
+def main():
+    ntraf = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    nareas = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+    rng = np.random.default_rng(0)
+    for shape in sectors(nareas, rng):
+        areafilter.basic_shapes[shape.name] = shape
+    lat = rng.uniform(40.0, 60.0, ntraf)
+    lon = rng.uniform(-10.0, 20.0, ntraf)
+    alt = rng.uniform(0.0, 12000.0, ntraf)
+
+    # Reference: one call per area, with matplotlib for the polygons
+    t0 = time.perf_counter()
+    for _ in range(NREPEAT):
+        ref = []
+        for shape in areafilter.basic_shapes.values():
+            if isinstance(shape, areafilter.Poly):
+                points = np.vstack((lat, lon)).T
+                ref.append(shape.border.contains_points(points) &
+                           (shape.bottom <= alt) & (alt <= shape.top))
+            else:
+                ref.append(shape.checkInside(lat, lon, alt))
+    tref = (time.perf_counter() - t0) / NREPEAT
+
+    t0 = time.perf_counter()
+    for _ in range(NREPEAT):
+        _, inside = areafilter.checkInsideAll(lat, lon, alt)
+    tengine = (time.perf_counter() - t0) / NREPEAT
+
+    ndiff = np.count_nonzero(inside != np.array(ref))
+    print(f'{ntraf} aircraft, {nareas} areas, {np.count_nonzero(inside)} hits')
+    print(f'Per-area checkInside: {tref * 1e3:8.2f} ms')
+    print(f'checkInsideAll:       {tengine * 1e3:8.2f} ms ({tref / tengine:.1f}x)')
+    print(f'Differences: {ndiff}')
+
+    # Incremental tracking of aircraft moving at ~450 kts, with 1 s steps
+    tracker = areafilter.AreaTracker()
+    for name in areafilter.basic_shapes:
+        tracker.subscribe(name, lambda *args: None)
+    ids = [f'AC{i}' for i in range(ntraf)]
+    hdg = rng.uniform(0.0, 2.0 * np.pi, ntraf)
+    dlat, dlon = 0.125 / 60.0 * np.cos(hdg), 0.125 / 60.0 * np.sin(hdg) / np.cos(np.radians(lat))
+    tracker.update(ids, lat, lon, alt)
+    nsteps = 100
+    t0 = time.perf_counter()
+    for _ in range(nsteps):
+        lat, lon = lat + dlat, lon + dlon
+        tracker.update(ids, lat, lon, alt)
+    ttrack = (time.perf_counter() - t0) / nsteps
+    _, inside = areafilter.checkInsideAll(lat, lon, alt)
+    print(f'AreaTracker per step: {ttrack * 1e3:8.2f} ms ({tengine / ttrack:.1f}x), '
+          f'differences: {np.count_nonzero(inside != tracker.member.T)}')
+
+
+if __name__ == '__main__':
+    main()
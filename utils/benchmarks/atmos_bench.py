@@ -0,0 +1,41 @@
+''' Benchmark of the vectorized atmosphere and speed conversion functions,
+    with the ISA equations and with the tabulated atmosphere (ATMOSTABLE).
+
+    Run from the BlueSky root folder:
+        python utils/benchmarks/atmos_bench.py [naircraft]
+'''
+import os
+import sys
+import timeit
+import numpy as np
+
+sys.path.insert(0, os.getcwd())
+from bluesky.tools import aero
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    rng = np.random.default_rng(0)
+    h = rng.uniform(0.0, 13000.0, n)
+    cas = rng.uniform(60.0, 180.0, n)
+    spd = np.where(rng.random(n) < 0.5, rng.uniform(0.5, 0.85, n), cas)
+    functions = dict(vatmos=lambda: aero.vatmos(h),
+                     vvsound=lambda: aero.vvsound(h),
+                     vcas2tas=lambda: aero.vcas2tas(cas, h),
+                     vtas2cas=lambda: aero.vtas2cas(cas, h),
+                     vmach2cas=lambda: aero.vmach2cas(spd, h),
+                     vcas2mach=lambda: aero.vcas2mach(cas, h),
+                     vcasormach=lambda: aero.vcasormach(spd, h),
+                     vcasormach2tas=lambda: aero.vcasormach2tas(spd, h))
+
+    print(f'{n} aircraft         ISA [us]  table [us]')
+    for name, fun in functions.items():
+        times = []
+        for flag in (False, True):
+            aero.atmostable(flag)
+            times.append(min(timeit.repeat(fun, number=100, repeat=7)) / 100 * 1e6)
+        print(f'{name:16s} {times[0]:10.1f} {times[1]:10.1f}')
+
+
+if __name__ == '__main__':
+    main()
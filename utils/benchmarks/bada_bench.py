@@ -0,0 +1,67 @@
+''' Benchmark of loading the BADA coefficients: parsing the BADA files and
+    reading the BADA cache, and of the coefficient lookup for new aircraft
+    with the coefficient table and per aircraft.
+
+    Run from the BlueSky root folder:
+        python utils/benchmarks/bada_bench.py [bada_path] [naircraft]
+'''
+import contextlib
+import io
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.getcwd())
+from bluesky import settings
+
+settings.set_variable_defaults(perf_path_bada='data/performance/BADA')
+if len(sys.argv) > 1:
+    settings.perf_path_bada = sys.argv[1]
+from bluesky.traffic.performance.bada import coeff_bada
+
+
+def timed(fun, *args):
+    ''' Best time of three calls of fun, with its output suppressed. '''
+    best = float('inf')
+    for _ in range(3):
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            fun(*args)
+            best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def init():
+    coeff_bada.synonyms.clear()
+    coeff_bada.accoeffs.clear()
+    coeff_bada.init(settings.perf_path_bada)
+
+
+def main():
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    init()
+    print(f'{len(coeff_bada.accoeffs)} coefficient sets, {len(coeff_bada.synonyms)} synonyms')
+    print(f'Parse BADA files : {timed(coeff_bada.parse_files, settings.perf_path_bada) * 1e3:8.2f} ms')
+    print(f'Init from cache  : {timed(init) * 1e3:8.2f} ms')
+
+    rng = np.random.default_rng(0)
+    actypes = list(rng.choice(list(coeff_bada.synonyms), n))
+
+    names = coeff_bada.CoeffTable.scalars
+
+    def perac():
+        # All scalar coefficients of each aircraft, looked up per aircraft
+        coeffs = [coeff_bada.getCoefficients(actype)[1] for actype in actypes]
+        return [np.array([getattr(c, name) for c in coeffs]) for name in names]
+
+    def table():
+        coeff = coeff_bada.coefftable.rows(coeff_bada.coefftable.index(actypes))
+        return [getattr(coeff, name) for name in names]
+
+    print(f'{n} aircraft: lookup per aircraft {timed(perac) * 1e3:8.3f} ms, '
+          f'coefficient table {timed(table) * 1e3:8.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
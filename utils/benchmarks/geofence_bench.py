@@ -0,0 +1,72 @@
+''' Benchmark of the geofence plugin detection engine.
+
+    Compares the batched GeofenceEngine with testing each predicted
+    aircraft segment against each geofence with overlapping bounding box,
+    using the matplotlib path intersection of the geofences.
+
+    Run from the BlueSky root folder:
+        python utils/benchmarks/geofence_bench.py [ntraf] [nfences]
+'''
+import os
+import sys
+import time
+import numpy as np
+from matplotlib.path import Path
+
+sys.path.insert(0, os.getcwd())
+sys.path.insert(0, os.path.join(os.getcwd(), 'plugins'))
+import geofence as gf
+
+
+def main():
+    ntraf = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    nfences = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    rng = np.random.default_rng(0)
+
+    # Small polygonal geofences in an urban area
+    for i in range(nfences):
+        clat, clon = rng.uniform(52.0, 52.5), rng.uniform(4.0, 4.5)
+        angles = np.sort(rng.uniform(0.0, 2.0 * np.pi, 8))
+        radius = rng.uniform(0.002, 0.01, 8)
+        coords = np.vstack((clat + radius * np.sin(angles),
+                            clon + 1.6 * radius * np.cos(angles))).T.flatten()
+        gf.Geofence(f'GF{i}', list(coords), top=400, bottom=0)
+
+    # Current and predicted drone positions
+    lat0, lon0 = rng.uniform(52.0, 52.5, ntraf), rng.uniform(4.0, 4.5, ntraf)
+    lat1 = lat0 + rng.uniform(-0.01, 0.01, ntraf)
+    lon1 = lon0 + rng.uniform(-0.01, 0.01, ntraf)
+
+    gf.engine.update()
+    t0 = time.perf_counter()
+    iac, ifence = gf.engine.detect(lat0, lon0, lat1, lon1)
+    tengine = time.perf_counter() - t0
+
+    # Reference: bounding box check and matplotlib test per aircraft and geofence,
+    # with the geofence polygons closed
+    borders = []
+    for fence in gf.engine.fences:
+        pts = np.reshape(fence.coordinates, (-1, 2))
+        borders.append(Path(np.vstack((pts, pts[:1])), closed=True))
+    t0 = time.perf_counter()
+    ref = set()
+    for i in range(ntraf):
+        line = Path([(lat0[i], lon0[i]), (lat1[i], lon1[i])])
+        for j, (fence, border) in enumerate(zip(gf.engine.fences, borders)):
+            lat_0, lon_0, lat_1, lon_1 = fence.bbox
+            if max(lat0[i], lat1[i]) < lat_0 or min(lat0[i], lat1[i]) > lat_1 or \
+                    max(lon0[i], lon1[i]) < lon_0 or min(lon0[i], lon1[i]) > lon_1:
+                continue
+            if border.intersects_path(line, filled=True):
+                ref.add((i, j))
+    tref = time.perf_counter() - t0
+
+    ndiff = len(ref ^ set(zip(iac.tolist(), ifence.tolist())))
+    print(f'{ntraf} aircraft, {nfences} geofences, {len(iac)} predicted hits')
+    print(f'Per aircraft/geofence: {tref * 1e3:8.1f} ms')
+    print(f'GeofenceEngine:        {tengine * 1e3:8.1f} ms ({tref / tengine:.0f}x)')
+    print(f'Differences: {ndiff}')
+
+
+if __name__ == '__main__':
+    main()
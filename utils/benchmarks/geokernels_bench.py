@@ -0,0 +1,56 @@
+''' Microbenchmarks of the geodesy kernels (geokernels), compared to the geo
+    functions, with each available kernel implementation, in float64 and
+    float32, and with preallocated output arrays.
+
+    Run from the BlueSky root folder:
+        python utils/benchmarks/geokernels_bench.py [npositions] [nmatrix]
+'''
+import os
+import sys
+import timeit
+import numpy as np
+
+sys.path.insert(0, os.getcwd())
+from bluesky.tools import geo, geokernels
+
+
+def timed(fun):
+    ''' Best time of a call of fun [ms]. '''
+    number = 10
+    return min(timeit.repeat(fun, number=number, repeat=5)) / number * 1e3
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    nmat = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    rng = np.random.default_rng(0)
+    lat1, lat2 = rng.uniform(-80.0, 80.0, (2, n))
+    lon1, lon2 = rng.uniform(-180.0, 180.0, (2, n))
+    # Matrix kernels: all pairs of the first nmat positions
+    mlat1, mlon1 = lat1[:nmat, np.newaxis], lon1[:nmat, np.newaxis]
+    mlat2, mlon2 = lat2[np.newaxis, :nmat], lon2[np.newaxis, :nmat]
+    cases = [('qdrdist', 2, geo.qdrdist), ('latlondist', 1, geo.latlondist),
+             ('kwikdist', 1, geo.kwikdist), ('kwikqdrdist', 2, geo.kwikqdrdist)]
+    backends = [name for name in ('numpy', 'numba') if name in geokernels._kernels]
+
+    print(f'Kernel times [ms], {n} positions / {nmat} x {nmat} matrix')
+    header = 'geo'.rjust(10) + ''.join(f'{b + " " + v:>16s}' for b in backends
+                                       for v in ('f64', 'f32', 'f64 out'))
+    print(' ' * 22 + header)
+    for name, nout, geofun in cases:
+        kernel = getattr(geokernels, name)
+        for label, args, shape in ((name, (lat1, lon1, lat2, lon2), (n,)),
+                                   (name + '_matrix', (mlat1, mlon1, mlat2, mlon2), (nmat, nmat))):
+            times = [timed(lambda: geofun(*args))]
+            out = tuple(np.empty(shape) for _ in range(nout))
+            for backend in backends:
+                geokernels.backend = backend
+                kernel(*args)  # Compile
+                times += [timed(lambda: kernel(*args)),
+                          timed(lambda: kernel(*args, dtype=np.float32)),
+                          timed(lambda: kernel(*args, out=out if nout > 1 else out[0]))]
+            print(f'{label:22s}' + f'{times[0]:10.2f}' + ''.join(f'{t:16.2f}' for t in times[1:]))
+
+
+if __name__ == '__main__':
+    main()
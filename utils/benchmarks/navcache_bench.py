@@ -0,0 +1,74 @@
+''' Benchmark of loading navigation data from the pickle cache (cachefile)
+    and from the memory-mappable column cache (columncache), for synthetic
+    navigation data of the size of the default navdata set.
+
+    Run from the BlueSky root folder:
+        python utils/benchmarks/navcache_bench.py [nwaypoints]
+'''
+import os
+import pickle
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.insert(0, os.getcwd())
+from bluesky import settings
+from bluesky.tools import columncache
+from bluesky.navdatabase import loadnavdata
+
+
+def navdata(nwpt):
+    ''' Create synthetic navigation data with nwpt waypoints. '''
+    rng = np.random.default_rng(0)
+    names = [f'W{i % (nwpt // 3)}' for i in range(nwpt)]
+    wptdata = dict(wpid=names, wplat=rng.uniform(-90, 90, nwpt), wplon=rng.uniform(-180, 180, nwpt),
+                   wptype=[str(t) for t in rng.choice(['FIX', 'VOR', 'NDB', 'DME'], nwpt)],
+                   wpelev=rng.uniform(0, 1000, nwpt).tolist(), wpvar=rng.uniform(-10, 10, nwpt).tolist(),
+                   wpfreq=rng.uniform(100, 120, nwpt).tolist(), wpdesc=[f'Fix {i}' for i in range(nwpt)])
+    napt = nwpt // 10
+    aptdata = dict(apid=[f'A{i:05d}' for i in range(napt)], apname=[f'Airport {i}' for i in range(napt)],
+                   aplat=rng.uniform(-90, 90, napt), aplon=rng.uniform(-180, 180, napt),
+                   apmaxrwy=np.full(napt, 2000.0), aptype=np.ones(napt, dtype=int),
+                   apco=['NL'] * napt, apelev=np.zeros(napt))
+    nawy = nwpt // 2
+    awydata = dict(awid=[f'A{i % 1000}' for i in range(nawy)], awfromwpid=names[:nawy],
+                   awfromlat=wptdata['wplat'][:nawy], awfromlon=wptdata['wplon'][:nawy],
+                   awtowpid=names[1:nawy + 1], awtolat=wptdata['wplat'][1:nawy + 1],
+                   awtolon=wptdata['wplon'][1:nawy + 1], awndir=[2] * nawy,
+                   awlowfl=[100] * nawy, awupfl=[460] * nawy)
+    firdata = dict(fir=[[f'FIR{i}', list(range(100)), list(range(100))] for i in range(300)],
+                   firlat0=np.zeros(30000), firlon0=np.zeros(30000),
+                   firlat1=np.zeros(30000), firlon1=np.zeros(30000))
+    codata = dict(coname=['Netherlands'] * 250, cocode2=['NL'] * 250, cocode3=['NLD'] * 250, conr=[528] * 250)
+    rwythresholds = {apt: {'06': (52.3, 4.7, 58.0), '24': (52.3, 4.8, 238.0)} for apt in aptdata['apid']}
+    nameindex = loadnavdata.make_nameindex(wptdata, aptdata, awydata)
+    return wptdata, aptdata, awydata, firdata, codata, rwythresholds, nameindex
+
+
+def main():
+    nwpt = int(sys.argv[1]) if len(sys.argv) > 1 else 250000
+    data = navdata(nwpt)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        settings.cache_path = tmpdir
+        fname = os.path.join(tmpdir, 'navdata.p')
+        with open(fname, 'wb') as f:
+            for item in data:
+                pickle.dump(item, f, pickle.HIGHEST_PROTOCOL)
+        t0 = time.perf_counter()
+        with open(fname, 'rb') as f:
+            for _ in data:
+                pickle.load(f)
+        tpickle = time.perf_counter() - t0
+
+        columncache.save('navdata', 'bench', loadnavdata.pack_navdata(*data))
+        t0 = time.perf_counter()
+        loadnavdata.unpack_navdata(columncache.load('navdata', 'bench'))
+        tcolumns = time.perf_counter() - t0
+
+    print(f'{nwpt} waypoints: pickle cache {tpickle * 1e3:.1f} ms, '
+          f'column cache {tcolumns * 1e3:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+''' Benchmark of parsing the navigation data text files with the line-by-line
+    parser (loadnavdata_txt) and the fast parser (loadnavdata_fast), for the
+    navdata files in the navdata path, or in a given folder.
+
+    Run from the BlueSky root folder:
+        python utils/benchmarks/navparse_bench.py [navdata_path] [workers]
+'''
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.getcwd())
+from bluesky import settings
+from bluesky.navdatabase import loadnavdata_fast, loadnavdata_txt
+
+
+def timed(fun, *args):
+    ''' Best time of three calls of fun, with its output suppressed. '''
+    best = float('inf')
+    for _ in range(3):
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            fun(*args)
+            best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    if len(sys.argv) > 1:
+        settings.navdata_path = sys.argv[1]
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    for part, (fast, slow) in loadnavdata_fast.LOADERS.items():
+        if fast is slow:
+            continue
+        print(f'{part:4s}: line by line {timed(slow) * 1e3:7.1f} ms, fast {timed(fast) * 1e3:7.1f} ms')
+    tslow = timed(lambda: (loadnavdata_txt.loadnavdata_txt(), loadnavdata_txt.loadthresholds_txt()))
+    print(f'all : line by line {tslow * 1e3:7.1f} ms, '
+          f'fast {timed(loadnavdata_fast.loadnavdata_fast, 0) * 1e3:7.1f} ms, '
+          f'fast with {workers} workers {timed(loadnavdata_fast.loadnavdata_fast, workers) * 1e3:7.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
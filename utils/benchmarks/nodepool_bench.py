@@ -0,0 +1,93 @@
+''' Benchmark of simulation node start time and memory use, comparing nodes
+    started as fresh processes with nodes forked from the warm node pool.
+
+    Start time is measured from the spawn request until the node registers
+    with the (stand-in) server. Memory is measured as the proportional set
+    size (PSS) of each node, which divides shared pages over the processes
+    sharing them (Linux only).
+
+    Run from the BlueSky root folder:
+        python utils/benchmarks/nodepool_bench.py [nnodes]
+'''
+import os
+import signal
+import sys
+import time
+from subprocess import Popen
+import zmq
+
+sys.path.insert(0, os.getcwd())
+import bluesky as bs
+from bluesky.network import nodepool
+
+
+def pss(pid):
+    ''' Proportional set size of a process in MB. '''
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float('nan')
+
+
+def run(spawn, nnodes, be_event):
+    ''' Spawn nnodes nodes, and wait for all of them to register. '''
+    procs = []
+    tstart = time.perf_counter()
+    starttimes = []
+    for _ in range(nnodes):
+        procs.append(spawn())
+    while len(starttimes) < nnodes:
+        # Nodes also send other events, only registrations are answered
+        node_id, *_, eventname, _ = be_event.recv_multipart()
+        if eventname == b'REGISTER':
+            be_event.send_multipart([node_id, b'\x00host', b'REGISTER', b''])
+            starttimes.append(time.perf_counter() - tstart)
+    # Allow nodes to settle before measuring memory
+    time.sleep(2.0)
+    mem = [pss(p.pid) for p in procs]
+    return procs, starttimes, mem
+
+
+def main():
+    nnodes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    bs.settings.init()
+    ctx = zmq.Context.instance()
+    be_event = ctx.socket(zmq.ROUTER)
+    be_event.bind(f'tcp://*:{bs.settings.simevent_port}')
+    be_stream = ctx.socket(zmq.XSUB)
+    be_stream.bind(f'tcp://*:{bs.settings.simstream_port}')
+
+    def popen():
+        return Popen([sys.executable, '-m', 'bluesky', '--sim'])
+
+    results = dict()
+    pool = None
+    spawners = dict(process=popen)
+    if nodepool.available():
+        pool = nodepool.NodePool()
+        spawners['pool'] = pool.spawn
+
+    for name, spawn in spawners.items():
+        procs, starttimes, mem = run(spawn, nnodes, be_event)
+        results[name] = (starttimes, mem)
+        for proc in procs:
+            os.kill(proc.pid, signal.SIGKILL)
+            proc.wait()
+
+    if pool:
+        poolpss = pss(pool.template.pid)
+        pool.close()
+        print(f'Template process PSS: {poolpss:.1f} MB')
+
+    for name, (starttimes, mem) in results.items():
+        print(f'{name:>8}: {nnodes} nodes registered in {starttimes[-1]:.2f} s '
+              f'(first after {starttimes[0]:.2f} s), '
+              f'mean PSS per node {sum(mem) / len(mem):.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
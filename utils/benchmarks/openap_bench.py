@@ -0,0 +1,58 @@
+''' Benchmark of loading the OpenAP coefficients: parsing the source files,
+    reading the coefficient cache, and the first use of each aircraft type.
+
+    Run from the BlueSky root folder:
+        python utils/benchmarks/openap_bench.py
+'''
+import contextlib
+import io
+import os
+from pathlib import Path
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.getcwd())
+from bluesky import settings
+from bluesky.traffic.performance.openap import coeff
+
+IMPORT = '''import time, sys
+sys.path.insert(0, '.')
+import bluesky
+t0 = time.perf_counter()
+from bluesky.traffic.performance.openap import coeff
+coeff.get_coefficient()
+print(time.perf_counter() - t0, 'pandas' in sys.modules)'''
+
+
+def timed(fun, *args):
+    ''' Time of a call of fun, with its output suppressed. '''
+    with contextlib.redirect_stdout(io.StringIO()):
+        t0 = time.perf_counter()
+        result = fun(*args)
+        return time.perf_counter() - t0, result
+
+
+def main():
+    tparse, _ = timed(coeff.load_coefficients, Path(settings.perf_path_openap))
+    print(f'Parse source files      : {tparse * 1e3:8.2f} ms')
+    timed(coeff.Coefficient)  # Make sure that the cache exists
+    tload, c = timed(coeff.Coefficient)
+    print(f'Read cache (type index) : {tload * 1e3:8.2f} ms')
+
+    out = subprocess.run([sys.executable, '-c', IMPORT], capture_output=True, text=True).stdout.split()
+    print(f'Import + get_coefficient: {float(out[-2]) * 1e3:8.2f} ms (pandas imported: {out[-1]})')
+
+    tfirst = []
+    for mdl in c.actypes_fixwing:
+        tfirst.append(timed(lambda: (c.acs_fixwing[mdl], c.limits_fixwing.get(mdl)))[0])
+    for mdl in c.actypes_rotor:
+        tfirst.append(timed(lambda: (c.acs_rotor[mdl], c.limits_rotor[mdl]))[0])
+    tnext = timed(lambda: [c.acs_fixwing[mdl] for mdl in c.actypes_fixwing])[0] / len(c.actypes_fixwing)
+    print(f'First use per type      : {sum(tfirst) / len(tfirst) * 1e6:8.2f} us mean, '
+          f'{max(tfirst) * 1e6:8.2f} us max ({len(tfirst)} types)')
+    print(f'Next use per type       : {tnext * 1e6:8.2f} us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+''' Benchmark of the OpenAP performance update, for a number of aircraft of
+    which a fraction changes flight phase in each update.
+
+    Run from the BlueSky root folder:
+        python utils/benchmarks/openap_update_bench.py [naircraft]
+'''
+import os
+import sys
+import timeit
+import numpy as np
+
+sys.path.insert(0, os.getcwd())
+import bluesky as bs
+from bluesky.core.entity import getproxied
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    bs.settings.is_sim = True
+    bs.settings.performance_model = 'openap'
+    bs.init()
+    rng = np.random.default_rng(0)
+    actypes = ['A320', 'B738', 'B744', 'A388', 'E190']
+    for actype in actypes:
+        m = n // len(actypes)
+        bs.traf.cre([f'{actype}{i}' for i in range(m)], actype,
+                    rng.uniform(50.0, 54.0, m), rng.uniform(2.0, 7.0, m),
+                    rng.uniform(0.0, 360.0, m), rng.uniform(0.0, 12000.0, m),
+                    rng.uniform(70.0, 250.0, m))
+
+    perf = getproxied(bs.traf.perf)
+    # Call the performance update directly, without its update timer
+    update = getattr(type(perf).update, '__func__', type(perf).update)
+    update(perf, dt=1.0)
+    alt = bs.traf.alt.copy()
+
+    def step():
+        # Climb and descend a few percent of the aircraft
+        bs.traf.vs[:] = np.where(rng.random(bs.traf.ntraf) < 0.02,
+                                 rng.choice([-10.0, 10.0], bs.traf.ntraf), 0.0)
+        bs.traf.alt[:] = alt
+        update(perf, dt=1.0)
+
+    number = 20
+    t = min(timeit.repeat(step, number=number, repeat=5)) / number
+    print(f'{bs.traf.ntraf} aircraft: update {t * 1e3:.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
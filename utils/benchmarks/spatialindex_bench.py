@@ -0,0 +1,58 @@
+''' Benchmark of the numpy spatial index (bluesky.tools.spatialindex)
+    against rtree, with the kind of queries done by areafilter.
+
+    Run from the BlueSky root folder:
+        python utils/benchmarks/spatialindex_bench.py [nboxes]
+'''
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.getcwd())
+from bluesky.tools.spatialindex import Index
+
+NQUERIES = 2000
+
+
+def bench(idx, boxes, queries):
+    ''' Time inserts, and intersection and nearest queries on an index. '''
+    t0 = time.perf_counter()
+    for i, box in enumerate(boxes):
+        idx.insert(i, tuple(box))
+    tinsert = time.perf_counter() - t0
+    # The first query also packs the numpy index
+    t0 = time.perf_counter()
+    nhits = sum(len(list(idx.intersection(tuple(q)))) for q in queries)
+    tinter = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for q in queries:
+        list(idx.nearest(tuple(q[:2]), 1))
+    tnear = time.perf_counter() - t0
+    return tinsert, tinter / len(queries), tnear / len(queries), nhits
+
+
+def main():
+    nboxes = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    rng = np.random.default_rng(0)
+    lo = rng.uniform((-60.0, -180.0), (60.0, 180.0), (nboxes, 2))
+    boxes = np.hstack((lo, lo + rng.uniform(0.0, 2.0, (nboxes, 2))))
+    qlo = rng.uniform((-60.0, -180.0), (60.0, 180.0), (NQUERIES, 2))
+    queries = np.hstack((qlo, qlo + 5.0))
+
+    indices = [('numpy', Index)]
+    try:
+        from rtree.index import Index as RtreeIndex
+        indices.append(('rtree', RtreeIndex))
+    except (ImportError, OSError):
+        print('rtree not available, only benchmarking the numpy index')
+
+    print(f'{nboxes} boxes, {NQUERIES} queries')
+    for name, cls in indices:
+        tinsert, tinter, tnear, nhits = bench(cls(), boxes, queries)
+        print(f'{name:>6}: insert {tinsert * 1e3:8.1f} ms, intersection {tinter * 1e6:8.1f} us, '
+              f'nearest {tnear * 1e6:8.1f} us ({nhits} hits)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+''' Benchmark of the BlueSky network transports (tcp, ipc, inproc).
+
+    A stand-in server (ROUTER/XSUB, as in bluesky.network.server) and a
+    stand-in node (DEALER/PUB, as in bluesky.network.node) exchange messages
+    in the BlueSky wire format:
+    - STACK -> ECHO round trips between server and node
+    - ACDATA stream messages with arrays for a given number of aircraft
+
+    The node runs in a separate thread for inproc, and in a separate process
+    for tcp and ipc.
+
+    Run from the BlueSky root folder:
+        python utils/benchmarks/transport_bench.py [ntraf]
+'''
+import os
+import sys
+import time
+from multiprocessing import Process
+from threading import Thread
+import numpy as np
+import msgpack
+import zmq
+
+sys.path.insert(0, os.getcwd())
+from bluesky.network.common import endpoint, local_protocols
+from bluesky.network.npcodec import encode_ndarray, decode_ndarray
+
+
+EVENT_PORT = 15000
+STREAM_PORT = 15001
+NROUNDTRIPS = 2000
+NSTREAM = 500
+
+
+def acdata(ntraf):
+    ''' Create an ACDATA-like stream payload for ntraf aircraft. '''
+    data = dict(simt=0.0, id=[f'KL{i}' for i in range(ntraf)])
+    for name in ('lat', 'lon', 'alt', 'tas', 'cas', 'gs', 'trk', 'vs',
+                 'vmin', 'vmax', 'tcpamax', 'rpz', 'asastas', 'asastrk'):
+        data[name] = np.random.random(ntraf)
+    data['inconf'] = np.zeros(ntraf, dtype=bool)
+    data['ingroup'] = np.zeros(ntraf, dtype=np.int64)
+    return data
+
+
+def node(protocol, ntraf):
+    ''' Stand-in simulation node: echo stack commands, and send a burst
+        of ACDATA stream messages on request. '''
+    ctx = zmq.Context.instance()
+    event_io = ctx.socket(zmq.DEALER)
+    stream_out = ctx.socket(zmq.PUB)
+    event_io.setsockopt(zmq.IDENTITY, b'\x00node')
+    event_io.connect(endpoint(protocol, EVENT_PORT))
+    stream_out.connect(endpoint(protocol, STREAM_PORT))
+    data = acdata(ntraf)
+    event_io.send_multipart([b'REGISTER', msgpack.packb(None)])
+    while True:
+        *route, name, payload = event_io.recv_multipart()
+        if name == b'QUIT':
+            break
+        if name == b'STACK':
+            text = msgpack.unpackb(payload, raw=False)
+            event_io.send_multipart(route[::-1] + [b'ECHO', msgpack.packb(
+                dict(text=text, flags=0), use_bin_type=True)])
+        elif name == b'STREAM':
+            for _ in range(NSTREAM):
+                stream_out.send_multipart([b'ACDATA\x00node', msgpack.packb(
+                    data, default=encode_ndarray, use_bin_type=True)])
+    event_io.close(linger=0)
+    stream_out.close()
+
+
+def bench(protocol, ntraf):
+    ''' Run the round trip and stream benchmarks for one transport. '''
+    ctx = zmq.Context.instance()
+    be_event = ctx.socket(zmq.ROUTER)
+    be_event.bind(endpoint(protocol, EVENT_PORT, bind=True))
+    be_stream = ctx.socket(zmq.SUB)
+    be_stream.setsockopt(zmq.SUBSCRIBE, b'')
+    be_stream.bind(endpoint(protocol, STREAM_PORT, bind=True))
+
+    worker = (Thread if protocol == 'inproc' else Process)(target=node, args=(protocol, ntraf))
+    worker.start()
+    node_id, *_ = be_event.recv_multipart()
+    # Allow the stream subscription to propagate
+    time.sleep(0.5)
+
+    # STACK -> ECHO round trips
+    cmd = msgpack.packb('ECHO benchmark', use_bin_type=True)
+    t0 = time.perf_counter()
+    for _ in range(NROUNDTRIPS):
+        be_event.send_multipart([node_id, b'\x00host', b'STACK', cmd])
+        msg = be_event.recv_multipart()
+        msgpack.unpackb(msg[-1], raw=False)
+    rtt = (time.perf_counter() - t0) / NROUNDTRIPS
+
+    # ACDATA stream throughput, including decoding as done in the client
+    be_event.send_multipart([node_id, b'\x00host', b'STREAM', msgpack.packb(None)])
+    t0 = time.perf_counter()
+    nbytes = 0
+    for _ in range(NSTREAM):
+        topic, payload = be_stream.recv_multipart()
+        msgpack.unpackb(payload, object_hook=decode_ndarray, raw=False)
+        nbytes += len(payload)
+    dt = time.perf_counter() - t0
+
+    be_event.send_multipart([node_id, b'\x00host', b'QUIT', b''])
+    worker.join()
+    be_event.close(linger=0)
+    be_stream.close(linger=0)
+    return rtt, NSTREAM / dt, nbytes / dt / 1e6
+
+
+def main():
+    ntraf = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    print(f'STACK->ECHO round trips: {NROUNDTRIPS}, ACDATA messages: {NSTREAM} of {ntraf} aircraft')
+    for protocol in ['tcp'] + local_protocols():
+        rtt, rate, mbps = bench(protocol, ntraf)
+        print(f'{protocol:>7}: round trip {rtt * 1e6:8.1f} us, '
+              f'ACDATA {rate:8.1f} msg/s ({mbps:7.1f} MB/s)')
+
+
+if __name__ == '__main__':
+    main()